@@ -0,0 +1,265 @@
+"""Tiered cache for WHOIS results: a bounded in-memory LRU backed by an optional on-disk SQLite store."""
+
+import collections
+import datetime
+import enum
+import json
+import logging
+import pathlib
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+DEFAULT_NEGATIVE_CACHE_TTL = 60 * 60
+DEFAULT_NEGATIVE_CACHE_TIMEOUT_TTL = 5 * 60
+# Seconds between two deletions of the expired rows of the on-disk store, done on a `set`.
+DEFAULT_PRUNE_INTERVAL = 60 * 60
+
+_DATETIME_KEY = "__datetime__"
+
+
+def _encode(value: Any) -> Any:
+    """JSON encoder hook for the datetime values returned by the whois parser."""
+    if isinstance(value, datetime.datetime):
+        return {_DATETIME_KEY: value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def _decode(value: dict[str, Any]) -> Any:
+    """JSON decoder hook restoring the datetime values encoded by `_encode`."""
+    if _DATETIME_KEY in value:
+        return datetime.datetime.fromisoformat(value[_DATETIME_KEY])
+    return value
+
+
+def dumps(value: dict[str, Any]) -> str:
+    """Serializes a WHOIS result to a JSON string."""
+    return json.dumps(value, default=_encode)
+
+
+def loads(value: str) -> dict[str, Any]:
+    """Deserializes a WHOIS result from a JSON string."""
+    result: dict[str, Any] = json.loads(value, object_hook=_decode)
+    return result
+
+
+class FailureReason(enum.Enum):
+    """Reason a whois lookup failed, deciding how long the failure is cached."""
+
+    NO_MATCH = "no_match"
+    UNRESOLVABLE_SERVER = "unresolvable_server"
+    TIMEOUT = "timeout"
+    INVALID_DOMAIN = "invalid_domain"
+    # Quota, empty or unparsable answers and unreachable networks, which say nothing of the domain.
+    TRANSIENT = "transient"
+
+
+def classify_failure(error: Exception) -> FailureReason:
+    """Maps a whois lookup error to its failure reason."""
+    from whois import exceptions as whois_exceptions
+
+    from agent import rdap
+
+    if isinstance(
+        error, (whois_exceptions.WhoisDomainNotFoundError, rdap.RdapNotFoundError)
+    ):
+        return FailureReason.NO_MATCH
+    if isinstance(error, (socket.gaierror, whois_exceptions.UnknownTldError)):
+        return FailureReason.UNRESOLVABLE_SERVER
+    if isinstance(error, UnicodeError):
+        return FailureReason.INVALID_DOMAIN
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return FailureReason.TIMEOUT
+    return FailureReason.TRANSIENT
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with a size bound and a per-entry TTL."""
+
+    def __init__(
+        self, max_size: int = DEFAULT_CACHE_SIZE, ttl: float = DEFAULT_CACHE_TTL
+    ) -> None:
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: collections.OrderedDict[str, tuple[float, dict[str, Any]]] = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Returns the cached value for key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict[str, Any], ttl: float | None = None) -> None:
+        """Stores value under key, evicting the least recently used entries beyond the size bound."""
+        ttl = self._ttl if ttl is None else ttl
+        if self._max_size <= 0 or ttl <= 0:
+            return
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+
+class SqliteStore:
+    """On-disk WHOIS result store surviving agent restarts.
+
+    Expired rows are deleted on start, then on the first `set` every `prune_interval` seconds, so that
+    a long-running agent does not grow the database with results it will never return.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = DEFAULT_CACHE_TTL,
+        prune_interval: float = DEFAULT_PRUNE_INTERVAL,
+    ) -> None:
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._ttl = ttl
+        self._prune_interval = prune_interval
+        self._next_prune_at = 0.0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS whois_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._prune(time.time())
+
+    def _prune(self, now: float) -> None:
+        """Deletes the expired rows, the lock being held by the caller."""
+        self._connection.execute(
+            "DELETE FROM whois_cache WHERE expires_at <= ?", (now,)
+        )
+        self._next_prune_at = now + self._prune_interval
+
+    def get(self, key: str) -> tuple[dict[str, Any], float] | None:
+        """Returns the stored value for key with its remaining TTL, or None if it is missing or expired."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM whois_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        remaining_ttl = expires_at - time.time()
+        if remaining_ttl <= 0:
+            return None
+        return loads(value), remaining_ttl
+
+    def set(self, key: str, value: dict[str, Any], ttl: float | None = None) -> None:
+        """Stores value under key."""
+        ttl = self._ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        now = time.time()
+        with self._lock, self._connection:
+            if now >= self._next_prune_at:
+                self._prune(now)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO whois_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, dumps(value), now + ttl),
+            )
+
+    def close(self) -> None:
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+class WhoisCache:
+    """WHOIS result cache checking the in-memory tier first, then the on-disk tier if configured.
+
+    Failed lookups are cached next to the results, under their own key space and shorter TTLs, so that
+    known-bad domains are rejected without paying the retries again.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_CACHE_SIZE,
+        ttl: float = DEFAULT_CACHE_TTL,
+        path: str | None = None,
+        negative_ttl: float = DEFAULT_NEGATIVE_CACHE_TTL,
+        negative_timeout_ttl: float = DEFAULT_NEGATIVE_CACHE_TIMEOUT_TTL,
+    ) -> None:
+        self._memory = LRUCache(max_size=max_size, ttl=ttl)
+        self._failures = LRUCache(max_size=max_size, ttl=negative_ttl)
+        self._negative_ttls = {
+            FailureReason.NO_MATCH: negative_ttl,
+            FailureReason.UNRESOLVABLE_SERVER: negative_ttl,
+            FailureReason.INVALID_DOMAIN: negative_ttl,
+            FailureReason.TIMEOUT: negative_timeout_ttl,
+            FailureReason.TRANSIENT: negative_timeout_ttl,
+        }
+        self._disk: SqliteStore | None = None
+        if path is not None and path != "":
+            self._disk = SqliteStore(path, ttl=ttl)
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Returns the cached WHOIS result for key, promoting on-disk hits to memory."""
+        value = self._memory.get(key)
+        if value is not None:
+            return value
+        if self._disk is None:
+            return None
+        stored = self._disk.get(key)
+        if stored is None:
+            return None
+        value, remaining_ttl = stored
+        self._memory.set(key, value, ttl=remaining_ttl)
+        logger.debug("WHOIS result for %s loaded from disk cache.", key)
+        return value
+
+    def set(self, key: str, value: dict[str, Any]) -> None:
+        """Caches the WHOIS result for key in all the configured tiers."""
+        self._memory.set(key, value)
+        if self._disk is not None:
+            self._disk.set(key, value)
+
+    def get_failure(self, key: str) -> FailureReason | None:
+        """Returns the reason of a cached lookup failure for key, if any."""
+        failure = self._failures.get(key)
+        if failure is None and self._disk is not None:
+            stored = self._disk.get(_failure_key(key))
+            if stored is not None:
+                failure, remaining_ttl = stored
+                self._failures.set(key, failure, ttl=remaining_ttl)
+        if failure is None:
+            return None
+        return FailureReason(failure["reason"])
+
+    def set_failure(self, key: str, reason: FailureReason) -> None:
+        """Caches a lookup failure for key, with the TTL of its failure reason."""
+        ttl = self._negative_ttls[reason]
+        if ttl <= 0:
+            return
+        failure = {"reason": reason.value}
+        self._failures.set(key, failure, ttl=ttl)
+        if self._disk is not None:
+            self._disk.set(_failure_key(key), failure, ttl=ttl)
+
+
+def _failure_key(key: str) -> str:
+    """Key of a lookup failure in the on-disk store, kept apart from the results."""
+    return f"failure:{key}"
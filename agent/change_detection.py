@@ -0,0 +1,113 @@
+"""Change detection of the emitted whois records across scans.
+
+A fingerprint of each emitted record, made of a short hash of each field, is kept in the persist store
+under the record name. When a domain is scanned again, an unchanged record is suppressed or reduced to
+its name, and a changed record may be reduced to its name and the fields that changed.
+"""
+
+import enum
+import hashlib
+import json
+from typing import Any
+
+from ostorlab.agent.mixins import agent_persist_mixin as persist_mixin
+
+FINGERPRINTS_KEY = "agent_whois_domain_fingerprints"
+# Bytes of the hash of a field, enough to tell the values of a field of a domain apart.
+DIGEST_SIZE = 8
+
+
+class Mode(enum.Enum):
+    """Handling of the records that did not change since they were last emitted."""
+
+    OFF = "off"
+    SUPPRESS = "suppress"
+    MARKER = "marker"
+
+
+class Change(enum.Enum):
+    NEW = "new"
+    CHANGED = "changed"
+    UNCHANGED = "unchanged"
+
+
+def _hash(value: Any) -> str:
+    """Hashes a field value, ignoring the order of list values such as the name servers."""
+    if isinstance(value, list):
+        value = sorted(value, key=str)
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=DIGEST_SIZE).hexdigest()
+
+
+def fingerprint(record: dict[str, Any]) -> dict[str, str]:
+    """Returns the hash of each field of a record, its name excluded."""
+    return {field: _hash(value) for field, value in record.items() if field != "name"}
+
+
+def changed_fields(previous: dict[str, str], current: dict[str, str]) -> list[str]:
+    """Returns the fields whose hash differs between two fingerprints, added and removed fields included."""
+    return sorted(
+        field
+        for field in previous.keys() | current.keys()
+        if previous.get(field) != current.get(field)
+    )
+
+
+class ChangeDetector:
+    """Compares the records with their last emitted fingerprint and decides what to emit."""
+
+    def __init__(
+        self, store: persist_mixin.AgentPersistMixin, mode: Mode, diff: bool = False
+    ) -> None:
+        """Creates the detector.
+
+        Args:
+            store: Persist store of the fingerprints, shared by the agent replicas.
+            mode: Handling of the unchanged records.
+            diff: Whether changed records are reduced to their name and changed fields. Fields removed
+                from a record can not be told apart from unset ones and are left out.
+        """
+        self._store = store
+        self._mode = mode
+        self._diff = diff
+
+    def detect(
+        self, record: dict[str, Any]
+    ) -> tuple[Change, dict[str, Any] | None, dict[str, str] | None]:
+        """Compares a record with its last saved fingerprint and returns its change with the record to emit.
+
+        The new fingerprint is not saved here: the caller saves it with `save` once the record is emitted,
+        so that a record that could not be sent is not taken as unchanged by the next scans.
+
+        Returns:
+            The change since the record was last emitted, the record to emit or None if it is suppressed,
+            and the fingerprint to save once it is emitted, None if it did not change.
+        """
+        name = record["name"]
+        current = fingerprint(record)
+        stored = self._store.hash_get(FINGERPRINTS_KEY, name)
+        if stored is None:
+            return Change.NEW, record, current
+        previous: dict[str, str] = json.loads(stored)
+        changed = changed_fields(previous, current)
+        if len(changed) == 0:
+            if self._mode is Mode.SUPPRESS:
+                return Change.UNCHANGED, None, None
+            return Change.UNCHANGED, {"name": name}, None
+        if self._diff is False:
+            return Change.CHANGED, record, current
+        return (
+            Change.CHANGED,
+            {
+                "name": name,
+                **{field: record[field] for field in changed if field in record},
+            },
+            current,
+        )
+
+    def save(self, name: str, record_fingerprint: dict[str, str]) -> None:
+        """Saves the fingerprint of an emitted record."""
+        self._store.hash_add(
+            FINGERPRINTS_KEY,
+            {name: json.dumps(record_fingerprint, separators=(",", ":"))},
+        )
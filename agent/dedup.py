@@ -0,0 +1,51 @@
+"""Local pre-filter of the shared persist set used to deduplicate processed domains."""
+
+import collections
+import threading
+
+DEFAULT_DEDUP_CACHE_SIZE = 100_000
+
+
+class LocalDedupFilter:
+    """Bounded exact set of the values known to be in a shared `AgentPersistMixin` set.
+
+    Values are only remembered once `set_add` put them in the shared set, which never shrinks while
+    the agent runs, so a local hit is always a true duplicate and skips the Redis round trip. A local
+    miss falls back to the shared set. When the bound is reached, the least recently seen values are
+    forgotten and are checked against the shared set again.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_DEDUP_CACHE_SIZE) -> None:
+        self._max_size = max_size
+        self._values: collections.OrderedDict[str, None] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def check(self, value: str) -> bool:
+        """Returns True if value is known to be in the shared set, counting hits and misses."""
+        with self._lock:
+            if value in self._values:
+                self._values.move_to_end(value)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def add(self, value: str) -> None:
+        """Remembers a value that is now in the shared set."""
+        if self._max_size <= 0:
+            return
+        with self._lock:
+            self._values[value] = None
+            self._values.move_to_end(value)
+            while len(self._values) > self._max_size:
+                self._values.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forgets all the values, e.g. when the shared set was reset."""
+        with self._lock:
+            self._values.clear()
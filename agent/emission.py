@@ -0,0 +1,12 @@
+"""Compact payloads of the emitted whois records."""
+
+from typing import Any
+
+
+def compact(record: dict[str, Any]) -> dict[str, Any]:
+    """Drops the fields of a record that are None or empty lists, which are not sent anyway."""
+    return {
+        field: value
+        for field, value in record.items()
+        if value is not None and not (isinstance(value, list) and len(value) == 0)
+    }
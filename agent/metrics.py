@@ -0,0 +1,142 @@
+"""In-process metrics of the agent, exposed with `prometheus_client`.
+
+Metrics are exported over HTTP on `/metrics` when a port is configured, and written to a snapshot
+file periodically and at exit when a path is configured.
+"""
+
+import logging
+import threading
+import wsgiref.simple_server
+
+import prometheus_client
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from a cached lookup to a slow registry answering after retries.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_SNAPSHOT_INTERVAL = 60.0
+
+
+class WhoisMetrics:
+    """Metrics of the whois domain agent, kept in their own registry."""
+
+    def __init__(self) -> None:
+        self.registry = prometheus_client.CollectorRegistry()
+        self.process_duration = prometheus_client.Histogram(
+            "whois_process_duration_seconds",
+            "Time spent handling a message in `process`, including inline lookups.",
+            buckets=DEFAULT_BUCKETS,
+            registry=self.registry,
+        )
+        self.lookup_duration = prometheus_client.Histogram(
+            "whois_lookup_duration_seconds",
+            "Duration of whois queries, rate limit waits excluded.",
+            ["tld", "server"],
+            buckets=DEFAULT_BUCKETS,
+            registry=self.registry,
+        )
+        self.parse_duration = prometheus_client.Histogram(
+            "whois_parse_duration_seconds",
+            "Time spent parsing whois data into emitted records.",
+            buckets=DEFAULT_BUCKETS,
+            registry=self.registry,
+        )
+        self.retries = prometheus_client.Counter(
+            "whois_retries_total",
+            "Whois queries retried after a connection error or a timeout.",
+            ["server"],
+            registry=self.registry,
+        )
+        self.errors = prometheus_client.Counter(
+            "whois_errors_total",
+            "Failed whois queries by error: timeout, connection, dns, pywhois or unicode.",
+            ["error"],
+            registry=self.registry,
+        )
+        self.dedup = prometheus_client.Counter(
+            "whois_dedup_total",
+            "Deduplication checks by result: local_hit, shared_hit or miss.",
+            ["result"],
+            registry=self.registry,
+        )
+        self.cache = prometheus_client.Counter(
+            "whois_cache_total",
+            "Whois cache lookups by result: hit, negative_hit or miss.",
+            ["result"],
+            registry=self.registry,
+        )
+        self.coalesced_lookups = prometheus_client.Counter(
+            "whois_coalesced_lookups_total",
+            "Lookups that waited for an in-flight lookup of the same domain instead of querying.",
+            registry=self.registry,
+        )
+        self.changes = prometheus_client.Counter(
+            "whois_changes_total",
+            "Records compared with their last emitted version by result: new, changed or unchanged.",
+            ["result"],
+            registry=self.registry,
+        )
+        self.emitted_messages = prometheus_client.Counter(
+            "whois_emitted_messages_total",
+            "Messages emitted by the agent.",
+            registry=self.registry,
+        )
+
+    def value(self, name: str, **labels: str) -> float:
+        """Returns the current value of a sample, 0 when it was never recorded."""
+        value = self.registry.get_sample_value(name, labels)
+        return 0.0 if value is None else value
+
+
+def serve(
+    registry: prometheus_client.CollectorRegistry, port: int, host: str = "0.0.0.0"
+) -> wsgiref.simple_server.WSGIServer:
+    """Serves the metrics on `/metrics` from a daemon thread.
+
+    Returns:
+        The running server, stopped with `shutdown`.
+    """
+    server, _ = prometheus_client.start_http_server(port, addr=host, registry=registry)
+    logger.info("Serving metrics on %s:%d/metrics.", host, server.server_port)
+    return server
+
+
+class SnapshotWriter:
+    """Writes the metrics to a file every `interval` seconds from a daemon thread."""
+
+    def __init__(
+        self,
+        registry: prometheus_client.CollectorRegistry,
+        path: str,
+        interval: float = DEFAULT_SNAPSHOT_INTERVAL,
+    ) -> None:
+        self._registry = registry
+        self._path = path
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="metrics_snapshot", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _run(self) -> None:
+        while self._stopped.wait(self._interval) is False:
+            self.write()
+
+    def write(self) -> None:
+        """Writes the metrics in the Prometheus text format, replacing the file atomically."""
+        try:
+            prometheus_client.write_to_textfile(self._path, self._registry)
+        except OSError as e:
+            logger.error(
+                "Could not write the metrics snapshot to %s: %s", self._path, e
+            )
+
+    def stop(self) -> None:
+        """Stops the periodic writes and writes a last snapshot."""
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.write()
@@ -0,0 +1,71 @@
+"""Normalization of incoming domain names to their registrable domain."""
+
+import dataclasses
+import functools
+from typing import cast
+
+import tld
+from tld import utils as tld_utils
+
+# Number of raw inputs whose normalization is memoized. Scans repeat the same hosts across messages.
+MEMO_SIZE = 65536
+
+
+@dataclasses.dataclass(frozen=True)
+class NormalizedDomain:
+    """Registrable domain of an input, with its public suffix, IDNA-encoded form and host name."""
+
+    fld: str
+    tld: str
+    idna: str | None
+    host: str
+
+
+def load_public_suffixes() -> None:
+    """Loads the public suffix trie, so that the first message does not pay for parsing the suffix list."""
+    tld_utils.get_tld_names()
+
+
+@functools.lru_cache(maxsize=MEMO_SIZE)
+def normalize(domain: str) -> NormalizedDomain | None:
+    """Resolves the registrable domain, public suffix, IDNA form and host of a domain name or URL in one pass.
+
+    Results are memoized per raw input in a bounded LRU cache.
+
+    Args:
+        domain: Domain name or URL to normalize.
+
+    Returns:
+        The normalized domain, or None if the domain does not end with a known public suffix.
+    """
+    domain_object = cast(
+        tld.Result | None,
+        tld.get_tld(domain, as_object=True, fix_protocol=True, fail_silently=True),
+    )
+    if domain_object is None:
+        return None
+    try:
+        idna: str | None = domain_object.fld.encode("idna").decode("ascii")
+    except UnicodeError:
+        idna = None
+    return NormalizedDomain(
+        fld=domain_object.fld,
+        tld=domain_object.tld,
+        idna=idna,
+        host=domain_object.parsed_url.hostname or domain_object.fld,
+    )
+
+
+def get_fld(domain: str) -> str | None:
+    """Returns the registrable domain (first level domain) of a domain name or URL.
+
+    Args:
+        domain: Domain name or URL to normalize.
+
+    Returns:
+        The registrable domain, or None if the domain does not end with a known public suffix.
+    """
+    normalized_domain = normalize(domain)
+    if normalized_domain is None:
+        return None
+    return normalized_domain.fld
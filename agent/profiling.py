@@ -0,0 +1,133 @@
+"""Sampled cProfile and tracemalloc capture of the agent's message handling.
+
+One in `sample_rate` calls is run under cProfile and tracemalloc. Each sample writes a `.prof` dump,
+readable with `python -m pstats` or snakeviz, and a report of the top allocations made during the
+call. Only the most recent dumps are kept.
+"""
+
+import contextlib
+import cProfile
+import logging
+import pathlib
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_RATE = 100
+DEFAULT_MAX_DUMPS = 20
+TOP_ALLOCATIONS = 25
+TRACEMALLOC_FRAMES = 10
+PROFILE_SUFFIX = ".prof"
+ALLOCATIONS_SUFFIX = ".allocations.txt"
+
+_IGNORED_FRAMES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+class SampledProfiler:
+    """Profiles one in `sample_rate` calls and writes rotating dumps to a directory.
+
+    Samples do not overlap: tracemalloc traces every thread, so a call starting while another one
+    is sampled is not profiled.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sample_rate: int = DEFAULT_SAMPLE_RATE,
+        max_dumps: int = DEFAULT_MAX_DUMPS,
+    ) -> None:
+        """Creates the profiler.
+
+        Args:
+            directory: Directory of the dumps, created if needed.
+            sample_rate: One in `sample_rate` calls is profiled.
+            max_dumps: Number of samples whose dumps are kept, older ones are deleted.
+        """
+        self._directory = pathlib.Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._sample_rate = max(sample_rate, 1)
+        self._max_dumps = max(max_dumps, 1)
+        self._calls_count = 0
+        self._samples_count = 0
+        self._counter_lock = threading.Lock()
+        self._sampling_lock = threading.Lock()
+
+    def _is_sampled(self) -> bool:
+        with self._counter_lock:
+            self._calls_count += 1
+            return self._calls_count % self._sample_rate == 0
+
+    @contextlib.contextmanager
+    def sample(self, name: str) -> Iterator[None]:
+        """Profiles the block if this call is sampled.
+
+        Args:
+            name: Prefix of the dump files, naming the profiled operation.
+        """
+        if self._is_sampled() is False or self._sampling_lock.acquire(False) is False:
+            yield
+            return
+        try:
+            started_tracing = tracemalloc.is_tracing() is False
+            if started_tracing is True:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            before = tracemalloc.take_snapshot()
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                after = tracemalloc.take_snapshot()
+                if started_tracing is True:
+                    tracemalloc.stop()
+                self._write(name, profiler, before, after)
+        finally:
+            self._sampling_lock.release()
+
+    def _write(
+        self,
+        name: str,
+        profiler: cProfile.Profile,
+        before: tracemalloc.Snapshot,
+        after: tracemalloc.Snapshot,
+    ) -> None:
+        self._samples_count += 1
+        stem = f"{name}-{time.strftime('%Y%m%dT%H%M%S')}-{self._samples_count:06d}"
+        statistics = after.filter_traces(_IGNORED_FRAMES).compare_to(
+            before.filter_traces(_IGNORED_FRAMES), "lineno"
+        )
+        lines = [f"Top allocations of {stem}:"]
+        lines.extend(
+            str(statistic)
+            for statistic in statistics[:TOP_ALLOCATIONS]
+            if statistic.size_diff > 0
+        )
+        try:
+            profiler.dump_stats(self._directory / f"{stem}{PROFILE_SUFFIX}")
+            (self._directory / f"{stem}{ALLOCATIONS_SUFFIX}").write_text(
+                "\n".join(lines) + "\n"
+            )
+            self._rotate()
+        except OSError as e:
+            logger.error("Could not write the profile %s: %s", stem, e)
+            return
+        logger.info("Wrote profile %s to %s.", stem, self._directory)
+
+    def _rotate(self) -> None:
+        """Deletes the dumps of the oldest samples beyond `max_dumps`."""
+        profiles = sorted(
+            self._directory.glob(f"*{PROFILE_SUFFIX}"),
+            key=lambda path: (path.stat().st_mtime, path.name),
+        )
+        for profile in profiles[: -self._max_dumps]:
+            stem = profile.name.removesuffix(PROFILE_SUFFIX)
+            profile.unlink(missing_ok=True)
+            (self._directory / f"{stem}{ALLOCATIONS_SUFFIX}").unlink(missing_ok=True)
@@ -0,0 +1,159 @@
+"""Per-WHOIS-server token bucket rate limiting."""
+
+import logging
+import threading
+import time
+
+from agent import whois_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = 1.0
+DEFAULT_BURST = 5
+
+
+def whois_server_key(domain_name: str) -> str:
+    """Returns the WHOIS server answering for a domain, or its TLD when the server is not known locally."""
+    server = whois_client.known_whois_server(domain_name)
+    if server is not None:
+        return server
+    return domain_name.rsplit(".", 1)[-1].lower()
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second, holding at most `burst` tokens.
+
+    Tokens are reserved on acquire, so the balance may go negative: the caller then sleeps until its
+    token is due instead of polling the bucket.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self._rate = rate
+        self._burst = max(burst, 1)
+        self._tokens = float(self._burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            float(self._burst), self._tokens + (now - self._updated_at) * self._rate
+        )
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """Takes a token without waiting for it.
+
+        Returns:
+            The number of seconds the caller must wait before using the token.
+        """
+        if self._rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            return -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+    def try_acquire(self) -> float:
+        """Takes a token if one is available, without waiting.
+
+        Returns:
+            0 if the token was taken, otherwise the number of seconds until one is available.
+        """
+        if self._rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self._rate
+
+    def acquire(self) -> float:
+        """Takes a token, sleeping until it is available.
+
+        Returns:
+            The number of seconds waited.
+        """
+        wait_time = self.reserve()
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+    def refund(self) -> None:
+        """Gives back a token taken for a request that was not sent."""
+        if self._rate <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens = min(float(self._burst), self._tokens + 1)
+
+    def drain(self) -> None:
+        """Empties the bucket, used when the server signals it is overloaded."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+
+
+class ServerRateLimiter:
+    """Holds one token bucket per WHOIS server so that each registry is paced at its own limit."""
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        server_rates: dict[str, float] | None = None,
+    ) -> None:
+        """Creates the limiter.
+
+        Args:
+            rate: Default requests per second allowed per server. A rate of 0 disables the limit.
+            burst: Number of requests a server may receive at once after being idle.
+            server_rates: Requests per second for specific WHOIS servers or TLDs, overriding `rate`.
+        """
+        self._rate = rate
+        self._burst = burst
+        self._server_rates = server_rates or {}
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, key: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(
+                    rate=float(self._server_rates.get(key, self._rate)),
+                    burst=self._burst,
+                )
+                self._buckets[key] = bucket
+            return bucket
+
+    def acquire(self, key: str) -> None:
+        """Waits until a request to the server identified by key is allowed."""
+        wait_time = self._bucket(key).acquire()
+        if wait_time > 0:
+            logger.debug("Waited %.2fs for the %s rate limit.", wait_time, key)
+
+    def reserve(self, key: str) -> float:
+        """Reserves a request to the server identified by key, for callers that wait asynchronously.
+
+        Returns:
+            The number of seconds to wait before sending the request.
+        """
+        return self._bucket(key).reserve()
+
+    def try_acquire(self, key: str) -> float:
+        """Takes a request to the server identified by key if one is allowed now, without waiting.
+
+        Returns:
+            0 if the request was taken, otherwise the number of seconds until one is allowed.
+        """
+        return self._bucket(key).try_acquire()
+
+    def refund(self, key: str) -> None:
+        """Gives back a request to the server identified by key that was taken but not sent."""
+        self._bucket(key).refund()
+
+    def penalize(self, key: str) -> None:
+        """Delays the next request to the server identified by key after a failure."""
+        self._bucket(key).drain()
@@ -0,0 +1,258 @@
+"""RDAP lookups over pooled HTTPS connections, mapped to the whois data consumed by `result_parser`.
+
+The RDAP server of a TLD is read from an IANA bootstrap file (https://data.iana.org/rdap/dns.json).
+A snapshot covering the most common TLDs is bundled with the agent, a fresher copy may be cached
+locally and passed instead.
+"""
+
+import datetime
+import json
+import pathlib
+from typing import Any
+from urllib import parse
+
+import httpx
+
+BOOTSTRAP_PATH = pathlib.Path(__file__).parent / "rdap_bootstrap.json"
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MAX_CONNECTIONS = 32
+CONTENT_TYPE = "application/rdap+json"
+
+# RDAP event actions of the whois dates.
+_DATE_EVENTS = {
+    "creation_date": "registration",
+    "updated_date": "last changed",
+    "expiration_date": "expiration",
+}
+# Position of the whois address fields in the components of a jCard `adr` property.
+_ADDRESS_FIELDS = {
+    "address": 2,
+    "city": 3,
+    "state": 4,
+    "zipcode": 5,
+    "country": 6,
+}
+
+
+class RdapError(Exception):
+    """Raised when an RDAP server rejects a query or returns an invalid response."""
+
+
+class RdapNotFoundError(RdapError):
+    """Raised when the RDAP server has no registration for the domain."""
+
+
+class RdapServerError(ConnectionError):
+    """Raised when an RDAP server is unavailable or throttles the queries, which may be retried."""
+
+
+def load_bootstrap(path: str | pathlib.Path = BOOTSTRAP_PATH) -> dict[str, str]:
+    """Reads the RDAP base URL of each TLD from an IANA bootstrap file.
+
+    Returns:
+        Base URL by lowercase TLD, HTTPS URLs being preferred.
+    """
+    with pathlib.Path(path).open(encoding="utf-8") as bootstrap_file:
+        bootstrap = json.load(bootstrap_file)
+    endpoints = {}
+    for tlds, urls in bootstrap.get("services", []):
+        if len(urls) == 0:
+            continue
+        url = next((url for url in urls if url.startswith("https://")), urls[0])
+        for tld in tlds:
+            endpoints[tld.lower()] = url
+    return endpoints
+
+
+class RdapClient:
+    """RDAP client keeping the connections to the RDAP servers alive across lookups.
+
+    The client is thread-safe and meant to be shared by the lookup workers.
+    """
+
+    def __init__(
+        self,
+        endpoints: dict[str, str],
+        timeout: float = DEFAULT_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    ) -> None:
+        """Creates the client.
+
+        Args:
+            endpoints: RDAP base URL by TLD, as returned by `load_bootstrap`.
+            timeout: Timeout in seconds of the connection and of each read.
+            max_connections: Maximum number of open connections, all servers included.
+        """
+        self._endpoints = endpoints
+        self._http_client = httpx.Client(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            headers={"Accept": CONTENT_TYPE},
+            follow_redirects=True,
+        )
+
+    def endpoint(self, domain_name: str) -> str | None:
+        """Returns the RDAP base URL of a domain, or None if its TLD has no known RDAP server."""
+        return self._endpoints.get(domain_name.rsplit(".", 1)[-1].lower())
+
+    def server(self, domain_name: str) -> str | None:
+        """Returns the host of the RDAP server of a domain, or None if it is not known."""
+        endpoint = self.endpoint(domain_name)
+        if endpoint is None:
+            return None
+        return parse.urlsplit(endpoint).netloc
+
+    def lookup(self, domain_name: str) -> dict[str, Any]:
+        """Queries the RDAP server of a domain.
+
+        Returns:
+            The whois data of the domain, in the shape of the python-whois results.
+
+        Raises:
+            RdapNotFoundError: If the domain is not registered.
+            RdapError: If the server rejects the query or returns an invalid response.
+            RdapServerError: If the server is unavailable or throttles the queries.
+            UnicodeError: If the domain name can not be IDNA-encoded.
+            ValueError: If the TLD of the domain has no known RDAP server.
+        """
+        endpoint = self.endpoint(domain_name)
+        if endpoint is None:
+            raise ValueError(f"No RDAP server is known for {domain_name}.")
+        idna_name = domain_name.encode("idna").decode("ascii")
+        url = parse.urljoin(endpoint.rstrip("/") + "/", f"domain/{idna_name}")
+        try:
+            response = self._http_client.get(url)
+        except httpx.TimeoutException as e:
+            raise TimeoutError(f"RDAP query of {domain_name} timed out.") from e
+        except httpx.TransportError as e:
+            raise ConnectionError(f"RDAP query of {domain_name} failed: {e}") from e
+
+        if response.status_code == 404:
+            raise RdapNotFoundError(f"No match for {domain_name}.")
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RdapServerError(
+                f"RDAP server answered {response.status_code} for {domain_name}."
+            )
+        if response.status_code != 200:
+            raise RdapError(
+                f"RDAP server answered {response.status_code} for {domain_name}."
+            )
+        try:
+            rdap_response = response.json()
+        except ValueError as e:
+            raise RdapError(f"Invalid RDAP response for {domain_name}.") from e
+        return to_whois_data(rdap_response)
+
+    def close(self) -> None:
+        self._http_client.close()
+
+
+def to_whois_data(rdap_response: dict[str, Any]) -> dict[str, Any]:
+    """Maps an RDAP domain response to the fields of the python-whois results.
+
+    Args:
+        rdap_response: Decoded RDAP domain object.
+
+    Returns:
+        The whois data, with the keys read by `result_parser.parse_results`.
+    """
+    events: dict[str, datetime.datetime] = {}
+    for event in rdap_response.get("events", []):
+        date = _parse_date(event.get("eventDate"))
+        if date is not None:
+            events.setdefault(event.get("eventAction", ""), date)
+
+    ldh_name = rdap_response.get("ldhName")
+    whois_data: dict[str, Any] = {
+        "domain_name": ldh_name.lower() if isinstance(ldh_name, str) else None,
+        **{field: events.get(action) for field, action in _DATE_EVENTS.items()},
+        "status": list(rdap_response.get("status", [])),
+        "name_servers": [
+            name_server["ldhName"]
+            for name_server in rdap_response.get("nameservers", [])
+            if "ldhName" in name_server
+        ],
+        "dnssec": _dnssec(rdap_response.get("secureDNS")),
+        "whois_server": rdap_response.get("port43"),
+        "registrar": None,
+        "referral_url": None,
+        "name": None,
+        "org": None,
+        **dict.fromkeys(_ADDRESS_FIELDS),
+    }
+
+    emails: list[str] = []
+    for roles, vcard in _entities(rdap_response.get("entities", [])):
+        for email in _vcard_values(vcard, "email"):
+            if isinstance(email, str) and email not in emails:
+                emails.append(email)
+        if "registrar" in roles:
+            whois_data["registrar"] = _vcard_value(vcard, "fn")
+            whois_data["referral_url"] = _vcard_value(vcard, "url")
+        if "registrant" in roles:
+            whois_data["name"] = _vcard_value(vcard, "fn")
+            whois_data["org"] = _vcard_value(vcard, "org")
+            whois_data.update(_address(vcard))
+    whois_data["emails"] = emails
+    return whois_data
+
+
+def _parse_date(value: Any) -> datetime.datetime | None:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _dnssec(secure_dns: dict[str, Any] | None) -> str | None:
+    if secure_dns is None or "delegationSigned" not in secure_dns:
+        return None
+    return "signedDelegation" if secure_dns["delegationSigned"] is True else "unsigned"
+
+
+def _entities(
+    entities: list[dict[str, Any]],
+) -> list[tuple[list[str], list[list[Any]]]]:
+    """Flattens nested entities, such as the abuse contact of a registrar, into their roles and jCard."""
+    flattened = []
+    for entity in entities:
+        vcard_array = entity.get("vcardArray", [])
+        vcard = vcard_array[1] if len(vcard_array) == 2 else []
+        flattened.append((entity.get("roles", []), vcard))
+        flattened.extend(_entities(entity.get("entities", [])))
+    return flattened
+
+
+def _vcard_values(vcard: list[list[Any]], name: str) -> list[Any]:
+    """Returns the values of a jCard property, whose items are `[name, parameters, type, value]`."""
+    return [item[3] for item in vcard if len(item) >= 4 and item[0] == name]
+
+
+def _vcard_value(vcard: list[list[Any]], name: str) -> str | None:
+    values = _vcard_values(vcard, name)
+    if len(values) == 0:
+        return None
+    value = values[0]
+    if isinstance(value, list):
+        value = " ".join(str(component) for component in value if component != "")
+    return str(value) or None
+
+
+def _address(vcard: list[list[Any]]) -> dict[str, str | None]:
+    """Splits the structured `adr` jCard property into the whois address fields."""
+    addresses = _vcard_values(vcard, "adr")
+    if len(addresses) == 0 or not isinstance(addresses[0], list):
+        return {}
+    components = addresses[0]
+    address: dict[str, str | None] = {}
+    for field, index in _ADDRESS_FIELDS.items():
+        component = components[index] if index < len(components) else ""
+        if isinstance(component, list):
+            component = " ".join(str(line) for line in component if line != "")
+        address[field] = str(component) or None
+    return address
@@ -1,12 +1,12 @@
 """Module to parse whois_domain scan results."""
 
 import datetime
-from collections.abc import Iterator
+import functools
+import importlib
+import sys
+from collections.abc import Iterator, Mapping
 from typing import Any
 
-import email_validator
-import whois
-
 OPTIONAL_FIELDS = [
     "registrar",
     "whois_server",
@@ -19,52 +19,243 @@ OPTIONAL_FIELDS = [
     "country",
 ]
 
+# Fields read by `parse_records`, the only ones kept in the cached results.
+PARSED_FIELDS = (
+    "domain_name",
+    "updated_date",
+    "creation_date",
+    "expiration_date",
+    "email",
+    "emails",
+    "status",
+    "name_servers",
+    "name",
+    "dnssec",
+    *OPTIONAL_FIELDS,
+)
+
+# Fields whose values repeat across domains, interned in the cached results.
+INTERNED_FIELDS = frozenset(
+    {
+        "registrar",
+        "whois_server",
+        "referral_url",
+        "status",
+        "name_servers",
+        "dnssec",
+        "email",
+        "emails",
+        "org",
+        "city",
+        "state",
+        "country",
+    }
+)
+
 UNDISCLOSED_VALUE = "<data not disclosed>"
+# Number of email validation verdicts memoized, registrar abuse addresses repeat across most records.
+EMAIL_VALIDATION_CACHE_SIZE = 4096
+
 
+# Value of the optional fields that the results do not have, which are left out of the emitted record.
+_UNSET: Any = object()
+
+
+class DomainRecord:
+    """Parsed whois record of a domain name, converted to the emitted dict by `to_dict`.
+
+    The records of the names of one lookup share their field values, only their name differs.
+    """
 
-def parse_results(results: whois.parser.WhoisCom) -> Iterator[dict[str, Any]]:
+    __slots__ = (
+        "address",
+        "city",
+        "contact_names",
+        "country",
+        "creation_date",
+        "dnssec",
+        "emails",
+        "expiration_date",
+        "name",
+        "name_servers",
+        "org",
+        "referral_url",
+        "registrar",
+        "state",
+        "status",
+        "updated_date",
+        "whois_server",
+        "zipcode",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        dates: tuple[list[str], list[str], list[str]],
+        fields: tuple[list[str], list[str], list[str], list[str], list[str]],
+        optional_fields: Mapping[str, str | None],
+    ) -> None:
+        self.name = name
+        self.updated_date, self.creation_date, self.expiration_date = dates
+        (
+            self.emails,
+            self.status,
+            self.name_servers,
+            self.contact_names,
+            self.dnssec,
+        ) = fields
+        optional_field = optional_fields.get
+        self.registrar = optional_field("registrar", _UNSET)
+        self.whois_server = optional_field("whois_server", _UNSET)
+        self.referral_url = optional_field("referral_url", _UNSET)
+        self.org = optional_field("org", _UNSET)
+        self.address = optional_field("address", _UNSET)
+        self.city = optional_field("city", _UNSET)
+        self.state = optional_field("state", _UNSET)
+        self.zipcode = optional_field("zipcode", _UNSET)
+        self.country = optional_field("country", _UNSET)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Returns the emitted record, the optional fields being only set when the results have them."""
+        record: dict[str, Any] = {
+            "updated_date": self.updated_date,
+            "creation_date": self.creation_date,
+            "expiration_date": self.expiration_date,
+            "name": self.name,
+            "emails": self.emails,
+            "status": self.status,
+            "name_servers": self.name_servers,
+            "contact_names": self.contact_names,
+            "dnssec": self.dnssec,
+        }
+        for field, value in zip(
+            OPTIONAL_FIELDS,
+            (
+                self.registrar,
+                self.whois_server,
+                self.referral_url,
+                self.org,
+                self.address,
+                self.city,
+                self.state,
+                self.zipcode,
+                self.country,
+            ),
+            strict=True,
+        ):
+            if value is not _UNSET:
+                record[field] = value
+        return record
+
+
+def parse_results(
+    results: Mapping[str, Any], check_deliverability: bool = False
+) -> Iterator[dict[str, Any]]:
     """Parses whois_domain scan results.
 
     Args:
        results: Scan results returned by whois_domain.
+       check_deliverability: Whether emails are also checked for deliverability with DNS lookups.
 
     Returns:
        The parsed output of the whois_domain scan results.
     """
-    scan_output_dict = dict(results)
+    for record in parse_records(results, check_deliverability):
+        yield record.to_dict()
+
+
+def parse_records(
+    results: Mapping[str, Any], check_deliverability: bool = False
+) -> Iterator[DomainRecord]:
+    """Parses whois_domain scan results into a record per domain name, see `parse_results`."""
+    # Fields are read from the results without copying them, so that lazy records only parse what is read.
     names = set()
-    for name in get_list_from_string(scan_output_dict.pop("domain_name", "")):
+    for name in get_list_from_string(results.get("domain_name", "")):
         if name is not None:
             names.add(name.lower())
+    names.discard("")
+    if len(names) == 0:
+        return
 
+    # None of the fields depend on the domain name: they are computed once and shared by the records.
+    dates = _parse_dates(results)
+    fields = _parse_fields(results, check_deliverability)
+    optional_fields = _parse_optional_fields(results)
     for name in names:
-        if name != "":
-            found_emails = get_list_from_string(
-                scan_output_dict.get("email") or scan_output_dict.get("emails", "")
-            )
-            output: dict[str, str | list[str] | None] = {
-                "updated_date": get_isoformat(scan_output_dict.get("updated_date", [])),
-                "creation_date": get_isoformat(
-                    scan_output_dict.get("creation_date", [])
-                ),
-                "expiration_date": get_isoformat(
-                    scan_output_dict.get("expiration_date", [])
-                ),
-                "name": name,
-                "emails": [email for email in found_emails if _is_valid_email(email)],
-                "status": get_list_from_string(scan_output_dict.get("status", "")),
-                "name_servers": _normalize_name_servers(
-                    get_list_from_string(scan_output_dict.get("name_servers", ""))
-                ),
-                "contact_names": get_list_from_string(scan_output_dict.get("name", "")),
-                "dnssec": get_list_from_string(scan_output_dict.get("dnssec", "")),
-            }
-
-            for field in OPTIONAL_FIELDS:
-                if field in scan_output_dict:
-                    value = scan_output_dict[field]
-                    output[field] = _format_str(value) if value is not None else value
-            yield output
+        yield DomainRecord(name, dates, fields, optional_fields)
+
+
+def _parse_dates(
+    scan_output_dict: Mapping[str, Any],
+) -> tuple[list[str], list[str], list[str]]:
+    """Formats the updated, creation and expiration dates of the record."""
+    return (
+        get_isoformat(scan_output_dict.get("updated_date", [])),
+        get_isoformat(scan_output_dict.get("creation_date", [])),
+        get_isoformat(scan_output_dict.get("expiration_date", [])),
+    )
+
+
+def _parse_fields(
+    scan_output_dict: Mapping[str, Any], check_deliverability: bool
+) -> tuple[list[str], list[str], list[str], list[str], list[str]]:
+    """Formats the emails, status, name servers, contact names and dnssec of the record."""
+    found_emails = get_list_from_string(
+        scan_output_dict.get("email") or scan_output_dict.get("emails", "")
+    )
+    return (
+        [
+            email
+            for email in found_emails
+            if _is_valid_email(email, check_deliverability)
+        ],
+        get_list_from_string(scan_output_dict.get("status", "")),
+        _normalize_name_servers(
+            get_list_from_string(scan_output_dict.get("name_servers", ""))
+        ),
+        get_list_from_string(scan_output_dict.get("name", "")),
+        get_list_from_string(scan_output_dict.get("dnssec", "")),
+    )
+
+
+def _parse_optional_fields(
+    scan_output_dict: Mapping[str, Any],
+) -> dict[str, str | None]:
+    """Formats the optional fields set in the results, which are left out of the record otherwise."""
+    optional_fields: dict[str, str | None] = {}
+    for field in OPTIONAL_FIELDS:
+        if field in scan_output_dict:
+            value = scan_output_dict[field]
+            optional_fields[field] = _format_str(value) if value is not None else value
+    return optional_fields
+
+
+def intern_whois_data(whois_data: Mapping[str, Any]) -> dict[str, Any]:
+    """Copies the fields of whois data that `parse_records` reads, interning the ones that repeat.
+
+    Only these fields are read, so that lazy records do not extract the others. Registrars, whois
+    servers, statuses, name servers and registrar abuse emails are shared by many domains: cached
+    results then hold a single copy of each value.
+    """
+    interned_data: dict[str, Any] = {}
+    for field in PARSED_FIELDS:
+        if field in whois_data:
+            value = whois_data[field]
+            interned_data[field] = _intern(value) if field in INTERNED_FIELDS else value
+    return interned_data
+
+
+def _intern(value: Any) -> Any:
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [sys.intern(item) if isinstance(item, str) else item for item in value]
+    return value
+
+
+def load_email_validator() -> None:
+    """Imports the email validator, which compiles its syntax patterns on import."""
+    importlib.import_module("email_validator")
 
 
 def get_isoformat(
@@ -110,8 +301,8 @@ def get_list_from_string(scan_output_value: str | list[str]) -> list[str]:
 
 
 def _normalize_name_servers(name_servers: list[str]) -> list[str]:
-    """Normalizes name servers to lowercase and removes duplicates."""
-    return list({ns.lower() for ns in name_servers})
+    """Normalizes name servers to lowercase and removes duplicates, interning the shared host names."""
+    return list({sys.intern(ns.lower()) for ns in name_servers})
 
 
 def _format_str(value: str | list[str]) -> str:
@@ -119,17 +310,24 @@ def _format_str(value: str | list[str]) -> str:
     return value if isinstance(value, str) else " ".join(value)
 
 
-def _is_valid_email(value: str) -> bool:
+@functools.lru_cache(maxsize=EMAIL_VALIDATION_CACHE_SIZE)
+def _is_valid_email(value: str, check_deliverability: bool = False) -> bool:
     """Checks if a given value is a valid email.
 
+    The check is syntax-only and does no network I/O unless deliverability is requested.
+    Verdicts are memoized per address.
+
     Args:
         value: The value to check.
+        check_deliverability: Whether the email domain is also checked to accept emails, using DNS.
 
     Returns:
         True if it is a valid email. False Otherwise
     """
+    import email_validator
+
     try:
-        email_validator.validate_email(value)
+        email_validator.validate_email(value, check_deliverability=check_deliverability)
         return True
     except email_validator.EmailNotValidError:
         return False
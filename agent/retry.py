@@ -0,0 +1,154 @@
+"""Retry policy of whois queries: error classification and per-WHOIS-server circuit breakers.
+
+Transient errors are retried with exponential backoff and full jitter within a time budget. A server
+failing `failure_threshold` queries in a row is considered down: its circuit opens and the queries
+routed to it fail fast with `CircuitOpenError` instead of waiting for their own timeouts. After
+`reset_timeout` seconds, a single probe query is let through, closing the circuit if it succeeds.
+"""
+
+import enum
+import logging
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_INITIAL_WAIT = 0.5
+DEFAULT_MAX_WAIT = 10.0
+DEFAULT_TIME_BUDGET = 30.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 60.0
+
+# Network errors of a query, the server not having answered. Besides the resolver errors, connection
+# errors and timeouts, OSError covers unreachable networks and the error asyncio raises when it fails to
+# connect to every address of a server.
+RETRYABLE_ERRORS = (OSError,)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of querying a WHOIS server whose circuit is open."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Returns True for errors that may not happen again on the next attempt.
+
+    Name resolution errors are only transient when the resolver could not answer, a name that does
+    not exist will not resolve on retry.
+    """
+    if isinstance(error, socket.gaierror):
+        return error.errno == socket.EAI_AGAIN
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+class CircuitState(enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Circuit of a single server, opened by consecutive failures and closed by a successful probe."""
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+    ) -> None:
+        self._failure_threshold = max(failure_threshold, 1)
+        self._reset_timeout = reset_timeout
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def allow(self) -> bool:
+        """Returns True if a query may be sent, letting a single probe through once the circuit cools down."""
+        with self._lock:
+            if self._state is CircuitState.CLOSED:
+                return True
+            if self._state is CircuitState.HALF_OPEN:
+                return False
+            if time.monotonic() - self._opened_at < self._reset_timeout:
+                return False
+            self._state = CircuitState.HALF_OPEN
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CircuitState.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> bool:
+        """Counts a failed query.
+
+        Returns:
+            True if the failure opened the circuit.
+        """
+        with self._lock:
+            self._failures += 1
+            if (
+                self._state is CircuitState.HALF_OPEN
+                or self._failures >= self._failure_threshold
+            ):
+                opened = self._state is not CircuitState.OPEN
+                self._state = CircuitState.OPEN
+                self._opened_at = time.monotonic()
+                return opened
+            return False
+
+
+class CircuitBreakers:
+    """Holds one circuit breaker per WHOIS server."""
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+    ) -> None:
+        """Creates the breakers.
+
+        Args:
+            failure_threshold: Number of consecutive failed queries opening the circuit of a server.
+                A threshold of 0 disables the breakers.
+            reset_timeout: Seconds an open circuit waits before letting a probe query through.
+        """
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, key: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(self._failure_threshold, self._reset_timeout)
+                self._breakers[key] = breaker
+            return breaker
+
+    def check(self, key: str) -> None:
+        """Raises `CircuitOpenError` if queries to the server identified by key must not be sent."""
+        if self._failure_threshold <= 0:
+            return
+        if self._breaker(key).allow() is False:
+            raise CircuitOpenError(f"Circuit of whois server {key} is open.")
+
+    def record_success(self, key: str) -> None:
+        if self._failure_threshold <= 0:
+            return
+        self._breaker(key).record_success()
+
+    def record_failure(self, key: str) -> None:
+        if self._failure_threshold <= 0:
+            return
+        if self._breaker(key).record_failure() is True:
+            logger.warning(
+                "Opened the circuit of whois server %s for %.0fs after repeated failures.",
+                key,
+                self._reset_timeout,
+            )
@@ -0,0 +1,115 @@
+"""Scheduling of the pending lookups across WHOIS servers.
+
+Pending lookups wait in a queue per WHOIS server and source, instead of a single FIFO queue where a
+throttled server holds up the lookups that idle servers could answer. A free worker takes, among the
+servers whose rate limit lets a query through, the lookup with the highest priority, then from the
+source served the least, then the oldest one.
+"""
+
+import heapq
+import itertools
+import threading
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_PRIORITY = 0
+PRIORITY_HIGH = 1
+
+
+class LookupScheduler(Generic[T]):
+    """Thread-safe queues of pending lookups, by server and source."""
+
+    def __init__(self, take_query: Callable[[str], float]) -> None:
+        """Creates the scheduler.
+
+        Args:
+            take_query: Takes a query of a server if it has capacity now, as `ServerRateLimiter.try_acquire`.
+                Returns 0 if it was taken, otherwise the number of seconds until the server has capacity.
+        """
+        self._take_query = take_query
+        # Heaps of (-priority, sequence, item) by server and source.
+        self._queues: dict[tuple[str, str], list[tuple[int, int, T]]] = {}
+        # Lookups handed out by source, for the sources with pending lookups.
+        self._served: dict[str, int] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def __len__(self) -> int:
+        with self._condition:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def put(
+        self,
+        item: T,
+        server: str,
+        priority: int = DEFAULT_PRIORITY,
+        source: str = "",
+    ) -> None:
+        """Queues a lookup.
+
+        Args:
+            item: The pending lookup.
+            server: Key of the server answering the lookup.
+            priority: Lookups of higher priority are handed out first.
+            source: Origin of the lookup, sources being served in turn.
+        """
+        with self._condition:
+            if source not in self._served:
+                # A new source joins the round at the level of the others instead of taking over.
+                self._served[source] = min(self._served.values(), default=0)
+            heapq.heappush(
+                self._queues.setdefault((server, source), []),
+                (-priority, next(self._sequence), item),
+            )
+            self._condition.notify()
+
+    def get(self) -> tuple[T, str]:
+        """Takes the next lookup to run, waiting until a server with pending lookups has capacity.
+
+        Returns:
+            The lookup and its server, whose query was taken for the lookup.
+        """
+        with self._condition:
+            while True:
+                key, wait_time = self._next_queue()
+                if key is not None:
+                    return self._pop(key), key[0]
+                self._condition.wait(wait_time if wait_time > 0 else None)
+
+    def _next_queue(self) -> tuple[tuple[str, str] | None, float]:
+        """Takes a query of the server of the next lookup to run.
+
+        Returns:
+            The key of the queue holding the lookup, or None with the seconds until a server with pending
+            lookups has capacity, 0 if no lookup is pending.
+        """
+        ranked_keys = sorted(
+            self._queues,
+            key=lambda key: (
+                self._queues[key][0][0],
+                self._served[key[1]],
+                self._queues[key][0][1],
+            ),
+        )
+        server_delays: dict[str, float] = {}
+        for key in ranked_keys:
+            server = key[0]
+            if server not in server_delays:
+                server_delays[server] = self._take_query(server)
+                if server_delays[server] <= 0:
+                    return key, 0.0
+        return None, min(server_delays.values(), default=0.0)
+
+    def _pop(self, key: tuple[str, str]) -> T:
+        _, source = key
+        queue = self._queues[key]
+        _, _, item = heapq.heappop(queue)
+        if len(queue) == 0:
+            del self._queues[key]
+        if any(queued_source == source for _, queued_source in self._queues):
+            self._served[source] += 1
+        else:
+            del self._served[source]
+        return item
@@ -0,0 +1,177 @@
+"""Domain scanning scope checks.
+
+Scope is defined as a list of rules, compiled once into a matcher:
+
+* `example.com`: exact domain.
+* `*.example.com`: any subdomain of example.com, matched with a reversed-label suffix trie.
+* `re:.*\\.example\\.(com|org)`: regular expression, matched from the start of the domain. All the
+  regular expressions of a rule set are combined into a single alternation.
+
+Rules prefixed with `!` exclude the domains they match. A domain is in scope when it matches an include
+rule, or when there are no include rules, and matches no exclude rule. The agent checks the rules against
+the host named by the message, before reducing it to the registrable domain it looks up. The legacy
+`scope_domain_regex` is still matched against the registrable domain.
+"""
+
+import logging
+import re
+from collections.abc import Iterable
+
+logger = logging.getLogger(__name__)
+
+EXCLUDE_PREFIX = "!"
+REGEX_PREFIX = "re:"
+WILDCARD_PREFIX = "*."
+
+# Labels are never empty, so the empty string can mark the end of a suffix in the trie.
+_TERMINAL = ""
+
+_TrieNode = dict[str, "_TrieNode"]
+
+
+class _SuffixTrie:
+    """Trie of domain suffixes keyed by labels from the TLD down."""
+
+    def __init__(self) -> None:
+        self._root: _TrieNode = {}
+
+    def add(self, suffix: str) -> None:
+        node = self._root
+        for label in reversed(suffix.split(".")):
+            node = node.setdefault(label, {})
+        node[_TERMINAL] = {}
+
+    def has_parent_of(self, domain: str) -> bool:
+        """Returns True if the domain is a strict subdomain of one of the suffixes, in O(labels)."""
+        labels = domain.split(".")
+        node = self._root
+        for depth, label in enumerate(reversed(labels), start=1):
+            child = node.get(label)
+            if child is None:
+                return False
+            node = child
+            if _TERMINAL in node and depth < len(labels):
+                return True
+        return False
+
+
+class _RuleSet:
+    """Exact domains, wildcard suffixes and regular expressions, each matched by a dedicated structure."""
+
+    def __init__(self) -> None:
+        self.exact_domains: set[str] = set()
+        self.suffixes = _SuffixTrie()
+        self.has_suffixes = False
+        self.regexes: list[str] = []
+        self._pattern: re.Pattern[str] | None = None
+        self._patterns: list[re.Pattern[str]] = []
+
+    def __bool__(self) -> bool:
+        return bool(self.exact_domains) or self.has_suffixes or bool(self.regexes)
+
+    def add(self, rule: str) -> None:
+        if rule.startswith(REGEX_PREFIX):
+            self.regexes.append(rule.removeprefix(REGEX_PREFIX))
+        elif rule.startswith(WILDCARD_PREFIX):
+            self.suffixes.add(_normalize(rule.removeprefix(WILDCARD_PREFIX)))
+            self.has_suffixes = True
+        else:
+            self.exact_domains.add(_normalize(rule))
+
+    def compile(self) -> None:
+        if len(self.regexes) == 0:
+            return
+        try:
+            self._pattern = re.compile(
+                "|".join(f"(?:{regex})" for regex in self.regexes)
+            )
+        except re.error:
+            # Regexes with global flags or numbered back-references can not be combined.
+            self._patterns = [re.compile(regex) for regex in self.regexes]
+
+    def matches(self, domain: str) -> bool:
+        normalized_domain = _normalize(domain)
+        if normalized_domain in self.exact_domains:
+            return True
+        if self.has_suffixes and self.suffixes.has_parent_of(normalized_domain):
+            return True
+        if self._pattern is not None:
+            return self._pattern.match(domain) is not None
+        return any(pattern.match(domain) is not None for pattern in self._patterns)
+
+
+def _normalize(domain: str) -> str:
+    return domain.strip().lower().rstrip(".")
+
+
+class ScopeMatcher:
+    """Scope rules compiled once, checking a domain in O(labels) for exact and wildcard rules."""
+
+    def __init__(self, rules: Iterable[str] = ()) -> None:
+        self._includes = _RuleSet()
+        self._excludes = _RuleSet()
+        self._rules: list[str] = []
+        for rule in rules:
+            rule = rule.strip()
+            if rule == "":
+                continue
+            self._rules.append(rule)
+            if rule.startswith(EXCLUDE_PREFIX):
+                self._excludes.add(rule.removeprefix(EXCLUDE_PREFIX))
+            else:
+                self._includes.add(rule)
+        self._includes.compile()
+        self._excludes.compile()
+
+    def __repr__(self) -> str:
+        if len(self._rules) > 3:
+            return f"ScopeMatcher({len(self._rules)} rules)"
+        return f"ScopeMatcher({self._rules!r})"
+
+    def matches(self, domain: str) -> bool:
+        """Returns True if the domain is in scope."""
+        if self._includes and self._includes.matches(domain) is False:
+            return False
+        return bool(self._excludes) is False or self._excludes.matches(domain) is False
+
+
+def is_domain_in_scope(domain: str, scope_matcher: ScopeMatcher) -> bool:
+    """Check if a domain is in the scan scope."""
+    if scope_matcher.matches(domain) is False:
+        logger.warning(
+            "Domain %s is not in scanning scope %s",
+            domain,
+            scope_matcher,
+        )
+        return False
+    else:
+        return True
+
+
+class Scope:
+    """Scope of a scan: the scope rules, checked against hosts, and the legacy regular expression, checked
+    against registrable domains."""
+
+    def __init__(
+        self,
+        host_matcher: ScopeMatcher | None = None,
+        fld_matcher: ScopeMatcher | None = None,
+    ) -> None:
+        self._host_matcher = host_matcher or ScopeMatcher()
+        self._fld_matcher = fld_matcher
+
+    @classmethod
+    def from_args(
+        cls, scope_rules: Iterable[str] | None, scope_domain_regex: str | None
+    ) -> "Scope":
+        """Builds the scope from the scope rules and the legacy scope regular expression."""
+        fld_matcher = None
+        if scope_domain_regex is not None:
+            fld_matcher = ScopeMatcher([REGEX_PREFIX + scope_domain_regex])
+        return cls(ScopeMatcher(scope_rules or []), fld_matcher)
+
+    def contains(self, host: str, fld: str) -> bool:
+        """Returns True if the host, and its registrable domain for the legacy regular expression, are in scope."""
+        if is_domain_in_scope(host, self._host_matcher) is False:
+            return False
+        return self._fld_matcher is None or is_domain_in_scope(fld, self._fld_matcher)
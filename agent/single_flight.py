@@ -0,0 +1,55 @@
+"""Coalescing of concurrent calls for the same key into a single in-flight call."""
+
+import threading
+from collections.abc import Callable
+from concurrent import futures
+from typing import Any, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Runs a function once per key at a time, concurrent callers of the same key sharing its outcome.
+
+    The first caller of a key runs the function. Callers arriving while it runs wait for it and get the
+    same result, or the same exception raised. Once the call is done, the next caller runs it again.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, futures.Future[T]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    def do(self, key: str, function: Callable[..., T], *args: Any) -> tuple[T, bool]:
+        """Calls function with args, unless a call of the same key is in flight.
+
+        Returns:
+            The result of the call, and whether it was shared with the caller that ran it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                shared = True
+            else:
+                shared = False
+                call = futures.Future()
+                self._calls[key] = call
+        if shared is True:
+            return call.result(), True
+
+        try:
+            result = function(*args)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
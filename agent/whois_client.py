@@ -0,0 +1,270 @@
+"""Asyncio WHOIS client speaking the raw port-43 protocol and following registry and registrar referrals."""
+
+import asyncio
+import contextlib
+import functools
+import logging
+import re
+import threading
+from collections.abc import Coroutine, Mapping
+from typing import Any, TypeVar
+
+from agent import whois_parser, whois_servers
+
+logger = logging.getLogger(__name__)
+
+WHOIS_PORT = 43
+IANA_SERVER = "whois.iana.org"
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MAX_REFERRALS = 2
+
+_IANA_WHOIS_PATTERN = re.compile(r"^whois:[ \t]+(\S+)", re.IGNORECASE | re.MULTILINE)
+_REFERRAL_PATTERN = re.compile(
+    r"^[ \t]*(?:Registrar WHOIS Server|Whois Server|ReferralServer|refer):[ \t]*"
+    r"(?:r?whois://)?(\S+)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+T = TypeVar("T")
+
+
+@functools.cache
+def _offline_nic_client() -> Any:
+    """Returns a NIC client resolving WHOIS servers from the python-whois tables only, without querying IANA."""
+    import whois
+
+    class _OfflineNICClient(whois.NICClient):  # type: ignore[misc]
+        def findwhois_iana(self, tld: str) -> str | None:
+            del tld
+            return None
+
+    return _OfflineNICClient()
+
+
+@functools.cache
+def _mapped_nic_client_class() -> type:
+    """Returns a NIC client class asking IANA only for the TLDs missing from a `WhoisServers` map."""
+    import whois
+
+    class _MappedNICClient(whois.NICClient):  # type: ignore[misc]
+        def __init__(self, servers: whois_servers.WhoisServers) -> None:
+            super().__init__()
+            self._servers = servers
+
+        def findwhois_iana(self, tld: str) -> str | None:
+            server = self._servers.get(tld)
+            if server is not None:
+                return server
+            iana_server: str | None = super().findwhois_iana(tld)
+            if iana_server is not None:
+                iana_server = iana_server.strip()
+                self._servers.learn(tld, iana_server)
+            return iana_server
+
+    return _MappedNICClient
+
+
+def nic_lookup(
+    domain_name: str, servers: whois_servers.WhoisServers
+) -> Mapping[str, Any]:
+    """Looks a domain up with python-whois, as `whois.whois` does, reading the WHOIS servers from a map.
+
+    Socket errors are raised to be retried, instead of being returned as the response text.
+    """
+    import whois
+
+    domain_name = domain_name.encode("idna").decode("utf-8")
+    nic_client = _mapped_nic_client_class()(servers)
+    text: str = nic_client.whois_lookup(
+        None, domain_name, 0, ignore_socket_errors=False
+    )
+    if text == "":
+        raise whois.exceptions.WhoisCommandFailedError(
+            "Whois command returned no output"
+        )
+    entry: Mapping[str, Any] = whois.parser.WhoisEntry.load(domain_name, text)
+    return entry
+
+
+def load_whois_servers() -> None:
+    """Loads the python-whois server tables, which are otherwise imported by the first lookup."""
+    _offline_nic_client()
+
+
+def known_whois_server(domain_name: str) -> str | None:
+    """Returns the WHOIS server of a domain from the python-whois tables, without any network access."""
+    try:
+        server: str | None = _offline_nic_client().choose_server(domain_name)
+    except UnicodeError:
+        return None
+    return server
+
+
+def find_referral(text: str) -> str | None:
+    """Returns the WHOIS server a response refers to, if any."""
+    match = _REFERRAL_PATTERN.search(text)
+    if match is None:
+        return None
+    server = match.group(1).rstrip("/")
+    # Referrals to web pages can not be queried over port 43.
+    if server == "" or "/" in server:
+        return None
+    return server
+
+
+def _format_query(server: str, domain_name: str) -> str:
+    """Formats the query with the server-specific flags python-whois uses."""
+    import whois
+
+    if server == whois.NICClient.DENICHOST:
+        return f"-T dn,ace -C UTF-8 {domain_name}"
+    if server == whois.NICClient.DK_HOST:
+        return f" --show-handles {domain_name}"
+    if server.endswith(".jp"):
+        return f"{domain_name}/e"
+    return domain_name
+
+
+class EventLoopThread:
+    """Event loop run by a daemon thread, shared by the threads running lookups of the asyncio client.
+
+    Creating an event loop per lookup costs more than the exchange itself on a fast server, and keeps the
+    exchanges of the lookup workers from overlapping on a single loop.
+    """
+
+    def __init__(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="whois_loop", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Runs a coroutine on the loop, blocking the calling thread until it completes."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def stop(self) -> None:
+        """Stops the loop once the running coroutines yield, and closes it."""
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        self._loop.close()
+
+
+class AsyncWhoisClient:
+    """Port-43 WHOIS client running every network exchange on the asyncio event loop."""
+
+    def __init__(
+        self,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_referrals: int = DEFAULT_MAX_REFERRALS,
+        port: int = WHOIS_PORT,
+        servers: whois_servers.WhoisServers | None = None,
+    ) -> None:
+        """Creates the client.
+
+        Args:
+            timeout: Timeout in seconds of each hop, covering connection and response.
+            max_referrals: Maximum number of referrals followed after the first server.
+            port: Port of the WHOIS servers.
+            servers: Map of the WHOIS servers read before asking IANA, and completed with its answers.
+        """
+        self._timeout = timeout
+        self._max_referrals = max_referrals
+        self._port = port
+        self._servers = servers
+
+    async def query(self, server: str, query: str) -> str:
+        """Sends a raw query to a WHOIS server and returns its full response.
+
+        Raises:
+            OSError: If the server can not be reached.
+            TimeoutError: If the exchange takes longer than the per-hop timeout.
+        """
+        return await asyncio.wait_for(self._exchange(server, query), self._timeout)
+
+    async def _exchange(self, server: str, query: str) -> str:
+        reader, writer = await asyncio.open_connection(server, self._port)
+        try:
+            writer.write(query.encode("utf-8") + b"\r\n")
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+            with contextlib.suppress(OSError):
+                await writer.wait_closed()
+        return response.decode("utf-8", "replace")
+
+    async def find_tld_server(self, tld: str) -> str | None:
+        """Asks IANA for the WHOIS server of a TLD, returns None if IANA knows none."""
+        response = await self.query(IANA_SERVER, tld)
+        match = _IANA_WHOIS_PATTERN.search(response)
+        if match is None:
+            return None
+        return match.group(1)
+
+    async def find_server(self, domain_name: str) -> str:
+        """Returns the WHOIS server of a domain, asking IANA when it is not known locally."""
+        server = known_whois_server(domain_name)
+        if server is not None:
+            return server
+        tld = domain_name.rsplit(".", 1)[-1]
+        if self._servers is not None:
+            server = self._servers.get(tld)
+            if server is not None:
+                return server
+        server = await self.find_tld_server(tld)
+        if server is None:
+            from whois import exceptions as whois_exceptions
+
+            raise whois_exceptions.UnknownTldError(
+                f"No whois server is known for .{tld}"
+            )
+        if self._servers is not None:
+            self._servers.learn(tld, server)
+        return server
+
+    async def lookup(self, domain_name: str, server: str | None = None) -> str:
+        """Queries the WHOIS server of a domain and the servers it refers to.
+
+        Args:
+            domain_name: Domain to lookup.
+            server: WHOIS server to query first, resolved from the domain when not set.
+
+        Returns:
+            The concatenated raw responses of every hop, as python-whois returns them.
+        """
+        domain_name = domain_name.encode("idna").decode("utf-8")
+        if server is None:
+            server = await self.find_server(domain_name)
+        text = await self.query(server, _format_query(server, domain_name))
+        response = text
+        visited = {server.lower()}
+        for _ in range(self._max_referrals):
+            referral = find_referral(text)
+            if referral is None or referral.lower() in visited:
+                break
+            visited.add(referral.lower())
+            try:
+                text = await self.query(referral, _format_query(referral, domain_name))
+            except (OSError, TimeoutError) as e:
+                # The registry answer is kept when the registrar server is unreachable.
+                logger.warning(
+                    "Referral to %s failed for %s: %s", referral, domain_name, e
+                )
+                break
+            response += text
+        if response.strip() == "":
+            from whois import exceptions as whois_exceptions
+
+            raise whois_exceptions.WhoisCommandFailedError(
+                "Whois command returned no output"
+            )
+        return response
+
+
+def parse(domain_name: str, text: str) -> Mapping[str, Any]:
+    """Parses a raw WHOIS response, extracting the fields lazily for the TLDs `whois_parser` has a table of."""
+    return whois_parser.parse(domain_name, text)
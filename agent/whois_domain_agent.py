@@ -1,37 +1,127 @@
 """Whois Domain Agent: Agent responsible for retrieving WHOIS information of a domain."""
 
+import asyncio
+import contextlib
 import logging
-import re
+import signal
 import socket
-from typing import cast
+import threading
+import wsgiref.simple_server
+from collections.abc import Coroutine, Mapping
+from concurrent import futures
+from typing import Any, TypeVar
 
 import tenacity
-import tld
-import whois
 from ostorlab.agent import agent
 from ostorlab.agent import definitions as agent_definitions
 from ostorlab.agent.message import message as msg
 from ostorlab.agent.mixins import agent_persist_mixin as persist_mixin
 from ostorlab.runtimes import definitions as runtime_definitions
-from rich import logging as rich_logging
-from whois import exceptions as whois_exceptions
-
-from agent import result_parser
-
-logging.basicConfig(
-    format="%(message)s",
-    datefmt="[%X]",
-    handlers=[
-        rich_logging.RichHandler(rich_tracebacks=True),
-    ],
-    level="INFO",
-    force=True,
+
+from agent import cache as whois_cache
+from agent import (
+    change_detection,
+    dedup,
+    emission,
+    metrics,
+    normalizer,
+    profiling,
+    rate_limiter,
+    rdap,
+    result_parser,
+    retry,
+    scheduler,
+    scope,
+    single_flight,
+    whois_client,
+    whois_servers,
 )
+
 logger = logging.getLogger(__name__)
 
 LIB_SELECTOR = "v3.asset.domain_name.whois"
-WAIT_TIME = 10
-RETRY_NUMBER = 3
+DEDUP_SET_KEY = "agent_whois_domain_asset"
+# Number of lookups that may wait for a free worker before `process` blocks, per worker.
+PENDING_LOOKUPS_PER_WORKER = 2
+
+T = TypeVar("T")
+
+
+def _number_arg(args: dict[str, Any], name: str, default: float) -> float:
+    """Reads a number argument where 0 is meaningful, falling back to default only when it is not set."""
+    value = args.get(name)
+    return float(default if value is None else value)
+
+
+def _in_event_loop() -> bool:
+    """Tells whether the current thread runs an event loop, which waiting on the bus sends would deadlock."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _error_label(error: Exception) -> str:
+    """Returns the `whois_errors_total` label of a retryable query error."""
+    if isinstance(error, socket.gaierror):
+        return "dns"
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    return "connection"
+
+
+def prewarm() -> None:
+    """Loads the public suffixes, the python-whois server tables and the email validator.
+
+    These are otherwise loaded by the first message, python-whois and the email validator being
+    imported on first use to shorten the agent start.
+    """
+    normalizer.load_public_suffixes()
+    whois_client.load_whois_servers()
+    result_parser.load_email_validator()
+
+
+def _configure_logging() -> None:
+    from rich import logging as rich_logging
+
+    logging.basicConfig(
+        format="%(message)s",
+        datefmt="[%X]",
+        handlers=[
+            rich_logging.RichHandler(rich_tracebacks=True),
+        ],
+        level="INFO",
+        force=True,
+    )
+
+
+def _load_rdap_endpoints(bootstrap_path: str | None) -> dict[str, str]:
+    """Loads the RDAP servers from the cached bootstrap file, falling back to the bundled snapshot."""
+    if bootstrap_path is not None:
+        try:
+            return rdap.load_bootstrap(bootstrap_path)
+        except (OSError, ValueError) as e:
+            logger.warning(
+                "Could not read the RDAP bootstrap file %s, using the bundled one: %s",
+                bootstrap_path,
+                e,
+            )
+    return rdap.load_bootstrap()
+
+
+def _load_whois_servers(snapshot_path: str | None) -> dict[str, str]:
+    """Loads the WHOIS servers from a local snapshot, falling back to the bundled one."""
+    if snapshot_path is not None:
+        try:
+            return whois_servers.load_snapshot(snapshot_path)
+        except (OSError, ValueError) as e:
+            logger.warning(
+                "Could not read the whois servers snapshot %s, using the bundled one: %s",
+                snapshot_path,
+                e,
+            )
+    return whois_servers.load_snapshot()
 
 
 class AgentWhoisDomain(agent.Agent, persist_mixin.AgentPersistMixin):
@@ -42,9 +132,188 @@ class AgentWhoisDomain(agent.Agent, persist_mixin.AgentPersistMixin):
         agent_definition: agent_definitions.AgentDefinition,
         agent_settings: runtime_definitions.AgentSettings,
     ) -> None:
+        # Backs `_control_message`, which is set by the base agent constructor.
+        self._thread_state = threading.local()
         agent.Agent.__init__(self, agent_definition, agent_settings)
         persist_mixin.AgentPersistMixin.__init__(self, agent_settings)
-        self._scope_domain_regex: str | None = self.args.get("scope_domain_regex")
+        args = self.args
+        # Tables are loaded while the agent connects to the bus, the first message waits for them.
+        self._prewarm_thread: threading.Thread | None = None
+        if args.get("prewarm") is not False:
+            self._prewarm_thread = threading.Thread(
+                target=prewarm, name="prewarm", daemon=True
+            )
+            self._prewarm_thread.start()
+        self._check_email_deliverability = bool(args.get("check_email_deliverability"))
+        self._scope = scope.Scope.from_args(
+            args.get("scope_rules"), args.get("scope_domain_regex")
+        )
+        self._priority_matcher: scope.ScopeMatcher | None = None
+        if args.get("priority_scope_rules") is not None:
+            self._priority_matcher = scope.ScopeMatcher(args["priority_scope_rules"])
+        self._dedup_filter = dedup.LocalDedupFilter(
+            max_size=int(
+                _number_arg(
+                    args, "dedup_local_cache_size", dedup.DEFAULT_DEDUP_CACHE_SIZE
+                )
+            )
+        )
+        self._cache = whois_cache.WhoisCache(
+            max_size=int(
+                _number_arg(args, "cache_size", whois_cache.DEFAULT_CACHE_SIZE)
+            ),
+            ttl=_number_arg(args, "cache_ttl", whois_cache.DEFAULT_CACHE_TTL),
+            path=args.get("cache_path"),
+            negative_ttl=_number_arg(
+                args, "negative_cache_ttl", whois_cache.DEFAULT_NEGATIVE_CACHE_TTL
+            ),
+            negative_timeout_ttl=_number_arg(
+                args,
+                "negative_cache_timeout_ttl",
+                whois_cache.DEFAULT_NEGATIVE_CACHE_TIMEOUT_TTL,
+            ),
+        )
+        self._rate_limiter = rate_limiter.ServerRateLimiter(
+            rate=_number_arg(args, "whois_server_rate", rate_limiter.DEFAULT_RATE),
+            burst=int(args.get("whois_server_burst") or rate_limiter.DEFAULT_BURST),
+            server_rates=args.get("whois_server_rates"),
+        )
+        self._circuit_breakers = retry.CircuitBreakers(
+            failure_threshold=int(
+                _number_arg(
+                    args,
+                    "circuit_breaker_threshold",
+                    retry.DEFAULT_FAILURE_THRESHOLD,
+                )
+            ),
+            reset_timeout=_number_arg(
+                args, "circuit_breaker_reset_timeout", retry.DEFAULT_RESET_TIMEOUT
+            ),
+        )
+        # Waits are drawn uniformly up to an exponentially growing bound, so that the lookups failing
+        # together on a server do not retry together.
+        self._retrying = tenacity.Retrying(
+            stop=tenacity.stop_after_attempt(
+                int(args.get("retry_max_attempts") or retry.DEFAULT_MAX_ATTEMPTS)
+            )
+            | tenacity.stop_before_delay(
+                _number_arg(args, "retry_time_budget", retry.DEFAULT_TIME_BUDGET)
+            ),
+            wait=tenacity.wait_random_exponential(
+                multiplier=_number_arg(
+                    args, "retry_initial_wait", retry.DEFAULT_INITIAL_WAIT
+                ),
+                max=_number_arg(args, "retry_max_wait", retry.DEFAULT_MAX_WAIT),
+            ),
+            retry=tenacity.retry_if_exception(retry.is_retryable),
+            before_sleep=self._count_retry,
+            reraise=True,
+        )
+        self._whois_servers: whois_servers.WhoisServers | None = None
+        if args.get("whois_server_discovery") is True:
+            self._whois_servers = whois_servers.WhoisServers(
+                _load_whois_servers(args.get("whois_servers_path")),
+                store=self,
+                refresh_interval=_number_arg(
+                    args,
+                    "whois_servers_refresh_interval",
+                    whois_servers.DEFAULT_REFRESH_INTERVAL,
+                ),
+            )
+        self._whois_client: whois_client.AsyncWhoisClient | None = None
+        self._whois_loop: whois_client.EventLoopThread | None = None
+        if args.get("whois_backend") == "asyncio":
+            self._whois_client = whois_client.AsyncWhoisClient(
+                servers=self._whois_servers
+            )
+            self._whois_loop = whois_client.EventLoopThread()
+            self._whois_loop.start()
+        if self._whois_servers is not None:
+            iana_client = self._whois_client or whois_client.AsyncWhoisClient()
+            self._whois_servers.start(
+                lambda tld: self._run_async(iana_client.find_tld_server(tld))
+            )
+        self._rdap_client: rdap.RdapClient | None = None
+        if args.get("rdap_enabled") is True:
+            self._rdap_client = rdap.RdapClient(
+                _load_rdap_endpoints(args.get("rdap_bootstrap_path")),
+                max_connections=int(
+                    args.get("rdap_max_connections") or rdap.DEFAULT_MAX_CONNECTIONS
+                ),
+            )
+        self._change_detector: change_detection.ChangeDetector | None = None
+        change_detection_mode = change_detection.Mode(
+            args.get("change_detection") or change_detection.Mode.OFF.value
+        )
+        if change_detection_mode is not change_detection.Mode.OFF:
+            self._change_detector = change_detection.ChangeDetector(
+                self,
+                change_detection_mode,
+                diff=args.get("change_detection_diff") is True,
+            )
+        # Lookups of the same domain racing past the dedup check share a single query.
+        self._lookups_in_flight: single_flight.SingleFlight[dict[str, Any] | None] = (
+            single_flight.SingleFlight()
+        )
+        self._lookup_executor: futures.ThreadPoolExecutor | None = None
+        self._pending_lookups: threading.BoundedSemaphore | None = None
+        self._lookup_scheduler: (
+            scheduler.LookupScheduler[tuple[str, msg.Message | None]] | None
+        ) = None
+        max_concurrent_lookups = int(args.get("max_concurrent_lookups") or 1)
+        if max_concurrent_lookups > 1:
+            self._lookup_executor = futures.ThreadPoolExecutor(
+                max_workers=max_concurrent_lookups, thread_name_prefix="whois_lookup"
+            )
+            self._pending_lookups = threading.BoundedSemaphore(
+                max_concurrent_lookups
+                + int(
+                    args.get("max_pending_lookups")
+                    or max_concurrent_lookups * PENDING_LOOKUPS_PER_WORKER
+                )
+            )
+            self._lookup_scheduler = scheduler.LookupScheduler(
+                self._rate_limiter.try_acquire
+            )
+        self._metrics = metrics.WhoisMetrics()
+        self._metrics_server: wsgiref.simple_server.WSGIServer | None = None
+        if args.get("metrics_port") is not None:
+            self._metrics_server = metrics.serve(
+                self._metrics.registry, int(args["metrics_port"])
+            )
+        self._metrics_snapshot: metrics.SnapshotWriter | None = None
+        if args.get("metrics_path") is not None:
+            self._metrics_snapshot = metrics.SnapshotWriter(
+                self._metrics.registry,
+                args["metrics_path"],
+                interval=_number_arg(
+                    args, "metrics_snapshot_interval", metrics.DEFAULT_SNAPSHOT_INTERVAL
+                ),
+            )
+            self._metrics_snapshot.start()
+        self._profiler: profiling.SampledProfiler | None = None
+        if args.get("profile_dir") is not None:
+            self._profiler = profiling.SampledProfiler(
+                args["profile_dir"],
+                sample_rate=int(
+                    args.get("profile_sample_rate") or profiling.DEFAULT_SAMPLE_RATE
+                ),
+                max_dumps=int(
+                    args.get("profile_max_dumps") or profiling.DEFAULT_MAX_DUMPS
+                ),
+            )
+
+    @property
+    def _control_message(self) -> msg.Message | None:
+        """Control message of the message processed by the current thread, used by `emit`."""
+        control_message: msg.Message | None = getattr(
+            self._thread_state, "control_message", None
+        )
+        return control_message
+
+    @_control_message.setter
+    def _control_message(self, value: msg.Message | None) -> None:
+        self._thread_state.control_message = value
 
     def process(self, message: msg.Message) -> None:
         """Starts a whois scan, wait for the scan to finish,
@@ -53,83 +322,421 @@ class AgentWhoisDomain(agent.Agent, persist_mixin.AgentPersistMixin):
         Args:
             message:  The message to process from ostorlab runtime.
         """
+        with self._metrics.process_duration.time(), self._sample("process"):
+            self._process(message)
+
+    def _process(self, message: msg.Message) -> None:
+        self.wait_for_prewarm()
         domain = message.data.get("name")
         if domain is None or domain == "":
             return
 
-        domain_object = cast(
-            tld.Result,
-            tld.get_tld(domain, as_object=True, fix_protocol=True, fail_silently=True),
-        )
+        normalized_domain = normalizer.normalize(domain)
 
-        if domain_object is not None:
+        if normalized_domain is not None:
             logger.info("Processing message of selector : %s.", message.selector)
-            if self.set_add("agent_whois_domain_asset", domain_object.fld) is False:
-                logger.info(
-                    "target %s was processed before, exiting", domain_object.fld
-                )
+            fld = normalized_domain.fld
+            # Rules are written for the hosts of the scan, which share the whois record of their fld.
+            if self._scope.contains(normalized_domain.host, fld) is False:
                 return
-            if self._is_domain_in_scope(domain_object.fld) is False:
+            if self._is_processed_before(fld) is True:
+                logger.info("target %s was processed before, exiting", fld)
                 return
 
-            try:
-                scan_output = self._fetch_whois(domain_object.fld)
-                if scan_output is None:
-                    return
-                self._emit_result(scan_output)
-            except whois_exceptions.PywhoisError as e:
-                logger.error(e)
+            if self._lookup_executor is None:
+                self._lookup_and_emit(fld)
+            else:
+                self._submit_lookup(
+                    fld, priority=self._lookup_priority(normalized_domain.host)
+                )
         else:
             logger.error("domain is not a valid URL: %s", domain)
 
-    def _is_domain_in_scope(self, domain: str) -> bool:
-        """Check if a domain is in the scan scope with a regular expression."""
-        if self._scope_domain_regex is None:
-            return True
-        domain_in_scope = re.match(self._scope_domain_regex, domain)
-        if domain_in_scope is None:
-            logger.warning(
-                "Domain %s is not in scanning scope %s",
-                domain,
-                self._scope_domain_regex,
+    def wait_for_prewarm(self) -> None:
+        """Blocks until the tables loaded in the background at start are ready."""
+        if self._prewarm_thread is not None:
+            self._prewarm_thread.join()
+            self._prewarm_thread = None
+
+    def _sample(self, name: str) -> contextlib.AbstractContextManager[None]:
+        """Profiles the block when profiling is enabled and the call is sampled."""
+        if self._profiler is None:
+            return contextlib.nullcontext()
+        return self._profiler.sample(name)
+
+    def run(self) -> None:
+        """Runs the agent, which drains its in-flight lookups on SIGTERM before the event loop stops."""
+        # The loop of the base agent, which serves the bus connection the results are sent on.
+        self._loop.add_signal_handler(signal.SIGTERM, self._drain_and_stop, self._loop)
+        super().run()
+
+    def _drain_and_stop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Runs `at_exit` off the event loop, which keeps sending the drained results, then stops the loop.
+
+        A second SIGTERM kills the agent without waiting for the lookups.
+        """
+        logger.info("Received SIGTERM, waiting for the in-flight lookups.")
+        loop.remove_signal_handler(signal.SIGTERM)
+        drained = loop.run_in_executor(None, self.at_exit)
+        drained.add_done_callback(lambda _: loop.stop())
+
+    def at_exit(self) -> None:
+        """Waits for the in-flight lookups to be emitted and writes the last metrics before the agent exits.
+
+        Results are sent through the event loop of the agent: when called from that loop, the shutdown runs
+        on a daemon thread instead of blocking it.
+        """
+        if _in_event_loop() is True:
+            threading.Thread(
+                target=self._shut_down, name="shut_down", daemon=True
+            ).start()
+            return
+        self._shut_down()
+
+    def _shut_down(self) -> None:
+        """Drains the lookups and stops the background threads."""
+        self.wait_for_lookups()
+        if self._metrics_snapshot is not None:
+            self._metrics_snapshot.stop()
+        if self._metrics_server is not None:
+            self._metrics_server.shutdown()
+        if self._rdap_client is not None:
+            self._rdap_client.close()
+        if self._whois_servers is not None:
+            self._whois_servers.stop()
+        if self._whois_loop is not None:
+            self._whois_loop.stop()
+
+    def wait_for_lookups(self) -> None:
+        """Blocks until all the submitted lookups are done and shuts down the worker pool."""
+        if self._lookup_executor is not None:
+            self._lookup_executor.shutdown(wait=True)
+            self._lookup_executor = None
+
+    def _submit_lookup(
+        self, domain_name: str, priority: int = scheduler.DEFAULT_PRIORITY
+    ) -> None:
+        """Hands a lookup to the worker pool, blocking while too many lookups are pending.
+
+        Once `at_exit` shut the pool down, the lookup runs inline, so that its message is acknowledged
+        after its results are emitted.
+        """
+        executor = self._lookup_executor
+        if self._pending_lookups is None or self._lookup_scheduler is None:
+            raise ValueError("Concurrent lookups are not enabled.")
+        if executor is None:
+            self._lookup_and_emit(domain_name)
+            return
+        if self._needs_query(domain_name) is False:
+            # Cache and in-flight hits send no query: they skip the queues and rate limit of the server.
+            self._pending_lookups.acquire()
+            try:
+                future = executor.submit(
+                    self._run_lookup, domain_name, self._control_message
+                )
+            except RuntimeError:
+                self._pending_lookups.release()
+                self._lookup_and_emit(domain_name)
+                return
+            future.add_done_callback(self._on_lookup_done)
+            return
+
+        server_key = self._server_key(domain_name)
+        source = self._message_source()
+        self._pending_lookups.acquire()
+        try:
+            self._lookup_scheduler.put(
+                (domain_name, self._control_message),
+                server=server_key,
+                priority=priority,
+                source=source,
             )
-            return False
-        else:
-            return True
+        except Exception:
+            self._pending_lookups.release()
+            raise
+        try:
+            # Each task runs the lookup picked by the scheduler, not necessarily this one.
+            future = executor.submit(self._run_next_lookup)
+        except RuntimeError:
+            # The pool was shut down meanwhile: the queued lookup it will not run is run inline.
+            self._pending_lookups.release()
+            self._run_next_lookup()
+            return
+        future.add_done_callback(self._on_lookup_done)
 
-    @tenacity.retry(
-        stop=tenacity.stop_after_attempt(RETRY_NUMBER),
-        wait=tenacity.wait_fixed(WAIT_TIME),
-        retry=tenacity.retry_if_exception_type(
-            (socket.gaierror, ConnectionError, TimeoutError)
-        ),
-        retry_error_callback=lambda retry_state: None,
-    )
-    def _fetch_whois(self, domain_name: str) -> whois.parser.WhoisCom | None:
-        """Collect whois data.
+    def _needs_query(self, domain_name: str) -> bool:
+        """Tells whether a lookup queries the server, being answered by neither the cache nor a lookup in flight."""
+        return (
+            domain_name not in self._lookups_in_flight
+            and self._cache.get(domain_name) is None
+            and self._cache.get_failure(domain_name) is None
+        )
+
+    def _lookup_priority(self, host: str) -> int:
+        """Looks up the domains of the hosts matching the priority scope rules first."""
+        if self._priority_matcher is not None and self._priority_matcher.matches(host):
+            return scheduler.PRIORITY_HIGH
+        return scheduler.DEFAULT_PRIORITY
+
+    def _message_source(self) -> str:
+        """Returns the agent that sent the message being processed, whose lookups are served in turn."""
+        if self._control_message is None:
+            return ""
+        agents = self._control_message.data.get("control", {}).get("agents", [])
+        return str(agents[-1]) if len(agents) > 0 else ""
+
+    def _run_next_lookup(self) -> None:
+        """Runs the next lookup picked by the scheduler, the query of its server being already taken."""
+        if self._lookup_scheduler is None:
+            raise ValueError("Concurrent lookups are not enabled.")
+        (domain_name, control_message), server_key = self._lookup_scheduler.get()
+        self._thread_state.reserved_server = server_key
+        try:
+            self._run_lookup(domain_name, control_message)
+        finally:
+            if self._thread_state.reserved_server is not None:
+                # No query was sent, e.g. the domain was cached meanwhile or the circuit is open.
+                self._rate_limiter.refund(server_key)
+            self._thread_state.reserved_server = None
+
+    def _on_lookup_done(self, future: futures.Future[None]) -> None:
+        """Frees the pending lookup slot and reports unexpected worker failures."""
+        if self._pending_lookups is not None:
+            self._pending_lookups.release()
+        exception = future.exception()
+        if exception is not None:
+            logger.error("Whois lookup failed: %s", exception, exc_info=exception)
+
+    def _run_lookup(
+        self, domain_name: str, control_message: msg.Message | None
+    ) -> None:
+        """Runs a lookup on a pool worker, which is profiled apart from `process`."""
+        with self._sample("lookup"):
+            self._lookup_and_emit(domain_name, control_message)
+
+    def _lookup_and_emit(
+        self, domain_name: str, control_message: msg.Message | None = None
+    ) -> None:
+        """Fetches the whois data of a domain and emits the parsed results.
 
         Args:
-            domain_name: Target domain to lookup.
+            domain_name: Registrable domain to lookup.
+            control_message: Control message of the originating message, when run by a pool worker.
         """
-        logger.info("Starting a new scan for %s .", domain_name)
+        from whois import exceptions as whois_exceptions
+
+        if control_message is not None:
+            self._control_message = control_message
+        try:
+            scan_output = self._lookup(domain_name)
+            if scan_output is None:
+                return
+            self._emit_result(scan_output)
+        except (whois_exceptions.PywhoisError, rdap.RdapError) as e:
+            logger.error(e)
+
+    def _is_processed_before(self, domain: str) -> bool:
+        """Checks the local dedup filter first and only asks the shared persist set on a local miss."""
+        if self._dedup_filter.check(domain) is True:
+            self._metrics.dedup.labels(result="local_hit").inc()
+            return True
+        processed_before = self.set_add(DEDUP_SET_KEY, domain) is False
+        self._dedup_filter.add(domain)
+        self._metrics.dedup.labels(
+            result="shared_hit" if processed_before else "miss"
+        ).inc()
+        return processed_before
+
+    def _lookup(self, domain_name: str) -> dict[str, Any] | None:
+        """Returns the whois data of a domain from the cache, fetching and caching it on a miss.
+
+        Failed lookups are cached as well, so that known-bad domains are rejected immediately. Concurrent
+        lookups of a domain missing from the cache wait for a single query and share its outcome.
+        """
+        cached_output = self._cache.get(domain_name)
+        if cached_output is not None:
+            logger.info("whois data for %s found in cache.", domain_name)
+            self._metrics.cache.labels(result="hit").inc()
+            return cached_output
+        failure = self._cache.get_failure(domain_name)
+        if failure is not None:
+            self._metrics.cache.labels(result="negative_hit").inc()
+            logger.info(
+                "skipping %s, a previous lookup failed with %s.",
+                domain_name,
+                failure.value,
+            )
+            return None
+        self._metrics.cache.labels(result="miss").inc()
+
+        scan_output, shared = self._lookups_in_flight.do(
+            domain_name, self._fetch_and_cache, domain_name
+        )
+        if shared is True:
+            self._metrics.coalesced_lookups.inc()
+        return scan_output
+
+    def _fetch_and_cache(self, domain_name: str) -> dict[str, Any] | None:
+        """Fetches the whois data of a domain and caches the result or the failure."""
+        from whois import exceptions as whois_exceptions
+
+        # A lookup of the domain may have completed between the cache checks and the start of this one.
+        cached_output = self._cache.get(domain_name)
+        if cached_output is not None:
+            return cached_output
+        if self._cache.get_failure(domain_name) is not None:
+            return None
         try:
-            whois_output = whois.whois(domain_name)
+            scan_output = self._fetch_whois(domain_name)
+        except (whois_exceptions.PywhoisError, rdap.RdapError) as e:
+            self._metrics.errors.labels(error="pywhois").inc()
+            self._cache.set_failure(domain_name, whois_cache.classify_failure(e))
+            raise
         except UnicodeError as e:
+            self._metrics.errors.labels(error="unicode").inc()
             logger.error(
                 "Unicode error when fetching whois for %s : %s", domain_name, e
             )
+            self._cache.set_failure(domain_name, whois_cache.classify_failure(e))
             return None
+        except retry.RETRYABLE_ERRORS as e:
+            logger.error("Failed to fetch whois for %s: %r", domain_name, e)
+            self._cache.set_failure(domain_name, whois_cache.classify_failure(e))
+            return None
+        except retry.CircuitOpenError as e:
+            # The server is down, not the domain: the failure is not cached.
+            self._metrics.errors.labels(error="circuit_open").inc()
+            logger.warning("Skipping whois lookup of %s: %s", domain_name, e)
+            return None
+        if scan_output is None:
+            return None
+        cached_output = result_parser.intern_whois_data(scan_output)
+        self._cache.set(domain_name, cached_output)
+        return cached_output
+
+    def _fetch_whois(self, domain_name: str) -> Mapping[str, Any] | None:
+        """Collect whois data, retrying transient errors with backoff.
+
+        Args:
+            domain_name: Target domain to lookup.
+
+        Raises:
+            CircuitOpenError: If the whois server of the domain is considered down.
+        """
+        whois_output: Mapping[str, Any] | None = self._retrying.copy()(
+            self._fetch_whois_once, domain_name
+        )
+        return whois_output
+
+    def _count_retry(self, retry_state: tenacity.RetryCallState) -> None:
+        """Counts a retry of `_fetch_whois_once` in the metrics."""
+        domain_name = retry_state.args[0]
+        self._metrics.retries.labels(server=self._server_key(domain_name)).inc()
+
+    def _server_key(self, domain_name: str) -> str:
+        """Returns the server answering the queries of a domain, RDAP servers taking precedence."""
+        if self._rdap_client is not None:
+            rdap_server = self._rdap_client.server(domain_name)
+            if rdap_server is not None:
+                return rdap_server
+        return rate_limiter.whois_server_key(domain_name)
+
+    def _fetch_whois_once(self, domain_name: str) -> Mapping[str, Any] | None:
+        """Makes a single whois query attempt, guarded by the circuit breaker and the rate limit of the server."""
+        from whois import exceptions as whois_exceptions
+
+        logger.info("Starting a new scan for %s .", domain_name)
+        server_key = self._server_key(domain_name)
+        self._circuit_breakers.check(server_key)
+        if getattr(self._thread_state, "reserved_server", None) == server_key:
+            # The scheduler took the query of the server when it handed out the lookup.
+            self._thread_state.reserved_server = None
+        else:
+            self._rate_limiter.acquire(server_key)
+        normalized_domain = normalizer.normalize(domain_name)
+        tld = (
+            normalized_domain.tld
+            if normalized_domain is not None
+            else domain_name.rsplit(".", 1)[-1]
+        )
+        try:
+            with self._metrics.lookup_duration.labels(
+                tld=tld, server=server_key
+            ).time():
+                whois_output = self._query_whois(domain_name)
+        except retry.RETRYABLE_ERRORS as e:
+            self._metrics.errors.labels(error=_error_label(e)).inc()
+            self._circuit_breakers.record_failure(server_key)
+            self._rate_limiter.penalize(server_key)
+            raise
+        except (whois_exceptions.PywhoisError, rdap.RdapError):
+            # The server answered, e.g. that the domain is unknown.
+            self._circuit_breakers.record_success(server_key)
+            raise
+        self._circuit_breakers.record_success(server_key)
         logger.info("done scanning %s .", domain_name)
         return whois_output
 
-    def _emit_result(self, scan_output: whois.parser.WhoisCom) -> None:
+    def _query_whois(self, domain_name: str) -> Mapping[str, Any]:
+        """Queries the RDAP server of a domain when it is known, its whois servers with the configured backend otherwise."""
+        if (
+            self._rdap_client is not None
+            and self._rdap_client.endpoint(domain_name) is not None
+        ):
+            return self._rdap_client.lookup(domain_name)
+        if self._whois_client is None:
+            if self._whois_servers is not None:
+                return whois_client.nic_lookup(domain_name, self._whois_servers)
+            import whois
+
+            whois_output: Mapping[str, Any] = whois.whois(domain_name)
+            return whois_output
+        raw_output = self._run_async(self._whois_client.lookup(domain_name))
+        return whois_client.parse(domain_name, raw_output)
+
+    def _run_async(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Runs a coroutine of the asyncio client on the loop shared by the lookups, on its own loop otherwise."""
+        if self._whois_loop is None:
+            return asyncio.run(coroutine)
+        return self._whois_loop.run(coroutine)
+
+    def _emit_result(self, scan_output: Mapping[str, Any]) -> None:
         """After the scan is done, emit the scan findings."""
 
         logger.info("emitting results for %s", scan_output.get("domain_name"))
-        for m in result_parser.parse_results(scan_output):
-            self.emit(selector=LIB_SELECTOR, data=m)
+        with self._metrics.parse_duration.time():
+            domain_records = list(
+                result_parser.parse_records(
+                    scan_output, check_deliverability=self._check_email_deliverability
+                )
+            )
+        for domain_record in domain_records:
+            record = domain_record.to_dict()
+            emitted_record, record_fingerprint = self._detect_change(record)
+            if emitted_record is None:
+                continue
+            self.emit(selector=LIB_SELECTOR, data=emission.compact(emitted_record))
+            self._metrics.emitted_messages.inc()
+            if self._change_detector is not None and record_fingerprint is not None:
+                self._change_detector.save(record["name"], record_fingerprint)
+
+    def _detect_change(
+        self, record: dict[str, Any]
+    ) -> tuple[dict[str, Any] | None, dict[str, str] | None]:
+        """Returns the record to emit given its last emitted version, or None if it is suppressed, with the
+        fingerprint to save once it is emitted."""
+        if self._change_detector is None:
+            return record, None
+        change, emitted_record, record_fingerprint = self._change_detector.detect(
+            record
+        )
+        self._metrics.changes.labels(result=change.value).inc()
+        if change is change_detection.Change.UNCHANGED:
+            logger.info("whois record of %s did not change.", record["name"])
+        return emitted_record, record_fingerprint
 
 
 if __name__ == "__main__":
+    _configure_logging()
     logger.info("Whois Domain agent starting ...")
     AgentWhoisDomain.main()
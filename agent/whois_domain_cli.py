@@ -0,0 +1,324 @@
+"""Batch mode of the Whois Domain Agent: reads domains, looks them up concurrently and writes JSONL records.
+
+Runs the agent lookup and parsing logic without the Ostorlab bus:
+
+    python -m agent.whois_domain_cli domains.txt > whois.jsonl
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import sys
+from collections.abc import Iterable, Iterator
+from concurrent import futures
+from typing import Any, TextIO
+
+import whois
+from whois import exceptions as whois_exceptions
+
+from agent import cache as whois_cache
+from agent import (
+    normalizer,
+    rate_limiter,
+    result_parser,
+    retry,
+    scope,
+    whois_client,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 50
+DEFAULT_RETRY_NUMBER = 3
+# Number of recent registrable domains remembered to skip duplicates, bounding memory on large inputs.
+DEDUP_WINDOW = 100_000
+
+
+class _RecentDomains:
+    """Bounded set of the most recently seen domains."""
+
+    def __init__(self, max_size: int) -> None:
+        self._max_size = max_size
+        self._domains: collections.OrderedDict[str, None] = collections.OrderedDict()
+
+    def add(self, domain: str) -> bool:
+        """Adds a domain, returns False if it was already seen."""
+        if domain in self._domains:
+            self._domains.move_to_end(domain)
+            return False
+        self._domains[domain] = None
+        if len(self._domains) > self._max_size:
+            self._domains.popitem(last=False)
+        return True
+
+
+def iter_domains(
+    lines: Iterable[str], domains_scope: scope.Scope | None = None
+) -> Iterator[str]:
+    """Yields the in-scope registrable domains of the input lines, skipping recent duplicates."""
+    domains_scope = domains_scope or scope.Scope()
+    recent_domains = _RecentDomains(DEDUP_WINDOW)
+    for line in lines:
+        domain = line.strip()
+        if domain == "" or domain.startswith("#"):
+            continue
+        normalized_domain = normalizer.normalize(domain)
+        if normalized_domain is None:
+            logger.error("domain is not a valid URL: %s", domain)
+            continue
+        if (
+            domains_scope.contains(normalized_domain.host, normalized_domain.fld)
+            is False
+        ):
+            continue
+        if recent_domains.add(normalized_domain.fld) is False:
+            continue
+        yield normalized_domain.fld
+
+
+class BatchLookup:
+    """Looks up domains concurrently on one event loop, with the agent cache and rate limits."""
+
+    def __init__(
+        self,
+        backend: str = "asyncio",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        retry_number: int = DEFAULT_RETRY_NUMBER,
+        limiter: rate_limiter.ServerRateLimiter | None = None,
+        cache: whois_cache.WhoisCache | None = None,
+        timeout: float = whois_client.DEFAULT_TIMEOUT,
+        check_email_deliverability: bool = False,
+    ) -> None:
+        self._backend = backend
+        self._concurrency = max(concurrency, 1)
+        self._retry_number = max(retry_number, 1)
+        self._rate_limiter = limiter or rate_limiter.ServerRateLimiter()
+        self._cache = cache or whois_cache.WhoisCache()
+        self._client = whois_client.AsyncWhoisClient(timeout=timeout)
+        self._executor: futures.ThreadPoolExecutor | None = None
+        self._check_email_deliverability = check_email_deliverability
+
+    async def _query(self, domain_name: str) -> dict[str, Any]:
+        if self._backend == "asyncio":
+            raw_output = await self._client.lookup(domain_name)
+            return result_parser.intern_whois_data(
+                whois_client.parse(domain_name, raw_output)
+            )
+        loop = asyncio.get_running_loop()
+        return result_parser.intern_whois_data(
+            await loop.run_in_executor(self._executor, whois.whois, domain_name)
+        )
+
+    async def lookup(self, domain_name: str) -> dict[str, Any] | None:
+        """Returns the whois data of a domain, or None if it could not be fetched."""
+        cached_output = self._cache.get(domain_name)
+        if cached_output is not None:
+            return cached_output
+        if self._cache.get_failure(domain_name) is not None:
+            return None
+        server_key = rate_limiter.whois_server_key(domain_name)
+        last_error: Exception | None = None
+        for attempt in range(1, self._retry_number + 1):
+            await asyncio.sleep(self._rate_limiter.reserve(server_key))
+            try:
+                scan_output = await self._query(domain_name)
+            except retry.RETRYABLE_ERRORS as e:
+                if retry.is_retryable(e) is False:
+                    logger.error("Failed to fetch whois for %s: %r", domain_name, e)
+                    self._cache.set_failure(
+                        domain_name, whois_cache.classify_failure(e)
+                    )
+                    return None
+                self._rate_limiter.penalize(server_key)
+                logger.warning(
+                    "Attempt %d to fetch whois for %s failed: %r",
+                    attempt,
+                    domain_name,
+                    e,
+                )
+                last_error = e
+                continue
+            except UnicodeError as e:
+                logger.error(
+                    "Unicode error when fetching whois for %s : %s", domain_name, e
+                )
+                self._cache.set_failure(domain_name, whois_cache.classify_failure(e))
+                return None
+            except whois_exceptions.PywhoisError as e:
+                logger.error(e)
+                self._cache.set_failure(domain_name, whois_cache.classify_failure(e))
+                return None
+            self._cache.set(domain_name, scan_output)
+            return scan_output
+        if last_error is not None:
+            self._cache.set_failure(
+                domain_name, whois_cache.classify_failure(last_error)
+            )
+        return None
+
+    async def run(self, domains: Iterable[str], output: TextIO) -> int:
+        """Looks up the domains and writes one JSON line per parsed record as soon as it is available.
+
+        At most `concurrency` lookups are in flight, so memory does not grow with the input size.
+
+        Returns:
+            The number of records written.
+        """
+        records_count = 0
+
+        def write(done: set[asyncio.Task[dict[str, Any] | None]]) -> None:
+            nonlocal records_count
+            for task in done:
+                # A domain failing unexpectedly is logged, the records of the others are still written.
+                try:
+                    scan_output = task.result()
+                    if scan_output is None:
+                        continue
+                    records = list(
+                        result_parser.parse_results(
+                            scan_output,
+                            check_deliverability=self._check_email_deliverability,
+                        )
+                    )
+                except Exception:
+                    logger.exception("Failed to look up %s.", task.get_name())
+                    continue
+                for record in records:
+                    output.write(json.dumps(record) + "\n")
+                    records_count += 1
+            output.flush()
+
+        self._executor = futures.ThreadPoolExecutor(
+            max_workers=self._concurrency, thread_name_prefix="whois_lookup"
+        )
+        pending: set[asyncio.Task[dict[str, Any] | None]] = set()
+        try:
+            for domain_name in domains:
+                if len(pending) >= self._concurrency:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    write(done)
+                pending.add(
+                    asyncio.create_task(self.lookup(domain_name), name=domain_name)
+                )
+            while len(pending) > 0:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                write(done)
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        return records_count
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Looks up the WHOIS records of a list of domains and writes them as JSON lines."
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        type=argparse.FileType("r"),
+        default=sys.stdin,
+        help="File with one domain per line, reads stdin by default.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=argparse.FileType("w"),
+        default=sys.stdout,
+        help="JSONL output file, writes to stdout by default.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["asyncio", "python-whois"],
+        default="asyncio",
+        help="Whois transport.",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Number of lookups in flight.",
+    )
+    parser.add_argument(
+        "--scope-domain-regex",
+        help="Regular expression to define domain scanning scope.",
+    )
+    parser.add_argument(
+        "--scope-rule",
+        action="append",
+        dest="scope_rules",
+        help="Scope rule: `example.com`, `*.example.com` or `re:.*example`, prefixed with `!` to exclude. "
+        "Can be repeated.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=whois_client.DEFAULT_TIMEOUT,
+        help="Timeout in seconds of each whois server hop.",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRY_NUMBER,
+        help="Number of attempts per domain on connection errors.",
+    )
+    parser.add_argument(
+        "--whois-server-rate",
+        type=float,
+        default=rate_limiter.DEFAULT_RATE,
+        help="Requests per second allowed per whois server, 0 disables rate limiting.",
+    )
+    parser.add_argument(
+        "--whois-server-burst",
+        type=int,
+        default=rate_limiter.DEFAULT_BURST,
+        help="Number of requests a whois server may receive at once.",
+    )
+    parser.add_argument(
+        "--check-email-deliverability",
+        action="store_true",
+        help="Check emails for deliverability with DNS lookups, only their syntax is checked by default.",
+    )
+    parser.add_argument("--cache-path", help="Path of the on-disk SQLite whois cache.")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Command line entry point."""
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)s %(message)s", level="INFO", stream=sys.stderr
+    )
+    args = _parse_args(argv)
+    batch_lookup = BatchLookup(
+        backend=args.backend,
+        concurrency=args.concurrency,
+        retry_number=args.retries,
+        limiter=rate_limiter.ServerRateLimiter(
+            rate=args.whois_server_rate, burst=args.whois_server_burst
+        ),
+        cache=whois_cache.WhoisCache(path=args.cache_path),
+        timeout=args.timeout,
+        check_email_deliverability=args.check_email_deliverability,
+    )
+    records_count = asyncio.run(
+        batch_lookup.run(
+            iter_domains(
+                args.input,
+                scope.Scope.from_args(args.scope_rules, args.scope_domain_regex),
+            ),
+            args.output,
+        )
+    )
+    if args.output is not sys.stdout:
+        args.output.close()
+    logger.info("Wrote %d whois records.", records_count)
+
+
+if __name__ == "__main__":
+    main()
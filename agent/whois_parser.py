@@ -0,0 +1,289 @@
+"""Table-driven parser of raw WHOIS responses, extracting only the fields read by `result_parser`.
+
+python-whois runs every pattern of a TLD over a response as soon as it is loaded, including the many
+fields the agent never emits. Here each supported TLD has a table of precompiled patterns restricted to
+the emitted fields, and a field is only extracted when it is first read. The patterns and the value
+handling follow python-whois, so that records are the same whichever parser produced them. Responses of
+TLDs without a table are parsed by python-whois.
+"""
+
+import dataclasses
+import datetime
+import re
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+_FLAGS = re.IGNORECASE | re.MULTILINE
+# Fields python-whois keeps a single value of, the last one being the most specific.
+_LAST_VALUE_FIELDS = frozenset({"registrar", "whois_server", "referral_url"})
+_NO_WHOIS_SERVER = "No whois server is known for this kind of object."
+_NO_WHOIS_DATABASE = (
+    "This TLD has no whois server, but you can access the whois database at"
+)
+# Email pattern of python-whois, kept here so that python-whois is only imported when it is needed.
+EMAIL_PATTERN = re.compile(
+    r"[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*@(?:[a-z0-9](?:[a-z0-9-]*["
+    r"a-z0-9])?\.)+[a-z0-9](?:[a-z0-9-]*[a-z0-9])?",
+    _FLAGS,
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class TldTable:
+    """Patterns of the emitted fields in the responses of a TLD.
+
+    Attributes:
+        patterns: Precompiled pattern by field, whose groups capture the field values.
+        not_found: Pattern matching the responses of unregistered domains.
+        dayfirst: Whether ambiguous dates put the day first.
+    """
+
+    patterns: Mapping[str, re.Pattern[str]]
+    not_found: re.Pattern[str]
+    dayfirst: bool = False
+
+
+def _table(
+    patterns: Mapping[str, str | re.Pattern[str]],
+    not_found: str,
+    dayfirst: bool = False,
+) -> TldTable:
+    return TldTable(
+        patterns={
+            field: pattern
+            if isinstance(pattern, re.Pattern)
+            else re.compile(pattern, _FLAGS)
+            for field, pattern in patterns.items()
+        },
+        not_found=re.compile(not_found),
+        dayfirst=dayfirst,
+    )
+
+
+# Fields of the ICANN registration data format, shared by most gTLDs.
+_ICANN_PATTERNS: dict[str, str | re.Pattern[str]] = {
+    "domain_name": r"Domain Name: *(.+)",
+    "registrar": r"Registrar: *(.+)",
+    "whois_server": r"Whois Server: *(.+)",
+    "referral_url": r"Referral URL: *(.+)",
+    "updated_date": r"Updated Date: *(.+)",
+    "creation_date": r"Creation Date: *(.+)",
+    "expiration_date": r"Expir\w+ Date: *(.+)",
+    "name_servers": r"Name Server: *(.+)",
+    "status": r"Status: *(.+)",
+    "emails": EMAIL_PATTERN,
+    "dnssec": r"dnssec: *([\S]+)",
+    "name": r"Registrant Name: *(.+)",
+    "org": r"Registrant\s*Organization: *(.+)",
+    "address": r"Registrant Street: *(.+)",
+    "city": r"Registrant City: *(.+)",
+    "state": r"Registrant State/Province: *(.+)",
+    "country": r"Registrant Country: *(.+)",
+}
+
+TABLES: dict[str, TldTable] = {
+    "com": _table(_ICANN_PATTERNS, r'No match for "'),
+    "net": _table(_ICANN_PATTERNS, r'No match for "'),
+    "org": _table(_ICANN_PATTERNS, r"\A\s*(?:NOT FOUND|Domain not found)"),
+    "co": _table(_ICANN_PATTERNS, r"No Data Found"),
+    "io": _table(
+        {
+            "domain_name": r"Domain Name: *(.+)",
+            "registrar": r"Registrar: *(.+)",
+            "status": r"Domain Status: *(.+)",
+            "name_servers": r"Name Server: *(.+)",
+            "creation_date": r"Creation Date: *(.+)",
+            "expiration_date": r"Registry Expiry Date: *(.+)",
+            "updated_date": r"Updated Date: *(.+)",
+        },
+        r"is available for purchase|Domain not found\.",
+    ),
+    "fr": _table(
+        {
+            "domain_name": r"domain: *(.+)",
+            "registrar": r"registrar: *(.+)",
+            "creation_date": r"created: *(.+)",
+            "expiration_date": r"Expir\w+ Date:\s?(.+)",
+            "name_servers": r"nserver: *(.+)",
+            "status": r"status: *(.+)",
+            "emails": EMAIL_PATTERN,
+            "updated_date": r"last-update: *(.+)",
+        },
+        r"No entries found|NOT FOUND",
+    ),
+    "de": _table(
+        {
+            "domain_name": r"Domain: *(.+)",
+            "status": r"Status: *(.+)",
+            "updated_date": r"Changed: *(.+)",
+            "name": r"name: *(.+)",
+            "org": r"Organisation: *(.+)",
+            "address": r"Address: *(.+)",
+            "city": r"City: *(.+)",
+            "name_servers": r"Nserver: *(.+)",
+            "emails": EMAIL_PATTERN,
+        },
+        r"Status: free",
+    ),
+    "at": _table(
+        {
+            "domain_name": r"domain: *(.+)",
+            "registrar": r"registrar: *(.+)",
+            "name_servers": r"nserver: *(.+)",
+            "name": r"personname: *(.+)",
+            "org": r"organization: *(.+)",
+            "address": r"street address: *(.+)",
+            "city": r"city: *(.+)",
+            "country": r"country: *(.+)",
+            "updated_date": r"changed: *(.+)",
+            "email": r"e-mail: *(.+)",
+        },
+        r"Status: free|nothing found\s*\Z",
+    ),
+    "bg": _table(
+        {
+            "domain_name": r"DOMAIN NAME: *(.+)\n",
+            "status": r"registration status: s*(.+)",
+        },
+        r"does not exist in database!",
+        dayfirst=True,
+    ),
+    "eu": _table(
+        {
+            "domain_name": r"Domain: *([^\n\r]+)",
+            "registrar": r"Registrar:\n *Name: *([^\n\r]+)",
+            "name_servers": r"Name servers:\n *([\n\S\s]+)",
+        },
+        r"Status: AVAILABLE",
+    ),
+    "it": _table(
+        {
+            "domain_name": r"Domain: *(.+)",
+            "creation_date": r"(?<! )Created: *(.+)",
+            "updated_date": r"(?<! )Last Update: *(.+)",
+            "expiration_date": r"(?<! )Expire Date: *(.+)",
+            "status": r"Status: *(.+)",
+            "name_servers": r"Nameservers[\s]((?:.+\n)*)",
+            "registrar": r"(?<=Registrar)[\s\S]*?Organization:(.*)",
+        },
+        r"not found\.|Status:             AVAILABLE",
+    ),
+    "uk": _table(
+        {
+            "domain_name": r"Domain name:\s*(.+)",
+            "registrar": r"Registrar:\s*(.+)",
+            "status": r"Registration status:\s*(.+)",
+            "creation_date": r"Registered on:\s*(.+)",
+            "expiration_date": r"Expiry date:\s*(.+)",
+            "updated_date": r"Last updated:\s*(.+)",
+            "name_servers": r"([\w.-]+\.(?:[\w-]+\.){1,2}[a-zA-Z]{2,}(?!\s+Relevant|\s+Data))\s+",
+        },
+        r"No match for ",
+    ),
+}
+
+
+def _cast_date(value: str, dayfirst: bool) -> datetime.datetime | str:
+    """Converts a date to an aware datetime, parsing ISO 8601 dates without dateutil."""
+    if dayfirst is False:
+        try:
+            date = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            pass
+        else:
+            if date.tzinfo is None:
+                date = date.replace(tzinfo=datetime.UTC)
+            return date
+    import whois
+
+    cast_date: datetime.datetime | str = whois.parser.cast_date(
+        value, dayfirst=dayfirst
+    )
+    return cast_date
+
+
+def _findall(pattern: re.Pattern[str], text: str) -> list[Any]:
+    """Returns the matches of a pattern in the text.
+
+    The email pattern is tried at every position of the text, which makes it the most expensive one.
+    Emails do not span lines, so it is only run on the lines holding an `@`, with the same matches.
+    """
+    if pattern is not EMAIL_PATTERN:
+        return pattern.findall(text)
+    return [
+        match
+        for line in text.splitlines()
+        if "@" in line
+        for match in pattern.findall(line)
+    ]
+
+
+class WhoisRecord(Mapping[str, Any]):
+    """Whois data of a response, each field being extracted from the text when first read."""
+
+    def __init__(self, domain: str, text: str, table: TldTable) -> None:
+        self.domain = domain
+        self.text = text
+        self._table = table
+        self._values: dict[str, Any] = {}
+
+    def __getitem__(self, field: str) -> Any:
+        if field in self._values:
+            return self._values[field]
+        pattern = self._table.patterns[field]
+        value = self._extract(field, pattern)
+        self._values[field] = value
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table.patterns)
+
+    def __len__(self) -> int:
+        return len(self._table.patterns)
+
+    def __contains__(self, field: object) -> bool:
+        return field in self._table.patterns
+
+    def _extract(self, field: str, pattern: re.Pattern[str]) -> Any:
+        values: list[Any] = []
+        seen = set()
+        is_date = "_date" in field
+        for match in _findall(pattern, self.text):
+            for group in match if isinstance(match, tuple) else (match,):
+                value: Any = group.strip()
+                if value == "":
+                    continue
+                if is_date is True and value.isdigit() is False:
+                    value = _cast_date(value, self._table.dayfirst)
+                key = str(value).lower()
+                if key not in seen:
+                    seen.add(key)
+                    values.append(value)
+        if len(values) > 0 and field in _LAST_VALUE_FIELDS:
+            values = values[-1:]
+        if len(values) == 0:
+            return None
+        if len(values) == 1:
+            return values[0]
+        return values
+
+
+def parse(domain_name: str, text: str) -> Mapping[str, Any]:
+    """Parses a raw WHOIS response, with python-whois when its TLD has no table.
+
+    Raises:
+        WhoisDomainNotFoundError: If the response tells the domain is not registered.
+    """
+    import whois
+
+    table = TABLES.get(domain_name.rsplit(".", 1)[-1].lower())
+    if table is None:
+        entry: Mapping[str, Any] = whois.parser.WhoisEntry.load(domain_name, text)
+        return entry
+    if (
+        text.strip() == _NO_WHOIS_SERVER
+        or _NO_WHOIS_DATABASE in text
+        or table.not_found.search(text) is not None
+    ):
+        raise whois.exceptions.WhoisDomainNotFoundError(text)
+    return WhoisRecord(domain_name, text, table)
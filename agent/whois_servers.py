@@ -0,0 +1,130 @@
+"""Map of the WHOIS server of each TLD, saving the IANA query ahead of the lookups.
+
+python-whois and the asyncio client only know the WHOIS server of a few TLDs and ask IANA for the
+others, which adds a round trip to most lookups. The map is seeded from a snapshot bundled with the
+agent, or a local copy, learns the servers IANA returns for the other TLDs, and shares them with the
+agent replicas through the persist store. A daemon thread refreshes the map from IANA periodically.
+"""
+
+import json
+import logging
+import pathlib
+import threading
+from collections.abc import Callable, Mapping
+
+from ostorlab.agent.mixins import agent_persist_mixin as persist_mixin
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = pathlib.Path(__file__).parent / "whois_servers.json"
+SERVERS_KEY = "agent_whois_domain_whois_servers"
+DEFAULT_REFRESH_INTERVAL = 86400.0
+
+
+def load_snapshot(path: str | pathlib.Path = SNAPSHOT_PATH) -> dict[str, str]:
+    """Reads the WHOIS server of each TLD from a snapshot file.
+
+    Returns:
+        Server by lowercase TLD.
+    """
+    with pathlib.Path(path).open(encoding="utf-8") as snapshot_file:
+        snapshot = json.load(snapshot_file)
+    return {tld.lower(): server for tld, server in snapshot.get("servers", {}).items()}
+
+
+def _decode(value: bytes | str) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class WhoisServers:
+    """Thread-safe map of the WHOIS server of each TLD, persisted in the store shared by the replicas."""
+
+    def __init__(
+        self,
+        servers: Mapping[str, str],
+        store: persist_mixin.AgentPersistMixin | None = None,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+    ) -> None:
+        """Creates the map.
+
+        Args:
+            servers: Server by lowercase TLD the map is seeded from.
+            store: Persist store sharing the learned servers with the agent replicas.
+            refresh_interval: Seconds between two refreshes of the map, once started.
+        """
+        self._servers = dict(servers)
+        self._store = store
+        self._refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def __len__(self) -> int:
+        return len(self._servers)
+
+    def get(self, tld: str) -> str | None:
+        """Returns the WHOIS server of a TLD, None if it was never learned."""
+        return self._servers.get(tld.lower())
+
+    def learn(self, tld: str, server: str) -> None:
+        """Records the WHOIS server of a TLD, and persists it when it is new."""
+        tld = tld.lower()
+        server = server.strip()
+        with self._lock:
+            if self._servers.get(tld) == server:
+                return
+            self._servers[tld] = server
+        if self._store is not None:
+            self._store.hash_add(SERVERS_KEY, {tld: server})
+
+    def load(self) -> None:
+        """Merges the servers learned by the agent replicas into the map."""
+        if self._store is None:
+            return
+        stored = self._store.hash_get_all(SERVERS_KEY)
+        with self._lock:
+            self._servers.update(
+                {_decode(tld): _decode(server) for tld, server in stored.items()}
+            )
+
+    def refresh(self, find_server: Callable[[str], str | None]) -> None:
+        """Asks the server of every TLD of the map again, keeping the known server on failures.
+
+        Args:
+            find_server: Returns the WHOIS server of a TLD from IANA, None if IANA knows none.
+        """
+        for tld in list(self._servers):
+            if self._stopped.is_set():
+                return
+            try:
+                server = find_server(tld)
+            except (OSError, TimeoutError) as e:
+                logger.warning("Could not refresh the whois server of .%s: %s", tld, e)
+                continue
+            if server is not None:
+                self.learn(tld, server)
+
+    def start(self, find_server: Callable[[str], str | None]) -> None:
+        """Loads the persisted servers, then refreshes the map every `refresh_interval` from a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._run, args=(find_server,), name="whois_servers", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, find_server: Callable[[str], str | None]) -> None:
+        try:
+            self.load()
+        except Exception:
+            logger.exception("Could not load the persisted whois servers.")
+        while self._stopped.wait(self._refresh_interval) is False:
+            try:
+                self.load()
+                self.refresh(find_server)
+            except Exception:
+                logger.exception("Could not refresh the whois servers.")
+
+    def stop(self) -> None:
+        """Stops the periodic refreshes."""
+        self._stopped.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join()
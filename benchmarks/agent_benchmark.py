@@ -0,0 +1,271 @@
+"""Throughput benchmark of the result parser and the agent `process` hot path over the WHOIS corpus.
+
+Measures, offline:
+
+* `result_parser.parse_results`: records per second, and the allocations retained per parsed record.
+* The memory held per parsed `DomainRecord`, and per whois result held in the cache.
+* `AgentWhoisDomain.process`: messages per second, with the whois lookup, the bus and the shared
+  dedup set mocked, so that only the agent's own work is measured.
+
+The results are compared with `baseline.json` and the command exits with status 1 when a metric
+regresses by more than the tolerance:
+
+    python -m benchmarks.agent_benchmark
+    python -m benchmarks.agent_benchmark --update-baseline
+
+Throughput depends on the machine, compare runs made on the same host.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import pathlib
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator, Mapping
+from typing import Any
+from unittest import mock
+
+from ostorlab.agent.message import message as msg
+
+from agent import cache as whois_cache
+from agent import result_parser, whois_domain_agent
+from benchmarks import agent_factory, whois_corpus
+
+BASELINE_PATH = pathlib.Path(__file__).parent / "baseline.json"
+DEFAULT_TOLERANCE = 0.2
+# Throughput is the best of several rounds, which is the least disturbed by the rest of the host.
+ROUNDS = 5
+PARSE_ITERATIONS = 500
+PROCESS_MESSAGES = 500
+
+# Metrics where a lower value is better, every other metric is a throughput.
+LOWER_IS_BETTER = {
+    "parse_results_allocated_bytes_per_record",
+    "parse_results_allocations_per_record",
+    "parse_records_retained_bytes_per_record",
+    "cached_whois_data_bytes_per_entry",
+}
+
+
+def _measure_parse_results(scan_outputs: list[dict[str, Any]]) -> dict[str, float]:
+    for scan_output in scan_outputs:
+        list(result_parser.parse_results(scan_output))
+
+    records_per_second = 0.0
+    for _ in range(ROUNDS):
+        records_count = 0
+        start = time.perf_counter()
+        for _ in range(PARSE_ITERATIONS):
+            for scan_output in scan_outputs:
+                for _record in result_parser.parse_results(scan_output):
+                    records_count += 1
+        elapsed = time.perf_counter() - start
+        records_per_second = max(records_per_second, records_count / elapsed)
+
+    tracemalloc.start()
+    records = [
+        record
+        for scan_output in scan_outputs
+        for record in result_parser.parse_results(scan_output)
+    ]
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    statistics = snapshot.statistics("filename")
+    return {
+        "parse_results_records_per_second": records_per_second,
+        "parse_results_allocated_bytes_per_record": sum(
+            statistic.size for statistic in statistics
+        )
+        / len(records),
+        "parse_results_allocations_per_record": sum(
+            statistic.count for statistic in statistics
+        )
+        / len(records),
+    }
+
+
+def _retained_bytes(build: Callable[[], list[Any]]) -> tuple[float, int]:
+    """Returns the bytes allocated by build and still held by its result, with the result length."""
+    tracemalloc.start()
+    result = build()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(statistic.size for statistic in snapshot.statistics("filename")), len(
+        result
+    )
+
+
+def _measure_memory(scan_outputs: list[dict[str, Any]]) -> dict[str, float]:
+    """Measures the memory held by parsed records in flight and by cached whois data."""
+    records_bytes, records_count = _retained_bytes(
+        lambda: [
+            record
+            for _ in range(PARSE_ITERATIONS)
+            for scan_output in scan_outputs
+            for record in result_parser.parse_records(scan_output)
+        ]
+    )
+    # Results of distinct lookups are distinct strings, as the cache holds them after a real query.
+    lookup_outputs = [
+        whois_cache.dumps(scan_output)
+        for _ in range(PARSE_ITERATIONS)
+        for scan_output in scan_outputs
+    ]
+    cached_bytes, cached_count = _retained_bytes(
+        lambda: [
+            result_parser.intern_whois_data(whois_cache.loads(lookup_output))
+            for lookup_output in lookup_outputs
+        ]
+    )
+    return {
+        "parse_records_retained_bytes_per_record": records_bytes / records_count,
+        "cached_whois_data_bytes_per_entry": cached_bytes / cached_count,
+    }
+
+
+@contextlib.contextmanager
+def offline_agent(
+    args: Mapping[str, Any],
+    whois_lookup: Callable[[str], dict[str, Any]] | None = None,
+) -> Iterator[whois_domain_agent.AgentWhoisDomain]:
+    """Yields an agent whose bus and shared dedup set are mocked.
+
+    Args:
+        args: Arguments of the agent, on top of the `ostorlab.yaml` defaults.
+        whois_lookup: Replaces `whois.whois` when set.
+    """
+    mixins = "ostorlab.agent.mixins"
+    with contextlib.ExitStack() as stack:
+        for target in [
+            f"{mixins}.agent_mq_mixin.AgentMQMixin.mq_init",
+            f"{mixins}.agent_mq_mixin.AgentMQMixin.mq_send_message",
+            f"{mixins}.agent_healthcheck_mixin.AgentHealthcheckMixin.__init__",
+        ]:
+            stack.enter_context(mock.patch(target, return_value=None))
+        stack.enter_context(
+            mock.patch(
+                f"{mixins}.agent_persist_mixin.AgentPersistMixin.set_add",
+                return_value=True,
+            )
+        )
+        if whois_lookup is not None:
+            stack.enter_context(mock.patch("whois.whois", side_effect=whois_lookup))
+        yield agent_factory.build_agent(**args)
+
+
+def _measure_process(scan_outputs: dict[str, dict[str, Any]]) -> dict[str, float]:
+    tlds = sorted({domain.rsplit(".", 1)[-1] for domain in scan_outputs})
+    outputs_by_tld = {
+        domain.rsplit(".", 1)[-1]: scan_output
+        for domain, scan_output in scan_outputs.items()
+    }
+
+    def whois_lookup(domain_name: str) -> dict[str, Any]:
+        """Returns the corpus response of the same TLD as the domain."""
+        return outputs_by_tld[domain_name.rsplit(".", 1)[-1]]
+
+    messages_per_second = 0.0
+    with offline_agent(
+        {"whois_server_rate": 0}, whois_lookup=whois_lookup
+    ) as test_agent:
+        for round_index in range(ROUNDS):
+            # Every message is a new registrable domain, so each one goes through a full lookup and emit.
+            messages = [
+                msg.Message.from_data(
+                    "v3.asset.domain_name",
+                    data={
+                        "name": f"www.domain{round_index}-{index}.{tlds[index % len(tlds)]}"
+                    },
+                )
+                for index in range(PROCESS_MESSAGES)
+            ]
+            start = time.perf_counter()
+            for message in messages:
+                test_agent.process(message)
+            elapsed = time.perf_counter() - start
+            messages_per_second = max(messages_per_second, len(messages) / elapsed)
+    return {"process_messages_per_second": messages_per_second}
+
+
+def _compare(
+    baseline: dict[str, float], results: dict[str, float], tolerance: float
+) -> list[str]:
+    """Prints the results next to the baseline and returns the regressed metrics."""
+    regressions = []
+    print(f"{'metric':<45}{'baseline':>14}{'current':>14}{'change':>10}")
+    for metric, value in results.items():
+        reference = baseline.get(metric)
+        if reference is None or reference == 0:
+            print(f"{metric:<45}{'-':>14}{value:>14.1f}{'-':>10}")
+            continue
+        change = (value - reference) / reference
+        if metric in LOWER_IS_BETTER:
+            change = -change
+        print(f"{metric:<45}{reference:>14.1f}{value:>14.1f}{change:>+10.1%}")
+        if change < -tolerance:
+            regressions.append(metric)
+    return regressions
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store the results as the new baseline instead of comparing with it.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Relative regression allowed before failing, 0.2 allows 20%%.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    # The per-record info logs would measure the terminal rather than the agent.
+    logging.disable(logging.INFO)
+    scan_outputs = whois_corpus.load_scan_outputs()
+    results = {
+        **_measure_parse_results(list(scan_outputs.values())),
+        **_measure_memory(list(scan_outputs.values())),
+        **_measure_process(scan_outputs),
+    }
+
+    if args.update_baseline is True:
+        BASELINE_PATH.write_text(
+            json.dumps(
+                {
+                    "corpus_version": whois_corpus.CORPUS_VERSION,
+                    "metrics": {
+                        metric: round(value, 1) for metric, value in results.items()
+                    },
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        print(f"Baseline written to {BASELINE_PATH}.")
+        return 0
+
+    baseline = json.loads(BASELINE_PATH.read_text())
+    if baseline["corpus_version"] != whois_corpus.CORPUS_VERSION:
+        print(
+            f"Baseline was measured on corpus v{baseline['corpus_version']}, "
+            f"the corpus is v{whois_corpus.CORPUS_VERSION}: run with --update-baseline."
+        )
+        return 1
+    regressions = _compare(baseline["metrics"], results, args.tolerance)
+    if len(regressions) > 0:
+        print(f"Regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""Builds agents outside of a runtime, for the benchmarks and the tests."""
+
+import json
+import pathlib
+from typing import Any
+
+from ostorlab.agent import definitions as agent_definitions
+from ostorlab.runtimes import definitions as runtime_definitions
+from ostorlab.utils import definitions
+
+from agent import whois_domain_agent
+
+AGENT_DEFINITION_PATH = pathlib.Path(__file__).parent.parent / "ostorlab.yaml"
+
+
+def agent_arg(name: str, value: Any) -> definitions.Arg:
+    """Returns an agent argument, typed as ostorlab.yaml declares it."""
+    if isinstance(value, bool):
+        arg_type = "boolean"
+    elif isinstance(value, int | float):
+        arg_type = "number"
+    elif isinstance(value, list):
+        arg_type = "array"
+    else:
+        arg_type = "string"
+    return definitions.Arg(name=name, type=arg_type, value=json.dumps(value).encode())
+
+
+def build_agent(**args: Any) -> whois_domain_agent.AgentWhoisDomain:
+    """Creates a dummy agent for the Whois Domain Agent with the given arguments."""
+    with AGENT_DEFINITION_PATH.open() as yaml_o:
+        definition = agent_definitions.AgentDefinition.from_yaml(yaml_o)
+    settings = runtime_definitions.AgentSettings(
+        key="agent/ostorlab/whois_domain",
+        bus_url="NA",
+        bus_exchange_topic="NA",
+        redis_url="redis://redis",
+        args=[agent_arg(name, value) for name, value in args.items()],
+        healthcheck_port=0,
+    )
+    return whois_domain_agent.AgentWhoisDomain(definition, settings)
@@ -0,0 +1,118 @@
+"""Local stand-in for a port-43 WHOIS server, used to test the asyncio WHOIS client and to load test the agent.
+
+Besides canned answers, the server can delay its responses, reset connections at random and throttle
+its clients, as loaded registries do.
+"""
+
+import asyncio
+import collections
+import random
+import socket
+import struct
+import time
+from collections.abc import Callable
+from typing import Self
+
+Responder = Callable[[str], str]
+
+
+class FakeWhoisServer:
+    """Asyncio TCP server answering each WHOIS query with a canned response."""
+
+    def __init__(
+        self,
+        responses: list[str] | Responder,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_queries: int | None = None,
+        throttle_window: float = 1.0,
+        seed: int | None = None,
+    ) -> None:
+        """Creates the server.
+
+        Args:
+            responses: Responses returned to successive connections, or a function mapping a query to its response.
+            latency: Seconds waited before answering.
+            jitter: Maximum number of seconds randomly added to the latency.
+            error_rate: Probability of resetting a connection instead of answering.
+            throttle_queries: Number of queries a client may send per window, further connections are reset.
+            throttle_window: Duration in seconds of the throttling window.
+            seed: Seed of the jitter and errors, for reproducible runs.
+        """
+        self._responses = responses
+        self._latency = latency
+        self._jitter = jitter
+        self._error_rate = error_rate
+        self._throttle_queries = throttle_queries
+        self._throttle_window = throttle_window
+        self._random = random.Random(seed)
+        self._client_queries: dict[str, collections.deque[float]] = (
+            collections.defaultdict(collections.deque)
+        )
+        self._server: asyncio.Server | None = None
+        self.queries: list[str] = []
+        self.errors_count = 0
+        self.throttled_count = 0
+
+    @property
+    def port(self) -> int:
+        if self._server is None:
+            raise ValueError("Server is not started.")
+        port: int = self._server.sockets[0].getsockname()[1]
+        return port
+
+    async def __aenter__(self) -> Self:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _respond(self, query: str) -> str:
+        if callable(self._responses):
+            return self._responses(query)
+        return self._responses[len(self.queries) - 1]
+
+    def _is_throttled(self, client: str) -> bool:
+        """Records a query of the client and returns True if it exceeds the allowed rate."""
+        if self._throttle_queries is None:
+            return False
+        now = time.monotonic()
+        client_queries = self._client_queries[client]
+        while (
+            len(client_queries) > 0 and client_queries[0] <= now - self._throttle_window
+        ):
+            client_queries.popleft()
+        client_queries.append(now)
+        return len(client_queries) > self._throttle_queries
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        query = (await reader.readline()).decode().strip()
+        self.queries.append(query)
+        client = writer.get_extra_info("peername")[0]
+        if self._is_throttled(client):
+            self.throttled_count += 1
+            _reset(writer)
+            return
+        if self._latency > 0 or self._jitter > 0:
+            await asyncio.sleep(self._latency + self._random.uniform(0, self._jitter))
+        if self._random.random() < self._error_rate:
+            self.errors_count += 1
+            _reset(writer)
+            return
+        writer.write(self._respond(query).encode())
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+
+
+def _reset(writer: asyncio.StreamWriter) -> None:
+    """Closes the connection with a TCP reset, which the client sees as a `ConnectionResetError`."""
+    sock = writer.get_extra_info("socket")
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+    writer.transport.abort()
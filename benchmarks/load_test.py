@@ -0,0 +1,318 @@
+"""End-to-end load test of the agent against a local fake WHOIS server.
+
+Synthetic `v3.asset.domain_name` messages go through `AgentWhoisDomain.process` with the asyncio
+backend. Every WHOIS query, IANA included, is answered by a local server that replays the corpus
+responses with the configured latency, errors and throttling:
+
+    python -m benchmarks.load_test --messages 2000 --concurrency 32 --latency 0.2 --error-rate 0.02
+    python -m benchmarks.load_test --skew 0.8 --whois-server-rate 20 --max-pending-lookups 256
+    python -m benchmarks.load_test --whois-server-discovery
+
+Reports the p50/p95/p99 latency from `process` to the emitted records, the throughput and the
+number of retries.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import logging
+import random
+import statistics
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any
+
+from ostorlab.agent.message import message as msg
+
+from agent import whois_client, whois_servers
+from benchmarks import agent_benchmark, fake_whois_server, whois_corpus
+
+DEFAULT_MESSAGES = 1_000
+DEFAULT_CONCURRENCY = 16
+
+
+@dataclasses.dataclass
+class LoadTestReport:
+    """Results of a load test run."""
+
+    messages: int
+    duration: float
+    latencies: list[float]
+    # Latencies of the domains outside of the .com registry, which takes the skewed share of the load.
+    unskewed_latencies: list[float]
+    attempts: int
+    failed_lookups: int
+    server_errors: int
+    throttled_queries: int
+
+    @property
+    def throughput(self) -> float:
+        return self.messages / self.duration
+
+    @property
+    def retries(self) -> int:
+        return self.attempts - len(self.latencies)
+
+    def percentile(self, percent: int, latencies: list[float] | None = None) -> float:
+        latencies = self.latencies if latencies is None else latencies
+        if len(latencies) < 2:
+            return latencies[0] if len(latencies) == 1 else 0.0
+        return statistics.quantiles(latencies, n=100)[percent - 1]
+
+
+class _LocalWhoisClient(whois_client.AsyncWhoisClient):
+    """Asyncio WHOIS client sending the queries of every server to the local fake server."""
+
+    async def query(self, server: str, query: str) -> str:
+        del server
+        return await super().query("127.0.0.1", query)
+
+
+def corpus_responder() -> fake_whois_server.Responder:
+    """Returns a responder answering IANA queries with a registry, and domain queries with the
+    corpus response of the same TLD."""
+    responses_by_tld = {
+        domain.rsplit(".", 1)[-1]: text
+        for domain, text in whois_corpus.load_responses().items()
+    }
+
+    def respond(query: str) -> str:
+        domain_name = query.split()[-1].removesuffix("/e").lower()
+        if "." not in domain_name:
+            return f"refer:        whois.nic.{domain_name}\n\nwhois:        whois.nic.{domain_name}\n"
+        return responses_by_tld.get(
+            domain_name.rsplit(".", 1)[-1], responses_by_tld["com"]
+        )
+
+    return respond
+
+
+@contextlib.contextmanager
+def _serving(
+    server: fake_whois_server.FakeWhoisServer,
+) -> Iterator[fake_whois_server.FakeWhoisServer]:
+    """Runs the server on an event loop of its own thread, as the agent blocks the calling thread."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name="fake_whois_server")
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(server.__aenter__(), loop).result()
+        try:
+            yield server
+        finally:
+            asyncio.run_coroutine_threadsafe(
+                server.__aexit__(None, None, None), loop
+            ).result()
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def run_load_test(
+    server: fake_whois_server.FakeWhoisServer,
+    messages_count: int = DEFAULT_MESSAGES,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    whois_server_rate: float = 0,
+    whois_server_burst: int = 5,
+    skew: float = 0.0,
+    max_pending_lookups: int | None = None,
+    whois_server_discovery: bool = False,
+    seed: int = 0,
+) -> LoadTestReport:
+    """Sends messages of distinct domains through the agent, with its lookups answered by the server.
+
+    Domains cycle through the corpus TLDs, except for a `skew` fraction of them, which are `.com` domains.
+    With `whois_server_discovery`, the WHOIS servers of the TLDs are read from the bundled snapshot
+    instead of asking IANA ahead of each lookup.
+    """
+    tlds = sorted(
+        {domain.rsplit(".", 1)[-1] for domain in whois_corpus.load_responses()}
+    )
+    rng = random.Random(seed)
+    messages = [
+        msg.Message.from_data(
+            "v3.asset.domain_name",
+            data={
+                "name": f"www.domain{index}."
+                + ("com" if rng.random() < skew else tlds[index % len(tlds)])
+            },
+        )
+        for index in range(messages_count)
+    ]
+    args: dict[str, Any] = {
+        "whois_backend": "asyncio",
+        "max_concurrent_lookups": concurrency,
+        "whois_server_rate": whois_server_rate,
+        "whois_server_burst": whois_server_burst,
+    }
+    if max_pending_lookups is not None:
+        args["max_pending_lookups"] = max_pending_lookups
+
+    started_at: dict[str, float] = {}
+    latencies: list[float] = []
+    unskewed_latencies: list[float] = []
+    failures: list[str] = []
+    attempts: list[str] = []
+
+    with _serving(server), agent_benchmark.offline_agent(args) as test_agent:
+        if whois_server_discovery is True:
+            test_agent._whois_servers = whois_servers.WhoisServers(
+                whois_servers.load_snapshot()
+            )
+        test_agent._whois_client = _LocalWhoisClient(
+            port=server.port, servers=test_agent._whois_servers
+        )
+        submit_lookup = test_agent._submit_lookup
+        lookup_and_emit = test_agent._lookup_and_emit
+        lookup = test_agent._lookup
+        query_whois = test_agent._query_whois
+
+        def timed_submit_lookup(domain_name: str, priority: int = 0) -> None:
+            started_at[domain_name] = time.perf_counter()
+            submit_lookup(domain_name, priority)
+
+        def timed_lookup_and_emit(
+            domain_name: str, control_message: msg.Message | None = None
+        ) -> None:
+            start = started_at.pop(domain_name, time.perf_counter())
+            lookup_and_emit(domain_name, control_message)
+            latencies.append(time.perf_counter() - start)
+            if domain_name.endswith(".com") is False:
+                unskewed_latencies.append(latencies[-1])
+
+        def counted_lookup(domain_name: str) -> dict[str, Any] | None:
+            scan_output = lookup(domain_name)
+            if scan_output is None:
+                failures.append(domain_name)
+            return scan_output
+
+        def counted_query_whois(domain_name: str) -> Any:
+            attempts.append(domain_name)
+            return query_whois(domain_name)
+
+        test_agent._submit_lookup = timed_submit_lookup  # type: ignore[method-assign]
+        test_agent._lookup_and_emit = timed_lookup_and_emit  # type: ignore[method-assign]
+        test_agent._lookup = counted_lookup  # type: ignore[method-assign]
+        test_agent._query_whois = counted_query_whois  # type: ignore[method-assign]
+
+        start = time.perf_counter()
+        for message in messages:
+            test_agent.process(message)
+        test_agent.wait_for_lookups()
+        duration = time.perf_counter() - start
+
+    return LoadTestReport(
+        messages=messages_count,
+        duration=duration,
+        latencies=latencies,
+        unskewed_latencies=unskewed_latencies,
+        attempts=len(attempts),
+        failed_lookups=len(failures),
+        server_errors=server.errors_count,
+        throttled_queries=server.throttled_count,
+    )
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=DEFAULT_MESSAGES)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Agent `max_concurrent_lookups`.",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Server latency in seconds."
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.05,
+        help="Maximum random seconds added to the latency.",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Probability of a connection reset.",
+    )
+    parser.add_argument(
+        "--throttle-queries",
+        type=int,
+        help="Queries per window before the server resets connections.",
+    )
+    parser.add_argument("--throttle-window", type=float, default=1.0)
+    parser.add_argument(
+        "--whois-server-rate",
+        type=float,
+        default=0,
+        help="Agent `whois_server_rate`, 0 disables the rate limit.",
+    )
+    parser.add_argument("--whois-server-burst", type=int, default=5)
+    parser.add_argument(
+        "--skew",
+        type=float,
+        default=0.0,
+        help="Fraction of the domains sent to the .com registry.",
+    )
+    parser.add_argument(
+        "--max-pending-lookups",
+        type=int,
+        help="Agent `max_pending_lookups`.",
+    )
+    parser.add_argument(
+        "--whois-server-discovery",
+        action="store_true",
+        help="Agent `whois_server_discovery`, with the bundled snapshot of the WHOIS servers.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = _parse_args(argv)
+    # Injected errors and failed lookups are counted in the report, logging each of them would
+    # measure the terminal.
+    logging.disable(logging.ERROR)
+    server = fake_whois_server.FakeWhoisServer(
+        corpus_responder(),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_queries=args.throttle_queries,
+        throttle_window=args.throttle_window,
+        seed=args.seed,
+    )
+    report = run_load_test(
+        server,
+        messages_count=args.messages,
+        concurrency=args.concurrency,
+        whois_server_rate=args.whois_server_rate,
+        whois_server_burst=args.whois_server_burst,
+        skew=args.skew,
+        max_pending_lookups=args.max_pending_lookups,
+        whois_server_discovery=args.whois_server_discovery,
+        seed=args.seed,
+    )
+    print(f"messages:          {report.messages}")
+    print(f"duration:          {report.duration:.2f} s")
+    print(f"throughput:        {report.throughput:.1f} messages/s")
+    for percent in (50, 95, 99):
+        print(f"p{percent} latency:       {report.percentile(percent) * 1e3:.1f} ms")
+    if args.skew > 0:
+        for percent in (50, 95):
+            latency = report.percentile(percent, report.unskewed_latencies)
+            print(f"p{percent} latency, not .com: {latency * 1e3:.1f} ms")
+    print(f"whois attempts:    {report.attempts}")
+    print(f"retries:           {report.retries}")
+    print(f"failed lookups:    {report.failed_lookups}")
+    print(f"server errors:     {report.server_errors}")
+    print(f"throttled queries: {report.throttled_queries}")
+
+
+if __name__ == "__main__":
+    main()
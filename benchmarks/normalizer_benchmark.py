@@ -0,0 +1,67 @@
+"""Micro-benchmark of the per-message domain normalization cost.
+
+Compares the direct `tld.get_tld` call the agent used to make on every message with the memoized
+normalizer, over a message stream where hosts repeat as they do in scans:
+
+    python -m benchmarks.normalizer_benchmark
+"""
+
+import random
+import time
+from collections.abc import Callable
+from typing import cast
+
+import tld
+
+from agent import normalizer
+
+FLDS_COUNT = 500
+SUBDOMAINS_PER_FLD = 20
+MESSAGES_COUNT = 200_000
+TLDS = ["com", "co", "de", "bg", "co.uk", "com.au", "it", "fr", "io", "net"]
+
+
+def _message_stream(seed: int = 0) -> list[str]:
+    """Hosts of a synthetic scan: each fld is seen through several subdomains, many times over."""
+    generator = random.Random(seed)
+    hosts = [
+        f"host{subdomain}.domain{fld}.{TLDS[fld % len(TLDS)]}"
+        for fld in range(FLDS_COUNT)
+        for subdomain in range(SUBDOMAINS_PER_FLD)
+    ]
+    return [generator.choice(hosts) for _ in range(MESSAGES_COUNT)]
+
+
+def _direct(domain: str) -> str | None:
+    domain_object = cast(
+        tld.Result | None,
+        tld.get_tld(domain, as_object=True, fix_protocol=True, fail_silently=True),
+    )
+    return None if domain_object is None else domain_object.fld
+
+
+def _measure(function: Callable[[str], object], messages: list[str]) -> float:
+    """Returns the mean cost of one call in microseconds."""
+    start = time.perf_counter()
+    for message in messages:
+        function(message)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main() -> None:
+    messages = _message_stream()
+
+    start = time.perf_counter()
+    normalizer.load_public_suffixes()
+    print(f"public suffix trie load: {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    direct_cost = _measure(_direct, messages)
+    normalizer.normalize.cache_clear()
+    memoized_cost = _measure(normalizer.get_fld, messages)
+    print(f"tld.get_tld per message:      {direct_cost:.2f} us")
+    print(f"normalizer.get_fld per message: {memoized_cost:.2f} us")
+    print(f"speedup: {direct_cost / memoized_cost:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark of the table-driven WHOIS parser against python-whois over the WHOIS corpus.
+
+For every corpus response, checks that `whois_parser` and python-whois produce the same emitted
+records, then times both parsers from the raw text to the emitted records:
+
+    python -m benchmarks.parser_benchmark
+
+Exits with status 1 when the records of a response differ.
+"""
+
+import sys
+import time
+from collections.abc import Callable, Mapping
+from typing import Any
+
+import whois
+
+from agent import result_parser, whois_parser
+from benchmarks import whois_corpus
+
+ROUNDS = 5
+ITERATIONS = 50
+
+_Parser = Callable[[str, str], Mapping[str, Any]]
+
+
+def _records(parser: _Parser, domain: str, text: str) -> list[dict[str, Any]]:
+    return list(result_parser.parse_results(parser(domain, text)))
+
+
+def _measure(parser: _Parser, domain: str, text: str) -> float:
+    """Returns the best mean time in microseconds of parsing a response into its records."""
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            _records(parser, domain, text)
+        best = min(best, (time.perf_counter() - start) / ITERATIONS * 1e6)
+    return best
+
+
+def main() -> int:
+    python_whois_parser: _Parser = whois.parser.WhoisEntry.load
+    mismatches = []
+    python_whois_total = 0.0
+    table_total = 0.0
+    print(f"{'domain':<22} {'python-whois':>14} {'whois_parser':>14} {'speedup':>8}")
+    for domain, text in whois_corpus.load_responses().items():
+        if _records(whois_parser.parse, domain, text) != _records(
+            python_whois_parser, domain, text
+        ):
+            mismatches.append(domain)
+        python_whois_cost = _measure(python_whois_parser, domain, text)
+        table_cost = _measure(whois_parser.parse, domain, text)
+        python_whois_total += python_whois_cost
+        table_total += table_cost
+        print(
+            f"{domain:<22} {python_whois_cost:>11.1f} us {table_cost:>11.1f} us"
+            f" {python_whois_cost / table_cost:>7.1f}x"
+        )
+    print(
+        f"{'total':<22} {python_whois_total:>11.1f} us {table_total:>11.1f} us"
+        f" {python_whois_total / table_total:>7.1f}x"
+    )
+    if len(mismatches) > 0:
+        print(f"Records differ from python-whois for: {', '.join(mismatches)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""Cold start benchmark of the agent, from the interpreter start to the first processed message.
+
+Each round runs in a fresh interpreter, so that nothing is imported or loaded beforehand, and measures:
+
+* the import of the agent module,
+* the agent construction, with the bus and the shared dedup set mocked,
+* the processing of the first message, with the whois lookup mocked.
+
+Rounds are run with and without the prewarm of the tables. `--connect-delay` models the time the agent
+spends connecting to the bus before its first message, during which the prewarm runs:
+
+    python -m benchmarks.startup_benchmark
+    python -m benchmarks.startup_benchmark --connect-delay 0.2 --importtime
+"""
+
+import argparse
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+
+ROUNDS = 5
+TOP_IMPORTS = 15
+REPOSITORY_PATH = pathlib.Path(__file__).parent.parent
+
+# Run in a fresh interpreter: prints the durations of the start phases as JSON.
+_STARTUP_SCRIPT = """
+import json, sys, time
+
+start = time.perf_counter()
+from agent import whois_domain_agent
+imported = time.perf_counter()
+
+import logging
+from ostorlab.agent.message import message as msg
+from benchmarks import agent_benchmark, whois_corpus
+
+logging.disable(logging.INFO)
+scan_output = whois_corpus.load_scan_outputs()["medallia.com"]
+prewarm, connect_delay = json.loads(sys.argv[1]), float(sys.argv[2])
+message = msg.Message.from_data("v3.asset.domain_name", data={"name": "medallia.com"})
+args = {"prewarm": prewarm}
+
+init_start = time.perf_counter()
+with agent_benchmark.offline_agent(args, whois_lookup=lambda _: scan_output) as agent:
+    initialized = time.perf_counter()
+    time.sleep(connect_delay)
+    process_start = time.perf_counter()
+    agent.process(message)
+    processed = time.perf_counter()
+
+print(json.dumps({
+    "import": imported - start,
+    "init": initialized - init_start,
+    "first_message": processed - process_start,
+}))
+"""
+
+
+def _run_round(prewarm: bool, connect_delay: float) -> dict[str, float]:
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            _STARTUP_SCRIPT,
+            json.dumps(prewarm),
+            str(connect_delay),
+        ],
+        cwd=REPOSITORY_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    durations: dict[str, float] = json.loads(output.splitlines()[-1])
+    return durations
+
+
+def _print_imports() -> None:
+    """Prints the modules whose import takes the longest, as reported by `python -X importtime`."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import agent.whois_domain_agent"],
+        cwd=REPOSITORY_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    imports: list[tuple[int, str]] = []
+    for line in stderr.splitlines():
+        if line.startswith("import time:") is False or "|" not in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        if cumulative_us.strip().isdigit():
+            imports.append((int(cumulative_us), name.rstrip()))
+    print("\nSlowest imports (cumulative):")
+    for cumulative, name in sorted(imports, reverse=True)[:TOP_IMPORTS]:
+        print(f"{cumulative / 1e3:>10.1f} ms {name}")
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--connect-delay",
+        type=float,
+        default=0.0,
+        help="Seconds between the agent construction and its first message.",
+    )
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument(
+        "--importtime",
+        action="store_true",
+        help="Also print the slowest imports of the agent module.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(argv)
+    print(f"{'phase (median ms)':<22}{'prewarm':>12}{'no prewarm':>12}")
+    medians = {}
+    for prewarm in (True, False):
+        rounds = [_run_round(prewarm, args.connect_delay) for _ in range(args.rounds)]
+        medians[prewarm] = {
+            phase: statistics.median(durations[phase] for durations in rounds)
+            for phase in rounds[0]
+        }
+    for phase in medians[True]:
+        print(
+            f"{phase:<22}{medians[True][phase] * 1e3:>12.1f}"
+            f"{medians[False][phase] * 1e3:>12.1f}"
+        )
+    totals = {
+        prewarm: sum(phase_medians.values())
+        for prewarm, phase_medians in medians.items()
+    }
+    print(f"{'total':<22}{totals[True] * 1e3:>12.1f}{totals[False] * 1e3:>12.1f}")
+    if args.importtime is True:
+        _print_imports()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+"""Versioned corpus of raw WHOIS responses used by the benchmarks.
+
+Each `corpus/<domain>.txt` file holds the raw response of one domain, as returned over port 43 with the
+registrar referral appended when the registry gives one. The corpus covers the response formats of
+several registries and registrars; registrant data is redacted as the registries publish it.
+
+Bump `CORPUS_VERSION` whenever a response is added, changed or removed, so that results measured on
+different corpora are not compared.
+"""
+
+import pathlib
+from typing import Any
+
+import whois
+
+CORPUS_VERSION = 1
+CORPUS_DIR = pathlib.Path(__file__).parent / "corpus"
+
+
+def load_responses() -> dict[str, str]:
+    """Returns the raw WHOIS responses of the corpus, keyed by domain."""
+    return {
+        path.name.removesuffix(".txt"): path.read_text(encoding="utf-8")
+        for path in sorted(CORPUS_DIR.glob("*.txt"))
+    }
+
+
+def load_scan_outputs() -> dict[str, dict[str, Any]]:
+    """Returns the corpus parsed by python-whois, in the shape `whois.whois` returns to the agent."""
+    return {
+        domain: dict(whois.parser.WhoisEntry.load(domain, text))
+        for domain, text in load_responses().items()
+    }
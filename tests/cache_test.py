@@ -0,0 +1,183 @@
+"""Unittests for the WHOIS result cache."""
+
+import contextlib
+import datetime
+import pathlib
+import socket
+import sqlite3
+
+from pytest_mock import plugin
+from whois import exceptions as whois_exceptions
+
+from agent import cache, rdap
+
+WHOIS_OUTPUT = {
+    "domain_name": "ostorlab.co",
+    "updated_date": datetime.datetime.fromisoformat("2023-01-30 06:57:45"),
+    "creation_date": [
+        datetime.datetime.fromisoformat("2015-01-27 22:03:32"),
+        datetime.datetime.fromisoformat("2015-01-28 22:03:32"),
+    ],
+    "email": ["compliance@tucows.com"],
+    "referral_url": None,
+}
+
+
+def testLRUCache_whenSizeExceeded_evictsLeastRecentlyUsed() -> None:
+    """The in-memory tier should keep at most max_size entries."""
+    lru = cache.LRUCache(max_size=2, ttl=60)
+
+    lru.set("a.com", {"domain_name": "a.com"})
+    lru.set("b.com", {"domain_name": "b.com"})
+    lru.get("a.com")
+    lru.set("c.com", {"domain_name": "c.com"})
+
+    assert len(lru) == 2
+    assert lru.get("a.com") == {"domain_name": "a.com"}
+    assert lru.get("b.com") is None
+    assert lru.get("c.com") == {"domain_name": "c.com"}
+
+
+def testLRUCache_whenEntryExpired_returnsNone(mocker: plugin.MockerFixture) -> None:
+    """Entries older than the TTL should not be returned."""
+    monotonic = mocker.patch("time.monotonic", return_value=100.0)
+    lru = cache.LRUCache(max_size=2, ttl=10)
+    lru.set("a.com", {"domain_name": "a.com"})
+
+    monotonic.return_value = 111.0
+
+    assert lru.get("a.com") is None
+    assert len(lru) == 0
+
+
+def testWhoisCache_whenRestartedWithDiskStore_returnsStoredResult(
+    tmp_path: pathlib.Path,
+) -> None:
+    """Results stored on disk should survive a new cache instance and keep their datetime values."""
+    path = str(tmp_path / "whois.sqlite")
+    cache.WhoisCache(path=path).set("ostorlab.co", WHOIS_OUTPUT)
+
+    restarted_cache = cache.WhoisCache(path=path)
+
+    assert restarted_cache.get("ostorlab.co") == WHOIS_OUTPUT
+    assert restarted_cache.get("ostorlab.com") is None
+
+
+def testWhoisCache_whenDiskEntryExpired_returnsNone(
+    tmp_path: pathlib.Path, mocker: plugin.MockerFixture
+) -> None:
+    """Expired on-disk entries should be ignored."""
+    path = str(tmp_path / "whois.sqlite")
+    wall_clock = mocker.patch("time.time", return_value=1000.0)
+    cache.WhoisCache(ttl=10, path=path).set("ostorlab.co", WHOIS_OUTPUT)
+
+    wall_clock.return_value = 1011.0
+
+    assert cache.WhoisCache(ttl=10, path=path).get("ostorlab.co") is None
+
+
+def testSqliteStore_whenPruneIntervalElapsed_deletesExpiredRowsOnSet(
+    tmp_path: pathlib.Path, mocker: plugin.MockerFixture
+) -> None:
+    """Expired rows should be deleted by a later write, without restarting the store."""
+    path = str(tmp_path / "whois.sqlite")
+    wall_clock = mocker.patch("time.time", return_value=1000.0)
+    store = cache.SqliteStore(path, ttl=10, prune_interval=100)
+    store.set("ostorlab.co", WHOIS_OUTPUT)
+
+    wall_clock.return_value = 1050.0
+    store.set("ostorlab.com", WHOIS_OUTPUT)
+    rows_before_prune = _stored_keys(path)
+    wall_clock.return_value = 1100.0
+    store.set("ostorlab.io", WHOIS_OUTPUT)
+    store.close()
+
+    assert rows_before_prune == ["ostorlab.co", "ostorlab.com"]
+    assert _stored_keys(path) == ["ostorlab.io"]
+
+
+def _stored_keys(path: str) -> list[str]:
+    with contextlib.closing(sqlite3.connect(path)) as connection:
+        return [
+            key
+            for (key,) in connection.execute("SELECT key FROM whois_cache ORDER BY key")
+        ]
+
+
+def testWhoisCache_whenFailureCached_usesTtlOfFailureReason(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Timeouts should be forgotten sooner than domains without whois match."""
+    monotonic = mocker.patch("time.monotonic", return_value=100.0)
+    whois_cache = cache.WhoisCache(negative_ttl=3600, negative_timeout_ttl=300)
+    whois_cache.set_failure("unknown.com", cache.FailureReason.NO_MATCH)
+    whois_cache.set_failure("slow.com", cache.FailureReason.TIMEOUT)
+
+    monotonic.return_value = 500.0
+
+    assert whois_cache.get_failure("unknown.com") == cache.FailureReason.NO_MATCH
+    assert whois_cache.get_failure("slow.com") is None
+    assert whois_cache.get("unknown.com") is None
+
+
+def testWhoisCache_whenRestartedWithDiskStore_returnsStoredFailure(
+    tmp_path: pathlib.Path,
+) -> None:
+    """Failures stored on disk should survive a new cache instance."""
+    path = str(tmp_path / "whois.sqlite")
+    cache.WhoisCache(path=path).set_failure(
+        "unknown.bg", cache.FailureReason.UNRESOLVABLE_SERVER
+    )
+
+    restarted_cache = cache.WhoisCache(path=path)
+
+    assert (
+        restarted_cache.get_failure("unknown.bg")
+        == cache.FailureReason.UNRESOLVABLE_SERVER
+    )
+    assert restarted_cache.get("unknown.bg") is None
+
+
+def testClassifyFailure_whenLookupErrors_returnsFailureReason() -> None:
+    """Lookup errors should be classified by failure type."""
+    assert (
+        cache.classify_failure(whois_exceptions.WhoisDomainNotFoundError("No match"))
+        == cache.FailureReason.NO_MATCH
+    )
+    assert (
+        cache.classify_failure(rdap.RdapNotFoundError("unregistered.com"))
+        == cache.FailureReason.NO_MATCH
+    )
+    assert (
+        cache.classify_failure(socket.gaierror())
+        == cache.FailureReason.UNRESOLVABLE_SERVER
+    )
+    assert cache.classify_failure(TimeoutError()) == cache.FailureReason.TIMEOUT
+    assert cache.classify_failure(ConnectionResetError()) == cache.FailureReason.TIMEOUT
+    assert cache.classify_failure(UnicodeError()) == cache.FailureReason.INVALID_DOMAIN
+
+
+def testClassifyFailure_whenQuotaCommandOrParseError_returnsTransient() -> None:
+    """Errors that say nothing of the domain should not be cached as a missing whois match."""
+    for error in (
+        whois_exceptions.WhoisQuotaExceededError(),
+        whois_exceptions.WhoisCommandFailedError(),
+        whois_exceptions.FailedParsingWhoisOutputError(),
+        whois_exceptions.PywhoisError(),
+        rdap.RdapError(),
+        OSError(101, "Network is unreachable"),
+    ):
+        assert cache.classify_failure(error) == cache.FailureReason.TRANSIENT
+
+
+def testWhoisCache_whenTransientFailureCached_usesTimeoutTtl(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Transient failures should be forgotten as soon as timeouts."""
+    monotonic = mocker.patch("time.monotonic", return_value=100.0)
+    whois_cache = cache.WhoisCache(negative_ttl=3600, negative_timeout_ttl=300)
+    whois_cache.set_failure("quota.com", cache.FailureReason.TRANSIENT)
+
+    assert whois_cache.get_failure("quota.com") == cache.FailureReason.TRANSIENT
+    monotonic.return_value = 500.0
+    assert whois_cache.get_failure("quota.com") is None
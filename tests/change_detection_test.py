@@ -0,0 +1,43 @@
+"""Unittests for the change detection of the emitted whois records."""
+
+from agent import change_detection
+
+RECORD = {
+    "name": "ostorlab.co",
+    "registrar": "Tucows Domains Inc.",
+    "name_servers": ["ns1.easydns.net", "ns2.easydns.org"],
+    "creation_date": ["2015-01-27T22:03:32"],
+}
+
+
+def testFingerprint_whenListOrderDiffers_isEqual() -> None:
+    """Name servers are emitted in no particular order, which should not count as a change."""
+    reordered_record = {
+        **RECORD,
+        "name_servers": ["ns2.easydns.org", "ns1.easydns.net"],
+    }
+
+    assert change_detection.fingerprint(reordered_record) == (
+        change_detection.fingerprint(RECORD)
+    )
+    assert "name" not in change_detection.fingerprint(RECORD)
+
+
+def testChangedFields_whenFieldsUpdatedAddedAndRemoved_returnsThemAll() -> None:
+    """Updated, added and removed fields should all be reported as changed."""
+    previous = change_detection.fingerprint(RECORD)
+    current = change_detection.fingerprint(
+        {
+            "name": "ostorlab.co",
+            "registrar": "MarkMonitor Inc.",
+            "name_servers": RECORD["name_servers"],
+            "org": "Ostorlab",
+        }
+    )
+
+    assert change_detection.changed_fields(previous, current) == [
+        "creation_date",
+        "org",
+        "registrar",
+    ]
+    assert change_detection.changed_fields(previous, previous) == []
@@ -1,7 +1,11 @@
 """Pytest fixture for the whois domain agent."""
 
+import http.server
 import json
 import pathlib
+import threading
+from collections.abc import Iterator
+from typing import Any, Self
 
 import pytest
 from ostorlab.agent import definitions as agent_definitions
@@ -10,6 +14,7 @@ from ostorlab.runtimes import definitions as runtime_definitions
 from ostorlab.utils import definitions
 
 from agent import whois_domain_agent
+from benchmarks import agent_factory
 
 
 @pytest.fixture
@@ -110,3 +115,124 @@ def bug_3001_message() -> message.Message:
         "name": "rexel.it",
     }
     return message.Message.from_data(selector, data=msg_data)
+
+
+@pytest.fixture
+def test_agent_with_concurrent_lookups() -> whois_domain_agent.AgentWhoisDomain:
+    """Creates a dummy agent for the Whois Domain Agent running lookups on a pool of workers."""
+    return agent_factory.build_agent(max_concurrent_lookups=4)
+
+
+RDAP_DOMAIN_RESPONSE = {
+    "objectClassName": "domain",
+    "ldhName": "MEDALLIA.COM",
+    "status": ["client delete prohibited", "client transfer prohibited"],
+    "port43": "whois.markmonitor.com",
+    "events": [
+        {"eventAction": "registration", "eventDate": "2001-03-19T23:09:24Z"},
+        {"eventAction": "expiration", "eventDate": "2027-03-19T23:09:24Z"},
+        {"eventAction": "last changed", "eventDate": "2024-02-15T10:03:48Z"},
+    ],
+    "nameservers": [
+        {"objectClassName": "nameserver", "ldhName": "NS-1135.AWSDNS-13.ORG"},
+        {"objectClassName": "nameserver", "ldhName": "NS-331.AWSDNS-41.COM"},
+    ],
+    "secureDNS": {"delegationSigned": False},
+    "entities": [
+        {
+            "objectClassName": "entity",
+            "roles": ["registrar"],
+            "vcardArray": [
+                "vcard",
+                [
+                    ["version", {}, "text", "4.0"],
+                    ["fn", {}, "text", "MarkMonitor Inc."],
+                    ["url", {}, "uri", "http://www.markmonitor.com"],
+                ],
+            ],
+            "entities": [
+                {
+                    "objectClassName": "entity",
+                    "roles": ["abuse"],
+                    "vcardArray": [
+                        "vcard",
+                        [
+                            ["version", {}, "text", "4.0"],
+                            ["email", {}, "text", "abusecomplaints@markmonitor.com"],
+                        ],
+                    ],
+                }
+            ],
+        },
+        {
+            "objectClassName": "entity",
+            "roles": ["registrant"],
+            "vcardArray": [
+                "vcard",
+                [
+                    ["version", {}, "text", "4.0"],
+                    ["fn", {}, "text", "Domain Administrator"],
+                    ["org", {}, "text", "Medallia Inc."],
+                    [
+                        "adr",
+                        {},
+                        "text",
+                        ["", "", "575 Market St", "San Francisco", "CA", "94105", "US"],
+                    ],
+                ],
+            ],
+        },
+    ],
+}
+
+
+class FakeRdapServer:
+    """Local HTTP stand-in of an RDAP server, answering the domains of `responses` and 404 otherwise."""
+
+    def __init__(self) -> None:
+        self.responses: dict[str, tuple[int, dict[str, Any]]] = {}
+        self.requests: list[str] = []
+        self.connections_count = 0
+        fake_server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                fake_server.connections_count += 1
+                super().setup()
+
+            def do_GET(self) -> None:
+                fake_server.requests.append(self.path)
+                domain_name = self.path.rsplit("/", 1)[-1]
+                status, body = fake_server.responses.get(
+                    domain_name, (404, {"errorCode": 404})
+                )
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/rdap+json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format: str, *args: object) -> None:
+                del format, args
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}/rdap/"
+
+    def __enter__(self) -> Self:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def rdap_server() -> Iterator[FakeRdapServer]:
+    """Runs a local RDAP server answering for medallia.com."""
+    with FakeRdapServer() as server:
+        server.responses["medallia.com"] = (200, RDAP_DOMAIN_RESPONSE)
+        yield server
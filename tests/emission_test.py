@@ -0,0 +1,25 @@
+"""Unittests for the compact payloads of the emitted records."""
+
+from typing import Any
+
+from agent import emission
+
+RECORD: dict[str, Any] = {
+    "name": "ostorlab.co",
+    "registrar": "Tucows Domains Inc.",
+    "status": ["clientTransferProhibited"],
+    "emails": [],
+    "org": None,
+    "updated_date": ["2018-12-08T10:36:41"],
+}
+
+
+def testCompact_whenFieldsUnset_dropsThem() -> None:
+    """None values and empty lists should be left out, empty strings kept."""
+    assert emission.compact({**RECORD, "city": ""}) == {
+        "name": "ostorlab.co",
+        "registrar": "Tucows Domains Inc.",
+        "status": ["clientTransferProhibited"],
+        "updated_date": ["2018-12-08T10:36:41"],
+        "city": "",
+    }
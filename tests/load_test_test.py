@@ -0,0 +1,47 @@
+"""Unittests for the end-to-end load test harness."""
+
+from pytest_mock import plugin
+
+from benchmarks import fake_whois_server, load_test
+
+
+def testRunLoadTest_whenServerAnswers_reportsLatencyOfEveryMessage() -> None:
+    """Every message should be looked up once and timed until its records are emitted."""
+    server = fake_whois_server.FakeWhoisServer(load_test.corpus_responder())
+
+    report = load_test.run_load_test(server, messages_count=20, concurrency=4)
+
+    assert len(report.latencies) == 20
+    assert report.attempts == 20
+    assert report.retries == 0
+    assert report.failed_lookups == 0
+    assert report.percentile(50) <= report.percentile(99)
+
+
+def testRunLoadTest_whenServerResetsConnections_reportsRetries(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Lookups of a failing server should be retried, then reported as failed."""
+    mocker.patch("time.sleep")
+    server = fake_whois_server.FakeWhoisServer(
+        load_test.corpus_responder(), error_rate=1.0
+    )
+
+    report = load_test.run_load_test(server, messages_count=5, concurrency=2)
+
+    assert report.attempts == 15
+    assert report.retries == 10
+    assert report.failed_lookups == 5
+    assert report.server_errors == 15
+
+
+def testRunLoadTest_whenWhoisServerDiscovery_doesNotAskIana() -> None:
+    """With the bundled snapshot of the WHOIS servers, no lookup should start with an IANA query."""
+    server = fake_whois_server.FakeWhoisServer(load_test.corpus_responder())
+
+    report = load_test.run_load_test(
+        server, messages_count=20, concurrency=4, whois_server_discovery=True
+    )
+
+    assert report.failed_lookups == 0
+    assert [query for query in server.queries if "." not in query] == []
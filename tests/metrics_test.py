@@ -0,0 +1,64 @@
+"""Unittests for the agent metrics."""
+
+import pathlib
+import urllib.request
+
+from agent import metrics
+
+
+def testWhoisMetrics_whenSampleNeverRecorded_returnsZero() -> None:
+    """Series that were never updated should read as zero rather than missing."""
+    whois_metrics = metrics.WhoisMetrics()
+
+    whois_metrics.cache.labels(result="hit").inc(2)
+
+    assert whois_metrics.value("whois_cache_total", result="hit") == 2
+    assert whois_metrics.value("whois_cache_total", result="miss") == 0
+
+
+def testWhoisMetrics_whenLookupTimed_countsItInHistogram() -> None:
+    """Timed lookups should be counted in the histogram series of their labels."""
+    whois_metrics = metrics.WhoisMetrics()
+
+    with whois_metrics.lookup_duration.labels(tld="com", server="com").time():
+        pass
+
+    assert (
+        whois_metrics.value(
+            "whois_lookup_duration_seconds_count", tld="com", server="com"
+        )
+        == 1
+    )
+
+
+def testSnapshotWriter_whenStopped_writesLastSnapshot(tmp_path: pathlib.Path) -> None:
+    """Stopping the writer should leave the final metrics in the snapshot file."""
+    whois_metrics = metrics.WhoisMetrics()
+    snapshot_path = tmp_path / "metrics.prom"
+    writer = metrics.SnapshotWriter(
+        whois_metrics.registry, str(snapshot_path), interval=3600
+    )
+    writer.start()
+
+    whois_metrics.emitted_messages.inc()
+    writer.stop()
+
+    assert "whois_emitted_messages_total 1.0\n" in snapshot_path.read_text()
+
+
+def testServe_whenMetricsRequested_returnsRegistryMetrics() -> None:
+    """The HTTP endpoint should serve the registry on /metrics."""
+    whois_metrics = metrics.WhoisMetrics()
+    whois_metrics.emitted_messages.inc()
+    server = metrics.serve(whois_metrics.registry, 0, host="127.0.0.1")
+
+    try:
+        with urllib.request.urlopen(
+            f"http://127.0.0.1:{server.server_port}/metrics"
+        ) as response:
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert "whois_emitted_messages_total 1.0\n" in body
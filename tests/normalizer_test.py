@@ -0,0 +1,37 @@
+"""Unittests for the domain normalizer."""
+
+import tld
+from pytest_mock import plugin
+
+from agent import normalizer
+
+
+def testNormalize_whenSubdomainUrl_returnsFldTldIdnaAndHost() -> None:
+    """The fld, public suffix, IDNA form and host should be resolved in one pass."""
+    normalized_domain = normalizer.normalize("https://a.b.bücher.co.uk/path")
+
+    assert normalized_domain == normalizer.NormalizedDomain(
+        fld="bücher.co.uk",
+        tld="co.uk",
+        idna="xn--bcher-kva.co.uk",
+        host="a.b.bücher.co.uk",
+    )
+
+
+def testNormalize_whenNoPublicSuffix_returnsNone() -> None:
+    """Inputs without a known public suffix should not be normalized."""
+    assert normalizer.normalize("test") is None
+    assert normalizer.get_fld("test") is None
+
+
+def testNormalize_whenSameInputRepeated_parsesItOnce(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Repeated raw inputs should be served from the memo cache."""
+    normalizer.normalize.cache_clear()
+    get_tld_spy = mocker.spy(tld, "get_tld")
+
+    fld_list = [normalizer.get_fld("www.ostorlab.co") for _ in range(3)]
+
+    assert fld_list == ["ostorlab.co"] * 3
+    get_tld_spy.assert_called_once()
@@ -0,0 +1,50 @@
+"""Unittests for the sampled profiler."""
+
+import pathlib
+import pstats
+
+from agent import profiling
+
+
+def _allocate() -> list[bytes]:
+    return [bytes(1024) for _ in range(100)]
+
+
+def testSampledProfiler_whenOneInTwoCallsSampled_writesProfileAndAllocations(
+    tmp_path: pathlib.Path,
+) -> None:
+    """Sampled calls should write a loadable profile and the allocations they made."""
+    profiler = profiling.SampledProfiler(str(tmp_path), sample_rate=2)
+    kept = []
+
+    for _ in range(2):
+        with profiler.sample("process"):
+            kept.append(_allocate())
+
+    profiles = list(tmp_path.glob("process-*.prof"))
+    reports = list(tmp_path.glob("process-*.allocations.txt"))
+    assert len(profiles) == 1
+    assert len(reports) == 1
+    assert any(
+        "_allocate" in function_name
+        for _, _, function_name in pstats.Stats(str(profiles[0])).stats  # type: ignore[attr-defined]
+    )
+    assert "profiling_test.py" in reports[0].read_text()
+
+
+def testSampledProfiler_whenMoreSamplesThanMaxDumps_keepsMostRecent(
+    tmp_path: pathlib.Path,
+) -> None:
+    """Only the dumps of the most recent samples should be kept."""
+    profiler = profiling.SampledProfiler(str(tmp_path), sample_rate=1, max_dumps=2)
+
+    for _ in range(4):
+        with profiler.sample("lookup"):
+            _allocate()
+
+    assert sorted(path.name.split("-")[-1] for path in tmp_path.iterdir()) == [
+        "000003.allocations.txt",
+        "000003.prof",
+        "000004.allocations.txt",
+        "000004.prof",
+    ]
@@ -0,0 +1,107 @@
+"""Unittests for the per-WHOIS-server rate limiter."""
+
+from pytest_mock import plugin
+
+from agent import rate_limiter
+
+
+def testTokenBucket_whenBurstExhausted_waitsForNextToken(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Requests beyond the burst should be paced at the bucket rate."""
+    mocker.patch("time.monotonic", return_value=100.0)
+    sleep_mock = mocker.patch("time.sleep")
+    bucket = rate_limiter.TokenBucket(rate=2.0, burst=2)
+
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits == [0.0, 0.0, 0.5, 1.0]
+    assert [call.args[0] for call in sleep_mock.call_args_list] == [0.5, 1.0]
+
+
+def testTokenBucket_whenIdle_refillsUpToBurst(mocker: plugin.MockerFixture) -> None:
+    """An idle bucket should refill, but never beyond its burst size."""
+    monotonic = mocker.patch("time.monotonic", return_value=100.0)
+    mocker.patch("time.sleep")
+    bucket = rate_limiter.TokenBucket(rate=1.0, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+
+    monotonic.return_value = 200.0
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 1.0]
+
+
+def testTokenBucket_whenTryAcquireWithoutToken_returnsDelayWithoutTakingIt(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """try_acquire should not wait nor take a token when none is available."""
+    monotonic = mocker.patch("time.monotonic", return_value=100.0)
+    sleep_mock = mocker.patch("time.sleep")
+    bucket = rate_limiter.TokenBucket(rate=2.0, burst=1)
+
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.5, 0.5]
+
+    monotonic.return_value = 100.5
+    assert bucket.try_acquire() == 0.0
+    sleep_mock.assert_not_called()
+
+
+def testTokenBucket_whenTokenRefunded_letsNextRequestThroughUpToBurst(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """A refunded token should be available again, without growing the bucket beyond its burst."""
+    mocker.patch("time.monotonic", return_value=100.0)
+    bucket = rate_limiter.TokenBucket(rate=1.0, burst=1)
+    bucket.refund()
+
+    assert bucket.try_acquire() == 0.0
+    bucket.refund()
+    assert [bucket.try_acquire() for _ in range(2)] == [0.0, 1.0]
+
+
+def testServerRateLimiter_whenServersDiffer_pacesEachServerIndependently(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """A throttled server should not slow down requests to another server."""
+    mocker.patch("time.monotonic", return_value=100.0)
+    sleep_mock = mocker.patch("time.sleep")
+    limiter = rate_limiter.ServerRateLimiter(
+        rate=1.0, burst=1, server_rates={"bg": 0.5}
+    )
+
+    limiter.acquire("bg")
+    limiter.acquire("bg")
+    limiter.acquire("whois.denic.de")
+
+    sleep_mock.assert_called_once_with(2.0)
+
+
+def testServerRateLimiter_whenPenalized_delaysNextRequest(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """A failure should make the next request to the same server wait for a fresh token."""
+    mocker.patch("time.monotonic", return_value=100.0)
+    sleep_mock = mocker.patch("time.sleep")
+    limiter = rate_limiter.ServerRateLimiter(rate=1.0, burst=5)
+
+    limiter.acquire("whois.denic.de")
+    limiter.penalize("whois.denic.de")
+    limiter.acquire("whois.denic.de")
+
+    sleep_mock.assert_called_once_with(1.0)
+
+
+def testWhoisServerKey_whenServerKnown_returnsServer() -> None:
+    """Domains of TLDs with a known WHOIS server should be keyed by that server."""
+    assert rate_limiter.whois_server_key("ostorlab.de") == "whois.denic.de"
+
+
+def testWhoisServerKey_whenServerUnknown_returnsTld(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Domains of TLDs without a locally known server should be keyed by TLD, without querying IANA."""
+    socket_mock = mocker.patch("socket.socket")
+
+    assert rate_limiter.whois_server_key("electrohold.bg") == "bg"
+    socket_mock.assert_not_called()
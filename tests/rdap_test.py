@@ -0,0 +1,122 @@
+"""Unittests for the RDAP lookups."""
+
+import datetime
+import json
+import pathlib
+
+import pytest
+
+from agent import rdap, result_parser
+from tests import conftest
+
+
+def testLoadBootstrap_whenServiceHasSeveralUrls_prefersHttps(
+    tmp_path: pathlib.Path,
+) -> None:
+    """Each TLD of a service should map to the HTTPS URL of the service."""
+    bootstrap_path = tmp_path / "dns.json"
+    bootstrap_path.write_text(
+        json.dumps(
+            {
+                "services": [
+                    [["FR", "re"], ["http://rdap.nic.fr/", "https://rdap.nic.fr/"]],
+                    [["empty"], []],
+                ]
+            }
+        )
+    )
+
+    endpoints = rdap.load_bootstrap(bootstrap_path)
+
+    assert endpoints == {"fr": "https://rdap.nic.fr/", "re": "https://rdap.nic.fr/"}
+
+
+def testLoadBootstrap_whenBundledSnapshot_knowsCommonTlds() -> None:
+    """The bundled snapshot should cover the most common TLDs."""
+    endpoints = rdap.load_bootstrap()
+
+    assert endpoints["com"] == "https://rdap.verisign.com/com/v1/"
+    assert "org" in endpoints
+
+
+def testToWhoisData_whenDomainResponse_mapsToWhoisFields() -> None:
+    """RDAP dates, entities and name servers should be mapped to the python-whois fields."""
+    whois_data = rdap.to_whois_data(conftest.RDAP_DOMAIN_RESPONSE)
+
+    assert whois_data["domain_name"] == "medallia.com"
+    assert whois_data["creation_date"] == datetime.datetime(
+        2001, 3, 19, 23, 9, 24, tzinfo=datetime.UTC
+    )
+    assert whois_data["registrar"] == "MarkMonitor Inc."
+    assert whois_data["referral_url"] == "http://www.markmonitor.com"
+    assert whois_data["whois_server"] == "whois.markmonitor.com"
+    assert whois_data["emails"] == ["abusecomplaints@markmonitor.com"]
+    assert whois_data["org"] == "Medallia Inc."
+    assert whois_data["city"] == "San Francisco"
+    assert whois_data["country"] == "US"
+    assert whois_data["dnssec"] == "unsigned"
+
+
+def testToWhoisData_whenParsed_yieldsSameRecordShapeAsWhois() -> None:
+    """The mapped data should be consumed by `parse_results` like python-whois results."""
+    records = list(
+        result_parser.parse_results(rdap.to_whois_data(conftest.RDAP_DOMAIN_RESPONSE))
+    )
+
+    assert len(records) == 1
+    assert records[0]["name"] == "medallia.com"
+    assert records[0]["updated_date"] == ["2024-02-15T10:03:48+00:00"]
+    assert records[0]["status"] == [
+        "client delete prohibited",
+        "client transfer prohibited",
+    ]
+    assert sorted(records[0]["name_servers"]) == [
+        "ns-1135.awsdns-13.org",
+        "ns-331.awsdns-41.com",
+    ]
+    assert records[0]["contact_names"] == ["Domain Administrator"]
+    assert records[0]["zipcode"] == "94105"
+
+
+def testRdapClient_whenSeveralLookups_reusesConnection(
+    rdap_server: conftest.FakeRdapServer,
+) -> None:
+    """Lookups to the same server should share a kept-alive connection."""
+    client = rdap.RdapClient({"com": rdap_server.url})
+
+    for _ in range(5):
+        whois_data = client.lookup("medallia.com")
+    client.close()
+
+    assert whois_data["domain_name"] == "medallia.com"
+    assert rdap_server.requests == ["/rdap/domain/medallia.com"] * 5
+    assert rdap_server.connections_count == 1
+
+
+def testRdapClient_whenDomainNotRegistered_raisesNotFound(
+    rdap_server: conftest.FakeRdapServer,
+) -> None:
+    """A 404 answer should be reported as a missing whois match."""
+    client = rdap.RdapClient({"com": rdap_server.url})
+
+    with pytest.raises(rdap.RdapNotFoundError):
+        client.lookup("unregistered.com")
+
+
+def testRdapClient_whenServerUnavailable_raisesRetryableError(
+    rdap_server: conftest.FakeRdapServer,
+) -> None:
+    """Throttling and server errors should be raised as connection errors, which are retried."""
+    rdap_server.responses["medallia.com"] = (503, {})
+    client = rdap.RdapClient({"com": rdap_server.url})
+
+    with pytest.raises(ConnectionError):
+        client.lookup("medallia.com")
+
+
+def testRdapClient_whenTldHasNoServer_hasNoEndpoint() -> None:
+    """TLDs missing from the bootstrap file should not be looked up over RDAP."""
+    client = rdap.RdapClient({"com": "https://rdap.verisign.com/com/v1/"})
+
+    assert client.endpoint("rexel.it") is None
+    assert client.server("medallia.com") == "rdap.verisign.com"
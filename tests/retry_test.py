@@ -0,0 +1,73 @@
+"""Unittests for the whois query retry policy."""
+
+import socket
+
+import pytest
+from pytest_mock import plugin
+
+from agent import retry
+
+
+def testIsRetryable_whenErrorClassified_retriesTransientErrorsOnly() -> None:
+    """Network errors, timeouts and resolver failures are transient, unknown names are not."""
+    assert retry.is_retryable(ConnectionResetError()) is True
+    assert retry.is_retryable(TimeoutError()) is True
+    assert retry.is_retryable(socket.gaierror(socket.EAI_AGAIN, "again")) is True
+    assert retry.is_retryable(socket.gaierror(socket.EAI_NONAME, "unknown")) is False
+    assert retry.is_retryable(OSError(101, "Network is unreachable")) is True
+    assert retry.is_retryable(ValueError()) is False
+
+
+def testCircuitBreaker_whenConsecutiveFailuresReachThreshold_opens() -> None:
+    """The circuit should open after the threshold of consecutive failures, a success resets the count."""
+    breaker = retry.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow() is True
+    breaker.record_failure()
+
+    assert breaker.state is retry.CircuitState.OPEN
+    assert breaker.allow() is False
+
+
+def testCircuitBreaker_whenResetTimeoutElapsed_letsSingleProbeThrough(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Once cooled down, one probe is allowed: its success closes the circuit, its failure reopens it."""
+    monotonic_mock = mocker.patch("time.monotonic", return_value=100.0)
+    breaker = retry.CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+
+    monotonic_mock.return_value = 161.0
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+    breaker.record_failure()
+    assert breaker.allow() is False
+
+    monotonic_mock.return_value = 222.0
+    assert breaker.allow() is True
+    breaker.record_success()
+    assert breaker.state is retry.CircuitState.CLOSED
+
+
+def testCircuitBreakers_whenServerCircuitOpen_raisesForThatServerOnly() -> None:
+    """Breakers should be kept per server."""
+    breakers = retry.CircuitBreakers(failure_threshold=1, reset_timeout=60)
+
+    breakers.record_failure("whois.nic.bg")
+
+    with pytest.raises(retry.CircuitOpenError):
+        breakers.check("whois.nic.bg")
+    breakers.check("whois.verisign-grs.com")
+
+
+def testCircuitBreakers_whenThresholdIsZero_neverOpens() -> None:
+    """A threshold of 0 should disable the breakers."""
+    breakers = retry.CircuitBreakers(failure_threshold=0)
+
+    for _ in range(10):
+        breakers.record_failure("whois.nic.bg")
+
+    breakers.check("whois.nic.bg")
@@ -0,0 +1,68 @@
+"""Unittests for the scheduling of the pending lookups."""
+
+import threading
+
+from agent import scheduler
+
+
+def testLookupScheduler_whenServerThrottled_handsOutLookupOfServerWithCapacity() -> (
+    None
+):
+    """A lookup queued behind a throttled server should not wait for it."""
+    delays = {"whois.verisign-grs.com": 2.0, "whois.nic.fr": 0.0}
+    lookups_scheduler: scheduler.LookupScheduler[str] = scheduler.LookupScheduler(
+        delays.__getitem__
+    )
+    lookups_scheduler.put("a.com", "whois.verisign-grs.com")
+    lookups_scheduler.put("b.fr", "whois.nic.fr")
+
+    assert lookups_scheduler.get() == ("b.fr", "whois.nic.fr")
+    assert len(lookups_scheduler) == 1
+
+
+def testLookupScheduler_whenPrioritiesDiffer_handsOutHighPriorityFirst() -> None:
+    """High priority lookups should be handed out first, then the oldest ones."""
+    lookups_scheduler: scheduler.LookupScheduler[str] = scheduler.LookupScheduler(
+        lambda server: 0.0
+    )
+    lookups_scheduler.put("a.com", "com")
+    lookups_scheduler.put("b.com", "com")
+    lookups_scheduler.put("c.fr", "fr", priority=scheduler.PRIORITY_HIGH)
+
+    assert [lookups_scheduler.get()[0] for _ in range(3)] == ["c.fr", "a.com", "b.com"]
+
+
+def testLookupScheduler_whenSourcesQueueLookups_servesSourcesInTurn() -> None:
+    """A source queuing many lookups should not hold up the lookups of another source."""
+    lookups_scheduler: scheduler.LookupScheduler[str] = scheduler.LookupScheduler(
+        lambda server: 0.0
+    )
+    for index in range(3):
+        lookups_scheduler.put(f"a{index}.com", "com", source="agent/a")
+    lookups_scheduler.put("b0.com", "com", source="agent/b")
+    lookups_scheduler.put("b1.com", "com", source="agent/b")
+
+    assert [lookups_scheduler.get()[0] for _ in range(5)] == [
+        "a0.com",
+        "b0.com",
+        "a1.com",
+        "b1.com",
+        "a2.com",
+    ]
+
+
+def testLookupScheduler_whenNoServerHasCapacity_waitsForCapacity() -> None:
+    """get should wait for the delay returned for the throttled server, then take its query."""
+    delays = [0.05, 0.0]
+    lookups_scheduler: scheduler.LookupScheduler[str] = scheduler.LookupScheduler(
+        lambda server: delays.pop(0)
+    )
+    lookups_scheduler.put("a.com", "com")
+    result: list[tuple[str, str]] = []
+    thread = threading.Thread(target=lambda: result.append(lookups_scheduler.get()))
+
+    thread.start()
+    thread.join(timeout=5)
+
+    assert result == [("a.com", "com")]
+    assert delays == []
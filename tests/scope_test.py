@@ -0,0 +1,71 @@
+"""Unittests for the domain scanning scope matcher."""
+
+from agent import scope
+
+
+def testScopeMatcher_whenNoRules_everyDomainIsInScope() -> None:
+    """Without rules, the scope is not restricted."""
+    assert scope.ScopeMatcher().matches("ostorlab.co") is True
+
+
+def testScopeMatcher_whenExactAndWildcardRules_matchesByLabels() -> None:
+    """Exact rules match the domain only and wildcard rules match its subdomains only."""
+    matcher = scope.ScopeMatcher(["ostorlab.co", "*.medallia.com", "*.bg"])
+
+    assert matcher.matches("ostorlab.co") is True
+    assert matcher.matches("OSTORLAB.CO.") is True
+    assert matcher.matches("www.ostorlab.co") is False
+    assert matcher.matches("a.b.c.d.medallia.com") is True
+    assert matcher.matches("medallia.com") is False
+    assert matcher.matches("notmedallia.com") is False
+    assert matcher.matches("electrohold.bg") is True
+
+
+def testScopeMatcher_whenRegexRules_combinesThemWithMatchSemantics() -> None:
+    """Regular expressions should keep the re.match semantics of scope_domain_regex."""
+    matcher = scope.ScopeMatcher([r"re:.*medallia\.com", r"re:ostorlab\.(co|com)$"])
+
+    assert matcher.matches("a.medallia.com") is True
+    assert matcher.matches("ostorlab.com") is True
+    assert matcher.matches("www.ostorlab.com") is False
+
+
+def testScopeMatcher_whenExcludeRules_rejectsMatchingDomains() -> None:
+    """Exclude rules take precedence over include rules."""
+    matcher = scope.ScopeMatcher(["*.com", "!*.dev.ostorlab.com", "!re:test"])
+
+    assert matcher.matches("ostorlab.com") is True
+    assert matcher.matches("api.dev.ostorlab.com") is False
+    assert matcher.matches("test.com") is False
+    assert matcher.matches("ostorlab.co") is False
+
+
+def testScopeMatcher_whenOnlyExcludeRules_otherDomainsAreInScope() -> None:
+    """Exclude-only rule sets should accept every domain they do not match."""
+    matcher = scope.ScopeMatcher(["!ostorlab.co"])
+
+    assert matcher.matches("ostorlab.co") is False
+    assert matcher.matches("ostorlab.com") is True
+
+
+def testScopeMatcher_whenRegexesCanNotBeCombined_matchesThemOneByOne() -> None:
+    """Regexes using global flags should still be supported."""
+    matcher = scope.ScopeMatcher(["re:(?i)OSTORLAB", r"re:(a)\1\.com"])
+
+    assert matcher.matches("ostorlab.co") is True
+    assert matcher.matches("aa.com") is True
+    assert matcher.matches("ab.com") is False
+
+
+def testScope_whenLegacyRegexArg_matchesItAgainstFld() -> None:
+    """scope_domain_regex should keep applying to the registrable domain, the scope rules to the host."""
+    domains_scope = scope.Scope.from_args(["*.medallia.com"], r"^medallia\.com$")
+
+    assert domains_scope.contains("www.medallia.com", "medallia.com") is True
+    assert domains_scope.contains("medallia.com", "medallia.com") is False
+    assert (
+        scope.Scope.from_args(None, r"^medallia\.com$").contains(
+            "www.medallia.com", "medallia.com"
+        )
+        is True
+    )
@@ -0,0 +1,58 @@
+"""Unittests for the coalescing of concurrent calls."""
+
+import threading
+import time
+from concurrent import futures
+
+import pytest
+
+from agent import single_flight
+
+# Time given to the waiting callers to join the in-flight call before it returns.
+JOIN_DELAY = 0.2
+
+
+def testSingleFlight_whenConcurrentCallsOfSameKey_runsFunctionOnce() -> None:
+    """Callers arriving while a call is in flight should share its result."""
+    flight: single_flight.SingleFlight[str] = single_flight.SingleFlight()
+    calls = []
+
+    def _lookup(domain_name: str) -> str:
+        calls.append(domain_name)
+        time.sleep(JOIN_DELAY)
+        return domain_name.upper()
+
+    with futures.ThreadPoolExecutor(max_workers=4) as executor:
+        outcomes = list(
+            executor.map(
+                lambda _: flight.do("ostorlab.co", _lookup, "ostorlab.co"), range(4)
+            )
+        )
+
+    assert calls == ["ostorlab.co"]
+    assert [result for result, _ in outcomes] == ["OSTORLAB.CO"] * 4
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True]
+    assert len(flight) == 0
+
+
+def testSingleFlight_whenInFlightCallRaises_raisesToAllCallers() -> None:
+    """Waiting callers should get the error of the in-flight call, and the next call should run again."""
+    flight: single_flight.SingleFlight[str] = single_flight.SingleFlight()
+    started = threading.Event()
+
+    def _failing_lookup() -> str:
+        started.set()
+        time.sleep(JOIN_DELAY)
+        raise ConnectionError("whois server unreachable")
+
+    with futures.ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(flight.do, "ostorlab.co", _failing_lookup)
+        started.wait()
+        follower = executor.submit(flight.do, "ostorlab.co", lambda: "not called")
+
+        with pytest.raises(ConnectionError):
+            leader.result()
+        with pytest.raises(ConnectionError):
+            follower.result()
+
+    assert flight.do("ostorlab.co", lambda: "ostorlab.co") == ("ostorlab.co", False)
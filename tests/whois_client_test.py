@@ -0,0 +1,193 @@
+"""Unittests for the asyncio port-43 WHOIS client."""
+
+import asyncio
+from concurrent import futures
+
+import pytest
+from whois import exceptions as whois_exceptions
+
+from agent import whois_client, whois_servers
+from benchmarks import fake_whois_server
+
+REGISTRY_RESPONSE = """Domain Name: OSTORLAB.COM
+Registry Domain ID: 1873431346_DOMAIN_COM-VRSN
+Registrar WHOIS Server: 127.0.0.1
+Updated Date: 2023-01-30T06:57:45Z
+Creation Date: 2015-01-27T22:03:32Z
+Registry Expiry Date: 2027-01-26T23:59:59Z
+Name Server: NS1.EASYDNS.COM
+"""
+
+REGISTRAR_RESPONSE = """Domain Name: ostorlab.com
+Registrar WHOIS Server: 127.0.0.1
+Registrar: Tucows Domains Inc.
+Registrar Abuse Contact Email: compliance@tucows.com
+"""
+
+
+def testAsyncWhoisClient_whenRegistryRefersToRegistrar_returnsBothResponses() -> None:
+    """The client should follow the registrar referral once and concatenate the responses."""
+
+    async def run() -> tuple[str, list[str]]:
+        async with fake_whois_server.FakeWhoisServer(
+            [REGISTRY_RESPONSE, REGISTRAR_RESPONSE]
+        ) as server:
+            client = whois_client.AsyncWhoisClient(port=server.port)
+            text = await client.lookup("ostorlab.com", server="localhost")
+            return text, server.queries
+
+    text, queries = asyncio.run(run())
+
+    assert text == REGISTRY_RESPONSE + REGISTRAR_RESPONSE
+    assert queries == ["ostorlab.com", "ostorlab.com"]
+
+
+def testAsyncWhoisClient_whenManyLookupsInFlight_answersAll() -> None:
+    """Lookups should run concurrently on one event loop."""
+
+    async def run() -> list[str]:
+        async with fake_whois_server.FakeWhoisServer(
+            lambda query: f"Domain Name: {query}\n"
+        ) as server:
+            client = whois_client.AsyncWhoisClient(port=server.port)
+            return await asyncio.gather(
+                *(
+                    client.lookup(f"domain{index}.com", server="127.0.0.1")
+                    for index in range(100)
+                )
+            )
+
+    texts = asyncio.run(run())
+
+    assert texts == [f"Domain Name: domain{index}.com\n" for index in range(100)]
+
+
+def testAsyncWhoisClient_whenServerDoesNotAnswer_raisesTimeoutError() -> None:
+    """A hop taking longer than the timeout should raise a TimeoutError."""
+
+    async def stall(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await asyncio.sleep(1)
+        writer.close()
+
+    async def run() -> None:
+        server = await asyncio.start_server(stall, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            client = whois_client.AsyncWhoisClient(timeout=0.1, port=port)
+            await client.lookup("ostorlab.com", server="127.0.0.1")
+        finally:
+            server.close()
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(run())
+
+
+def testAsyncWhoisClient_whenResponseIsEmpty_raisesWhoisError() -> None:
+    """An empty answer should raise the same error as python-whois."""
+
+    async def run() -> None:
+        async with fake_whois_server.FakeWhoisServer([""]) as server:
+            client = whois_client.AsyncWhoisClient(port=server.port)
+            await client.lookup("ostorlab.com", server="127.0.0.1")
+
+    with pytest.raises(whois_exceptions.WhoisCommandFailedError):
+        asyncio.run(run())
+
+
+def testAsyncWhoisClient_whenServerResetsConnection_raisesConnectionResetError() -> (
+    None
+):
+    """Connection resets of a loaded server should surface as retryable connection errors."""
+
+    async def run() -> None:
+        async with fake_whois_server.FakeWhoisServer(
+            [REGISTRY_RESPONSE], error_rate=1.0
+        ) as server:
+            client = whois_client.AsyncWhoisClient(port=server.port)
+            await client.lookup("ostorlab.com", server="127.0.0.1")
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(run())
+
+
+def testFakeWhoisServer_whenClientExceedsThrottle_resetsFurtherConnections() -> None:
+    """The fake server should reset the connections of a client over its query budget."""
+
+    async def run() -> tuple[str, int]:
+        async with fake_whois_server.FakeWhoisServer(
+            lambda query: REGISTRY_RESPONSE, throttle_queries=1, throttle_window=60
+        ) as server:
+            client = whois_client.AsyncWhoisClient(port=server.port, max_referrals=0)
+            text = await client.lookup("ostorlab.com", server="127.0.0.1")
+            with pytest.raises(ConnectionResetError):
+                await client.lookup("ostorlab.com", server="127.0.0.1")
+            return text, server.throttled_count
+
+    text, throttled_count = asyncio.run(run())
+
+    assert text == REGISTRY_RESPONSE
+    assert throttled_count == 1
+
+
+class _LocalWhoisClient(whois_client.AsyncWhoisClient):
+    async def query(self, server: str, query: str) -> str:
+        del server
+        return await super().query("127.0.0.1", query)
+
+
+def testAsyncWhoisClient_whenServersMapped_asksIanaOncePerTld() -> None:
+    """The server IANA returns for a TLD should be learned, and mapped TLDs not asked for."""
+    servers = whois_servers.WhoisServers({"com": "whois.verisign-grs.com"})
+
+    def respond(query: str) -> str:
+        if "." not in query:
+            return f"whois:        whois.nic.{query}\n"
+        return REGISTRY_RESPONSE
+
+    async def run() -> list[str]:
+        async with fake_whois_server.FakeWhoisServer(respond) as server:
+            client = _LocalWhoisClient(
+                port=server.port, max_referrals=0, servers=servers
+            )
+            for domain_name in ("ostorlab.com", "ostorlab.bg", "electrohold.bg"):
+                await client.lookup(domain_name)
+            return server.queries
+
+    queries = asyncio.run(run())
+
+    assert queries == ["ostorlab.com", "bg", "ostorlab.bg", "electrohold.bg"]
+    assert servers.get("bg") == "whois.nic.bg"
+
+
+def testEventLoopThread_whenCoroutinesRunFromSeveralThreads_runsThemOnOneLoop() -> None:
+    """Coroutines run from several threads should share the loop of the daemon thread."""
+    loop_thread = whois_client.EventLoopThread()
+    loop_thread.start()
+
+    async def running_loop() -> asyncio.AbstractEventLoop:
+        return asyncio.get_running_loop()
+
+    with futures.ThreadPoolExecutor(max_workers=3) as executor:
+        loops = set(executor.map(lambda _: loop_thread.run(running_loop()), range(6)))
+    loop_thread.stop()
+
+    assert len(loops) == 1
+
+
+def testParse_whenRawResponse_returnsWhoisData() -> None:
+    """Raw responses should be parsed into the python-whois fields."""
+    entry = whois_client.parse("ostorlab.com", REGISTRY_RESPONSE + REGISTRAR_RESPONSE)
+
+    assert entry["registrar"] == "Tucows Domains Inc."
+    assert entry["creation_date"].year == 2015
+
+
+def testFindReferral_whenReferralIsUrl_returnsNone() -> None:
+    """Referrals to web pages can not be followed over port 43."""
+    assert (
+        whois_client.find_referral("Registrar WHOIS Server: https://rdap.example.com/")
+        is None
+    )
+    assert whois_client.find_referral("refer: whois.verisign-grs.com\n") == (
+        "whois.verisign-grs.com"
+    )
@@ -0,0 +1,23 @@
+"""Unittests for the WHOIS corpus used by the benchmarks."""
+
+import json
+
+from agent import result_parser
+from benchmarks import agent_benchmark, whois_corpus
+
+
+def testLoadScanOutputs_whenCorpusParsed_everyResponseYieldsRecords() -> None:
+    """Every corpus response should parse into at least one emitted record."""
+    scan_outputs = whois_corpus.load_scan_outputs()
+
+    assert len(scan_outputs) >= 10
+    for domain, scan_output in scan_outputs.items():
+        records = list(result_parser.parse_results(scan_output))
+        assert len(records) > 0, domain
+
+
+def testBaseline_whenLoaded_matchesCorpusVersion() -> None:
+    """The stored baseline should be measured on the current corpus."""
+    baseline = json.loads(agent_benchmark.BASELINE_PATH.read_text())
+
+    assert baseline["corpus_version"] == whois_corpus.CORPUS_VERSION
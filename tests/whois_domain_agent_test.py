@@ -1,14 +1,31 @@
 """Unittests for whois_domain agent."""
 
+import asyncio
 import datetime
+import pathlib
+import socket
+import subprocess
+import sys
+import time
+from concurrent import futures
 from typing import Any
 
+import email_validator
 import pytest
 from ostorlab.agent.message import message
 from pytest_mock import plugin
 from whois import exceptions as whois_exceptions
 
-from agent import result_parser, whois_domain_agent
+from agent import (
+    cache,
+    change_detection,
+    profiling,
+    rdap,
+    result_parser,
+    whois_domain_agent,
+)
+from benchmarks import agent_factory, whois_corpus
+from tests import conftest
 
 SCAN_OUTPUT = {
     "domain_name": "test.ostorlab.co",
@@ -596,3 +613,903 @@ def testParseResults_whenMixedCaseNameServers_returnsLowercaseUnique() -> None:
         "ns1.example.com",
         "ns2.example.com",
     ]
+
+
+def testAgentWhois_whenFldCachedFromPreviousScan_doesNotFetchWhois(
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """A cached fld should be emitted without a new whois lookup, even if the dedup set was reset."""
+    del agent_persist_mock
+    mock_whois = mocker.patch(
+        "whois.whois", return_value={"domain_name": "ostorlab.co"}
+    )
+    scan_message = message.Message.from_data(
+        "v3.asset.domain_name", data={"name": "ostorlab.co"}
+    )
+    test_agent.process(scan_message)
+    mocker.patch.object(test_agent, "set_add", return_value=True)
+    test_agent._dedup_filter.clear()
+
+    test_agent.process(scan_message)
+
+    mock_whois.assert_called_once()
+
+
+@pytest.mark.parametrize("cache_arg", ["cache_size", "cache_ttl"])
+def testAgentWhois_whenCacheArgIsZero_fetchesWhoisAgain(
+    cache_arg: str,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """Setting the cache size or TTL to 0 should disable the cache rather than fall back to the default."""
+    del agent_persist_mock
+    test_agent = agent_factory.build_agent(
+        **{cache_arg: 0, "dedup_local_cache_size": 0}
+    )
+    mock_whois = mocker.patch(
+        "whois.whois", return_value={"domain_name": "ostorlab.co"}
+    )
+    scan_message = message.Message.from_data(
+        "v3.asset.domain_name", data={"name": "ostorlab.co"}
+    )
+    test_agent.process(scan_message)
+    mocker.patch.object(test_agent, "set_add", return_value=True)
+
+    test_agent.process(scan_message)
+
+    assert mock_whois.call_count == 2
+    assert len(agent_mock) == 2
+    assert agent_mock[1].data["name"] == "ostorlab.co"
+
+
+def testAgentWhois_whenConcurrentLookupsEnabled_emitsAllResults(
+    test_agent_with_concurrent_lookups: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """Lookups handed to the worker pool should all be emitted once the pool is drained."""
+    del agent_persist_mock
+    mocker.patch("time.sleep")
+    mock_whois = mocker.patch(
+        "whois.whois",
+        side_effect=lambda domain: {"domain_name": domain},
+    )
+    domains = [f"domain{index}.com" for index in range(10)]
+
+    for domain in domains:
+        test_agent_with_concurrent_lookups.process(
+            message.Message.from_data("v3.asset.domain_name", data={"name": domain})
+        )
+    test_agent_with_concurrent_lookups.wait_for_lookups()
+
+    assert mock_whois.call_count == 10
+    assert sorted(m.data["name"] for m in agent_mock) == sorted(domains)
+
+
+def send_messages_on_loop(
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    loop: asyncio.AbstractEventLoop,
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Makes the mocked bus sends wait for the event loop, like those of the agent consuming the bus."""
+    send_message = test_agent.mq_send_message
+
+    async def async_send_message(*args: Any, **kwargs: Any) -> None:
+        send_message(*args, **kwargs)
+
+    def send_message_on_loop(*args: Any, **kwargs: Any) -> None:
+        asyncio.run_coroutine_threadsafe(
+            async_send_message(*args, **kwargs), loop
+        ).result()
+
+    mocker.patch.object(test_agent, "mq_send_message", side_effect=send_message_on_loop)
+
+
+def testAgentWhois_whenConcurrentLookupsCached_takesNoQueryOfServer(
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """Cached domains should be emitted without waiting for the rate limit of their server."""
+    del agent_persist_mock
+    mock_whois = mocker.patch("whois.whois")
+    test_agent = agent_factory.build_agent(
+        max_concurrent_lookups=4, whois_server_rate=1, whois_server_burst=1
+    )
+    domains = [f"domain{index}.com" for index in range(6)]
+    for domain in domains:
+        test_agent._cache.set(domain, {**SCAN_OUTPUT, "domain_name": domain})
+
+    for domain in domains:
+        test_agent.process(
+            message.Message.from_data("v3.asset.domain_name", data={"name": domain})
+        )
+    test_agent.wait_for_lookups()
+
+    mock_whois.assert_not_called()
+    assert sorted(m.data["name"] for m in agent_mock) == sorted(domains)
+    assert (
+        test_agent._rate_limiter.try_acquire(test_agent._server_key(domains[0])) == 0.0
+    )
+
+
+def testAgentWhois_whenScheduledLookupSkippedByOpenCircuit_refundsQueryOfServer(
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """The query taken by the scheduler for a lookup that sends none should be given back."""
+    del agent_persist_mock
+    mock_whois = mocker.patch("whois.whois")
+    test_agent = agent_factory.build_agent(
+        max_concurrent_lookups=2,
+        whois_server_rate=1,
+        whois_server_burst=1,
+        circuit_breaker_threshold=1,
+    )
+    server_key = test_agent._server_key("ostorlab.com")
+    test_agent._circuit_breakers.record_failure(server_key)
+
+    test_agent.process(
+        message.Message.from_data("v3.asset.domain_name", data={"name": "ostorlab.com"})
+    )
+    test_agent.wait_for_lookups()
+
+    mock_whois.assert_not_called()
+    assert len(agent_mock) == 0
+    assert test_agent._rate_limiter.try_acquire(server_key) == 0.0
+
+
+def testAgentWhois_whenSigtermWithLookupsInFlight_emitsThemBeforeLoopStops(
+    test_agent_with_concurrent_lookups: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """On SIGTERM, the queued lookups should be drained while the event loop keeps sending their results."""
+    del agent_persist_mock
+    loop = asyncio.new_event_loop()
+    send_messages_on_loop(test_agent_with_concurrent_lookups, loop, mocker)
+
+    def slow_whois(domain: str) -> dict[str, Any]:
+        time.sleep(0.05)
+        return {"domain_name": domain}
+
+    mocker.patch("whois.whois", side_effect=slow_whois)
+    domains = [f"domain{index}.com" for index in range(6)]
+    for domain in domains:
+        test_agent_with_concurrent_lookups.process(
+            message.Message.from_data("v3.asset.domain_name", data={"name": domain})
+        )
+
+    loop.call_soon(test_agent_with_concurrent_lookups._drain_and_stop, loop)
+    loop.run_forever()
+    loop.close()
+
+    assert sorted(m.data["name"] for m in agent_mock) == sorted(domains)
+
+
+def testAgentWhois_whenAsyncioBackendWithConcurrentLookups_sharesOneEventLoop(
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """Lookups of the asyncio client run by several workers should share one event loop."""
+    del agent_persist_mock
+    lookup_loops: set[asyncio.AbstractEventLoop] = set()
+
+    async def lookup(domain_name: str) -> str:
+        lookup_loops.add(asyncio.get_running_loop())
+        return whois_corpus.load_responses()["medallia.com"]
+
+    mocker.patch("agent.whois_client.AsyncWhoisClient.lookup", side_effect=lookup)
+    test_agent = agent_factory.build_agent(
+        whois_backend="asyncio", max_concurrent_lookups=3
+    )
+
+    for index in range(6):
+        test_agent.process(
+            message.Message.from_data(
+                "v3.asset.domain_name", data={"name": f"domain{index}.com"}
+            )
+        )
+    test_agent.at_exit()
+
+    assert len(lookup_loops) == 1
+    assert len(agent_mock) == 6
+
+
+def testAgentWhois_whenQueuingLookupFails_leavesNoWorkerWaiting(
+    test_agent_with_concurrent_lookups: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    scan_message: message.Message,
+) -> None:
+    """A lookup that could not be queued should neither hold a pending slot nor block a worker."""
+    del agent_persist_mock
+    lookups_scheduler = test_agent_with_concurrent_lookups._lookup_scheduler
+    assert lookups_scheduler is not None
+    mocker.patch.object(lookups_scheduler, "put", side_effect=MemoryError)
+    submit_mock = mocker.patch.object(
+        test_agent_with_concurrent_lookups._lookup_executor, "submit"
+    )
+
+    with pytest.raises(MemoryError):
+        test_agent_with_concurrent_lookups.process(scan_message)
+
+    submit_mock.assert_not_called()
+    pending_lookups = test_agent_with_concurrent_lookups._pending_lookups
+    assert pending_lookups is not None
+    with pytest.raises(ValueError):
+        # The bounded semaphore refuses a release when all its slots are free.
+        pending_lookups.release()
+
+
+def testAgentWhois_whenConcurrentLookupRaisesPywhoisError_logsError(
+    test_agent_with_concurrent_lookups: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Errors raised in a worker should be logged like in the inline mode."""
+    del agent_persist_mock
+    mocker.patch(
+        "whois.whois",
+        side_effect=whois_exceptions.PywhoisError("No match for domain"),
+    )
+
+    test_agent_with_concurrent_lookups.process(
+        message.Message.from_data("v3.asset.domain_name", data={"name": "ostorlab.co"})
+    )
+    test_agent_with_concurrent_lookups.wait_for_lookups()
+
+    assert "No match for domain" in caplog.text
+    assert len(agent_mock) == 0
+
+
+def testAgentWhois_whenPreviousLookupFoundNoMatch_doesNotRetryInNextScan(
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """A domain without whois match should be rejected from the negative cache afterwards."""
+    del agent_persist_mock
+    mock_whois = mocker.patch(
+        "whois.whois", side_effect=whois_exceptions.PywhoisError("No match")
+    )
+    scan_message = message.Message.from_data(
+        "v3.asset.domain_name", data={"name": "ostorlab.co"}
+    )
+    test_agent.process(scan_message)
+    mocker.patch.object(test_agent, "set_add", return_value=True)
+    test_agent._dedup_filter.clear()
+
+    test_agent.process(scan_message)
+
+    mock_whois.assert_called_once()
+    assert len(agent_mock) == 0
+
+
+def testAgentWhois_whenRetriesExhausted_cachesTimeoutFailure(
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+) -> None:
+    """A domain running out of retries should not pay the retries again in the next scan."""
+    del agent_persist_mock
+    mocker.patch("time.sleep")
+    mock_whois = mocker.patch("whois.whois", side_effect=TimeoutError)
+    scan_message = message.Message.from_data(
+        "v3.asset.domain_name", data={"name": "ostorlab.co"}
+    )
+    test_agent.process(scan_message)
+    mocker.patch.object(test_agent, "set_add", return_value=True)
+    test_agent._dedup_filter.clear()
+
+    test_agent.process(scan_message)
+
+    assert mock_whois.call_count == 3
+
+
+def testAgentWhois_whenSameFldReceivedAgain_skipsSharedSetRoundTrip(
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """Subdomains of an already processed fld should be rejected by the local filter without calling set_add."""
+    del agent_persist_mock
+    mocker.patch("whois.whois", return_value={"domain_name": "ostorlab.co"})
+    set_add_spy = mocker.spy(test_agent, "set_add")
+
+    for name in ["www.ostorlab.co", "api.ostorlab.co", "mail.ostorlab.co"]:
+        test_agent.process(
+            message.Message.from_data("v3.asset.domain_name", data={"name": name})
+        )
+
+    set_add_spy.assert_called_once_with("agent_whois_domain_asset", "ostorlab.co")
+    assert test_agent._dedup_filter.hits == 2
+    assert test_agent._dedup_filter.misses == 1
+    assert len(agent_mock) == 1
+
+
+def testAgentWhois_whenFldProcessedByAnotherReplica_rejectsFromSharedSet(
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """A local miss should fall back to the shared persist set."""
+    del agent_persist_mock
+    mock_whois = mocker.patch("whois.whois")
+    test_agent.set_add("agent_whois_domain_asset", "ostorlab.co")
+
+    test_agent.process(
+        message.Message.from_data("v3.asset.domain_name", data={"name": "ostorlab.co"})
+    )
+
+    mock_whois.assert_not_called()
+    assert len(agent_mock) == 0
+
+
+def testParseResults_whenSameEmailsAcrossRecords_validatesEachAddressOnceWithoutDns(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Email validation should be syntax-only and memoized per address."""
+    result_parser._is_valid_email.cache_clear()
+    validate_email_spy = mocker.spy(email_validator, "validate_email")
+
+    for _ in range(3):
+        list(result_parser.parse_results(SCAN_OUTPUT_LIST))
+
+    assert validate_email_spy.call_count == 2
+    assert all(
+        call.kwargs == {"check_deliverability": False}
+        for call in validate_email_spy.call_args_list
+    )
+
+
+def testParseResults_whenEmailSyntaxInvalid_dropsEmail() -> None:
+    """Values that are not syntactically valid emails should be dropped."""
+    results = list(
+        result_parser.parse_results(
+            {
+                "domain_name": "ostorlab.co",
+                "email": ["abuse@godaddy.com", "not an email", "a@b"],
+            }
+        )
+    )
+
+    assert results[0]["emails"] == ["abuse@godaddy.com"]
+
+
+def testParseResults_whenManyDomainNames_formatsSharedFieldsOnce(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Fields that do not depend on the domain name should be formatted once per record."""
+    scan_output = {
+        **SCAN_OUTPUT,
+        "domain_name": ["ostorlab.co", "OSTORLAB.CO", "ostorlab.com", "Ostorlab.Net"],
+    }
+    get_isoformat_spy = mocker.spy(result_parser, "get_isoformat")
+
+    results = list(result_parser.parse_results(scan_output))
+
+    assert sorted(result["name"] for result in results) == [
+        "ostorlab.co",
+        "ostorlab.com",
+        "ostorlab.net",
+    ]
+    assert get_isoformat_spy.call_count == 3
+    assert all(
+        {**result, "name": None} == {**results[0], "name": None} for result in results
+    )
+    assert list(results[0].keys())[:5] == [
+        "updated_date",
+        "creation_date",
+        "expiration_date",
+        "name",
+        "emails",
+    ]
+
+
+def testAgentWhois_whenConnectionErrorRetried_countsRetriesAndErrors(
+    scan_message: message.Message,
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """Retries, query errors, cache misses and lookup latencies should be counted."""
+    del agent_persist_mock
+    mocker.patch("time.sleep")
+    mocker.patch("whois.whois", side_effect=ConnectionResetError)
+    agent_metrics = test_agent._metrics
+
+    test_agent.process(scan_message)
+
+    assert agent_metrics.value("whois_retries_total", server="com") == 2
+    assert agent_metrics.value("whois_errors_total", error="connection") == 3
+    assert agent_metrics.value("whois_cache_total", result="miss") == 1
+    assert agent_metrics.value("whois_dedup_total", result="miss") == 1
+    assert (
+        agent_metrics.value(
+            "whois_lookup_duration_seconds_count", tld="com", server="com"
+        )
+        == 3
+    )
+    assert agent_metrics.value("whois_process_duration_seconds_count") == 1
+
+
+def testAgentWhois_whenResultsEmitted_countsEmittedMessagesAndParseTime(
+    scan_message: message.Message,
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """Emitted messages, parse time and dedup hits should be counted."""
+    del agent_persist_mock
+    mocker.patch("whois.whois", return_value=SCAN_OUTPUT_LIST)
+    agent_metrics = test_agent._metrics
+
+    test_agent.process(scan_message)
+    test_agent.process(scan_message)
+
+    assert agent_metrics.value("whois_emitted_messages_total") == len(agent_mock) == 1
+    assert agent_metrics.value("whois_parse_duration_seconds_count") == 1
+    assert agent_metrics.value("whois_dedup_total", result="local_hit") == 1
+
+
+def testAgentWhois_whenProfilingEnabled_writesProfileOfSampledMessages(
+    scan_message: message.Message,
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+    tmp_path: pathlib.Path,
+) -> None:
+    """Sampled messages should be profiled around `process`."""
+    del agent_persist_mock
+    mocker.patch("whois.whois", return_value=SCAN_OUTPUT_LIST)
+    test_agent._profiler = profiling.SampledProfiler(str(tmp_path), sample_rate=1)
+
+    test_agent.process(scan_message)
+
+    assert len(agent_mock) == 1
+    assert len(list(tmp_path.glob("process-*.prof"))) == 1
+
+
+def testAgentWhois_whenRetried_backsOffExponentiallyWithJitter(
+    scan_message: message.Message,
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """Waits between attempts should be random and bounded by an exponentially growing ceiling."""
+    del agent_persist_mock
+    mocker.patch("time.sleep")
+    sleep_mock = mocker.patch.object(test_agent._retrying, "sleep")
+    mocker.patch("whois.whois", side_effect=TimeoutError)
+
+    test_agent.process(scan_message)
+
+    waits = [call.args[0] for call in sleep_mock.call_args_list]
+    assert len(waits) == 2
+    assert 0 <= waits[0] <= 0.5
+    assert 0 <= waits[1] <= 1.0
+
+
+def testAgentWhois_whenServerKeepsFailing_opensCircuitAndFailsFast(
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """Once a server failed repeatedly, lookups routed to it should not query it anymore."""
+    del agent_persist_mock
+    mocker.patch("time.sleep")
+    mock_whois = mocker.patch("whois.whois", side_effect=ConnectionRefusedError)
+
+    for name in ["ostorlab.co", "medallia.co", "rexel.co"]:
+        test_agent.process(
+            message.Message.from_data("v3.asset.domain_name", data={"name": name})
+        )
+
+    # 3 attempts for the first domain, 2 for the second open the circuit after 5 failures.
+    assert mock_whois.call_count == 5
+    assert test_agent._metrics.value("whois_errors_total", error="circuit_open") == 2
+    assert len(agent_mock) == 0
+
+
+def testAgentWhois_whenNetworkUnreachable_retriesAndOpensCircuit(
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """OSErrors raised without an answer of the server should count as failures, not successes."""
+    del agent_persist_mock
+    mocker.patch("time.sleep")
+    mock_whois = mocker.patch(
+        "whois.whois", side_effect=OSError(101, "Network is unreachable")
+    )
+
+    for name in ["ostorlab.co", "medallia.co", "rexel.co"]:
+        test_agent.process(
+            message.Message.from_data("v3.asset.domain_name", data={"name": name})
+        )
+
+    assert mock_whois.call_count == 5
+    assert test_agent._metrics.value("whois_errors_total", error="circuit_open") == 2
+    assert test_agent._cache.get_failure("ostorlab.co") is cache.FailureReason.TRANSIENT
+    assert len(agent_mock) == 0
+
+
+def testAgentWhois_whenServerNameDoesNotResolve_doesNotRetry(
+    scan_message: message.Message,
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """A whois server name that does not exist should not be retried."""
+    del agent_persist_mock
+    mocker.patch("time.sleep")
+    mock_whois = mocker.patch(
+        "whois.whois", side_effect=socket.gaierror(socket.EAI_NONAME, "unknown")
+    )
+
+    test_agent.process(scan_message)
+
+    mock_whois.assert_called_once()
+
+
+def testAgentWhois_whenRdapServerKnown_looksUpOverRdap(
+    scan_message: message.Message,
+    bug_3001_message: message.Message,
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+    rdap_server: conftest.FakeRdapServer,
+) -> None:
+    """Domains of TLDs with an RDAP server should not be queried over whois, others should."""
+    del agent_persist_mock
+    test_agent._rdap_client = rdap.RdapClient({"com": rdap_server.url})
+    mock_whois = mocker.patch("whois.whois", return_value=SCAN_OUTPUT_LIST)
+
+    test_agent.process(scan_message)
+    test_agent.process(bug_3001_message)
+
+    mock_whois.assert_called_once_with("rexel.it")
+    assert rdap_server.requests == ["/rdap/domain/medallia.com"]
+    assert agent_mock[0].data["name"] == "medallia.com"
+    assert agent_mock[0].data["registrar"] == "MarkMonitor Inc."
+    assert agent_mock[0].data["creation_date"] == ["2001-03-19T23:09:24+00:00"]
+    assert (
+        test_agent._metrics.value(
+            "whois_lookup_duration_seconds_count",
+            tld="com",
+            server=rdap_server.url.split("/")[2],
+        )
+        == 1
+    )
+
+
+def testAgentWhois_whenRdapDomainNotFound_cachesNoMatch(
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    agent_mock: list[message.Message],
+    rdap_server: conftest.FakeRdapServer,
+) -> None:
+    """A domain unknown to the RDAP server should be negative-cached like a whois no match."""
+    del agent_persist_mock
+    test_agent._rdap_client = rdap.RdapClient({"com": rdap_server.url})
+
+    test_agent.process(
+        message.Message.from_data(
+            "v3.asset.domain_name", data={"name": "unregistered.com"}
+        )
+    )
+
+    assert len(agent_mock) == 0
+    assert test_agent._cache.get_failure("unregistered.com") is not None
+
+
+def testAgentWhois_whenModuleImported_defersWhoisAndEmailValidatorImports() -> None:
+    """Importing the agent should not import python-whois nor the email validator, loaded on first use."""
+    imported = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, agent.whois_domain_agent; print(sorted({'whois', 'email_validator'} & set(sys.modules)))",
+        ],
+        cwd=pathlib.Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    assert imported.strip() == "[]"
+
+
+def testAgentWhois_whenFirstMessage_waitsForPrewarm(
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+    agent_mock: list[message.Message],
+    scan_message: message.Message,
+    mocker: plugin.MockerFixture,
+) -> None:
+    """The tables loaded in the background at start should be ready before the first lookup."""
+    del agent_persist_mock
+    prewarm_thread = test_agent._prewarm_thread
+    mocker.patch("whois.whois", return_value=SCAN_OUTPUT_LIST)
+
+    test_agent.process(scan_message)
+
+    assert prewarm_thread is not None
+    assert prewarm_thread.is_alive() is False
+    assert test_agent._prewarm_thread is None
+    assert len(agent_mock) == 1
+
+
+def testAgentWhois_whenRecordUnchangedAndSuppressed_emitsOnce(
+    agent_persist_mock: Any,
+    agent_mock: list[message.Message],
+) -> None:
+    """A record emitted again without changes should be suppressed."""
+    del agent_persist_mock
+    test_agent = agent_factory.build_agent(
+        change_detection=change_detection.Mode.SUPPRESS.value
+    )
+
+    test_agent._emit_result(SCAN_OUTPUT_LIST)
+    test_agent._emit_result(SCAN_OUTPUT_LIST)
+
+    assert len(agent_mock) == 1
+    assert agent_mock[0].data["registrar"] == "Tucows Domains Inc."
+    assert test_agent._metrics.value("whois_changes_total", result="new") == 1
+    assert test_agent._metrics.value("whois_changes_total", result="unchanged") == 1
+
+
+def testAgentWhois_whenEmitFails_doesNotSaveFingerprint(
+    agent_persist_mock: Any,
+    agent_mock: list[message.Message],
+    mocker: plugin.MockerFixture,
+) -> None:
+    """A record that could not be sent should be emitted again, not suppressed as unchanged."""
+    del agent_persist_mock
+    test_agent = agent_factory.build_agent(
+        change_detection=change_detection.Mode.SUPPRESS.value
+    )
+    mocker.patch.object(
+        test_agent, "mq_send_message", side_effect=[ConnectionResetError(), None]
+    )
+
+    with pytest.raises(ConnectionResetError):
+        test_agent._emit_result(SCAN_OUTPUT_LIST)
+    test_agent._emit_result(SCAN_OUTPUT_LIST)
+
+    assert test_agent._metrics.value("whois_changes_total", result="new") == 2
+    assert test_agent._metrics.value("whois_emitted_messages_total") == 1
+
+
+def testAgentWhois_whenRecordChangedWithDiff_emitsChangedFieldsThenMarker(
+    agent_persist_mock: Any,
+    agent_mock: list[message.Message],
+) -> None:
+    """A changed record should only carry its changed fields, an unchanged one only its name."""
+    del agent_persist_mock
+    test_agent = agent_factory.build_agent(
+        change_detection=change_detection.Mode.MARKER.value, change_detection_diff=True
+    )
+    transferred_output = {
+        **SCAN_OUTPUT_LIST,
+        "registrar": "MarkMonitor Inc.",
+        "name_servers": [
+            "rush.easydns.com",
+            "motorhead.easydns.org",
+            "nirvana.easydns.net",
+        ],
+    }
+
+    test_agent._emit_result(SCAN_OUTPUT_LIST)
+    test_agent._emit_result(transferred_output)
+    test_agent._emit_result(transferred_output)
+
+    assert len(agent_mock) == 3
+    assert agent_mock[1].data == {
+        "name": "test.ostorlab.co",
+        "registrar": "MarkMonitor Inc.",
+    }
+    assert agent_mock[2].data == {"name": "test.ostorlab.co"}
+    assert test_agent._metrics.value("whois_changes_total", result="changed") == 1
+
+
+def testAgentWhois_whenConcurrentLookupsOfSameDomain_queriesOnce(
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Lookups of a domain racing past the dedup check should wait for a single whois query."""
+
+    def _slow_whois(domain_name: str) -> dict[str, Any]:
+        del domain_name
+        time.sleep(0.2)
+        return SCAN_OUTPUT_LIST
+
+    mock_whois = mocker.patch("whois.whois", side_effect=_slow_whois)
+
+    with futures.ThreadPoolExecutor(max_workers=3) as executor:
+        scan_outputs = list(executor.map(test_agent._lookup, ["ostorlab.co"] * 3))
+
+    mock_whois.assert_called_once_with("ostorlab.co")
+    assert scan_outputs == [SCAN_OUTPUT_LIST] * 3
+    assert test_agent._metrics.value("whois_coalesced_lookups_total") == 2
+    assert (
+        test_agent._metrics.value(
+            "whois_lookup_duration_seconds_count", tld="co", server="co"
+        )
+        == 1
+    )
+
+
+def testAgentWhois_whenAtExitCalledOnEventLoop_emitsLookupsInFlightWithoutBlockingIt(
+    agent_persist_mock: Any,
+    agent_mock: list[message.Message],
+    scan_message: message.Message,
+    mocker: plugin.MockerFixture,
+) -> None:
+    """at_exit called from the event loop should return, the loop then sending the drained results."""
+    del agent_persist_mock
+
+    def slow_whois(domain: str) -> dict[str, Any]:
+        time.sleep(0.05)
+        return SCAN_OUTPUT
+
+    mocker.patch("whois.whois", side_effect=slow_whois)
+    test_agent = agent_factory.build_agent(max_concurrent_lookups=2)
+    loop = asyncio.new_event_loop()
+    send_messages_on_loop(test_agent, loop, mocker)
+    test_agent.process(scan_message)
+
+    async def exit_and_wait_for_emission() -> None:
+        test_agent.at_exit()
+        while len(agent_mock) == 0:
+            await asyncio.sleep(0.01)
+
+    loop.run_until_complete(asyncio.wait_for(exit_and_wait_for_emission(), timeout=5))
+    loop.close()
+
+    assert [m.data["name"] for m in agent_mock] == ["test.ostorlab.co"]
+
+
+def testParseRecords_whenSeveralDomainNames_sharesFieldsAndConvertsToParsedResults() -> (
+    None
+):
+    """Records of one lookup should share their field values and convert to the parse_results dicts."""
+    scan_output = {
+        **{field: value for field, value in SCAN_OUTPUT.items() if field != "zipcode"},
+        "domain_name": ["ostorlab.co", "ostorlab.com"],
+    }
+
+    records = sorted(
+        result_parser.parse_records(scan_output), key=lambda record: record.name
+    )
+
+    assert [record.name for record in records] == ["ostorlab.co", "ostorlab.com"]
+    assert records[0].status is records[1].status
+    assert not hasattr(records[0], "__dict__")
+    assert sorted(
+        (record.to_dict() for record in records), key=lambda record: record["name"]
+    ) == sorted(
+        result_parser.parse_results(scan_output), key=lambda record: record["name"]
+    )
+    assert "zipcode" not in records[0].to_dict()
+
+
+def testInternWhoisData_whenValuesRepeatAcrossDomains_sharesStrings() -> None:
+    """Values of the repeated fields should be a single string object across cached results."""
+    first_output = result_parser.intern_whois_data(
+        {"registrar": b"Tucows Domains Inc.".decode(), "status": ["ok"]}
+    )
+    second_output = result_parser.intern_whois_data(
+        {"registrar": b"Tucows Domains Inc.".decode(), "status": ["ok"]}
+    )
+
+    assert first_output == second_output
+    assert first_output["registrar"] is second_output["registrar"]
+
+
+def testInternWhoisData_whenWhoisDataHasUnparsedFields_onlyReadsParsedFields() -> None:
+    """Fields that the parser does not read should be neither read nor cached."""
+    read_fields = []
+
+    class _RecordingWhoisData(dict[str, Any]):
+        def __getitem__(self, field: str) -> Any:
+            read_fields.append(field)
+            return super().__getitem__(field)
+
+    whois_data = _RecordingWhoisData(
+        domain_name="ostorlab.co", registrar="Tucows Domains Inc.", text="raw response"
+    )
+
+    cached_output = result_parser.intern_whois_data(whois_data)
+
+    assert sorted(read_fields) == ["domain_name", "registrar"]
+    assert cached_output == {
+        "domain_name": "ostorlab.co",
+        "registrar": "Tucows Domains Inc.",
+    }
+    assert list(result_parser.parse_results(cached_output)) == list(
+        result_parser.parse_results(dict(whois_data))
+    )
+
+
+def testAgentWhois_whenWhoisServerDiscoveryEnabled_queriesMappedServerDirectly(
+    scan_message: message.Message,
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """With python-whois, a domain of a mapped TLD should be queried without asking IANA first."""
+    del agent_persist_mock
+    test_agent = agent_factory.build_agent(whois_server_discovery=True)
+    find_iana_mock = mocker.patch("whois.NICClient.findwhois_iana")
+    whois_mock = mocker.patch(
+        "whois.NICClient.whois",
+        return_value=whois_corpus.load_responses()["medallia.com"],
+    )
+
+    test_agent.process(scan_message)
+
+    find_iana_mock.assert_not_called()
+    assert whois_mock.call_args.args[:2] == ("medallia.com", "whois.verisign-grs.com")
+    assert agent_mock[0].data["name"] == "medallia.com"
+
+
+def testAgentWhois_whenScopeRulesMatchHosts_looksUpFldOfInScopeHostsOnly(
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """Wildcard rules should apply to the message host, an excluded host not hiding the fld of another."""
+    del agent_persist_mock
+    test_agent = agent_factory.build_agent(
+        scope_rules=["*.medallia.com", "!*.dev.medallia.com"]
+    )
+    mock_whois = mocker.patch("whois.whois", return_value=SCAN_OUTPUT)
+
+    for name in ("api.dev.medallia.com", "medallia.com", "www.medallia.com"):
+        test_agent.process(
+            message.Message.from_data("v3.asset.domain_name", data={"name": name})
+        )
+
+    mock_whois.assert_called_once_with("medallia.com")
+    assert len(agent_mock) > 0
+
+
+def testAgentWhois_whenLegacyScopeRegexMatchesFld_looksUpSubdomainMessages(
+    agent_persist_mock: Any,
+    mocker: plugin.MockerFixture,
+    agent_mock: list[message.Message],
+) -> None:
+    """scope_domain_regex should keep applying to the registrable domain, not to the message host."""
+    del agent_persist_mock
+    test_agent = agent_factory.build_agent(scope_domain_regex=r"^medallia\.com$")
+    mock_whois = mocker.patch("whois.whois", return_value=SCAN_OUTPUT)
+
+    for name in ("www.medallia.com", "www.ostorlab.co"):
+        test_agent.process(
+            message.Message.from_data("v3.asset.domain_name", data={"name": name})
+        )
+
+    mock_whois.assert_called_once_with("medallia.com")
@@ -0,0 +1,126 @@
+"""Unittests for the batch mode of the whois_domain agent."""
+
+import asyncio
+import io
+import json
+import pathlib
+
+from pytest_mock import plugin
+
+from agent import scope, whois_domain_cli
+
+
+def testIterDomains_whenSubdomainsAndInvalidLines_yieldsUniqueInScopeFlds() -> None:
+    """Input lines should be filtered by scope on their host, then normalized to flds and deduplicated."""
+    lines = [
+        "www.ostorlab.co\n",
+        "api.ostorlab.co\n",
+        "\n",
+        "# comment\n",
+        "test\n",
+        "api.dev.medallia.com\n",
+        "https://medallia.com/path\n",
+        "ostorlab.com\n",
+    ]
+
+    domains = list(
+        whois_domain_cli.iter_domains(
+            lines,
+            scope.Scope(
+                scope.ScopeMatcher(
+                    ["*.ostorlab.co", "*.com", "!ostorlab.com", "!*.dev.medallia.com"]
+                )
+            ),
+        )
+    )
+
+    assert domains == ["ostorlab.co", "medallia.com"]
+
+
+def testMain_whenDomainsFile_writesParsedRecordsAsJsonLines(
+    tmp_path: pathlib.Path, mocker: plugin.MockerFixture
+) -> None:
+    """Each parsed record should be written as one JSON line."""
+    mocker.patch(
+        "whois.whois",
+        side_effect=lambda domain: {
+            "domain_name": domain,
+            "registrar": "Tucows Domains Inc.",
+            "status": "ok",
+        },
+    )
+    input_path = tmp_path / "domains.txt"
+    input_path.write_text("www.ostorlab.co\nmedallia.com\napi.medallia.com\n")
+    output_path = tmp_path / "whois.jsonl"
+
+    whois_domain_cli.main(
+        [
+            str(input_path),
+            "--output",
+            str(output_path),
+            "--backend",
+            "python-whois",
+            "--whois-server-rate",
+            "0",
+        ]
+    )
+
+    records = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert sorted(record["name"] for record in records) == [
+        "medallia.com",
+        "ostorlab.co",
+    ]
+    assert all(record["registrar"] == "Tucows Domains Inc." for record in records)
+    assert all(record["status"] == ["ok"] for record in records)
+
+
+def testBatchLookup_whenConnectionErrors_retriesThenSkipsDomain(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Domains failing on every attempt should be skipped without stopping the batch."""
+    mocker.patch("asyncio.sleep", return_value=None)
+    mock_whois = mocker.patch(
+        "whois.whois",
+        side_effect=lambda domain: (
+            {"domain_name": domain}
+            if domain == "medallia.com"
+            else (_ for _ in ()).throw(ConnectionResetError())
+        ),
+    )
+    output = io.StringIO()
+    batch_lookup = whois_domain_cli.BatchLookup(backend="python-whois", retry_number=3)
+
+    records_count = asyncio.run(
+        batch_lookup.run(["ostorlab.co", "medallia.com"], output)
+    )
+
+    assert records_count == 1
+    assert mock_whois.call_count == 4
+    assert json.loads(output.getvalue())["name"] == "medallia.com"
+
+
+def testBatchLookup_whenOneDomainRaisesUnexpectedError_writesOtherRecords(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """An unexpected error of one domain should be logged without dropping the records of the others."""
+
+    def whois_lookup(domain: str) -> dict[str, str]:
+        if domain == "ostorlab.co":
+            raise ValueError("Unexpected whois output")
+        return {"domain_name": domain}
+
+    mocker.patch("whois.whois", side_effect=whois_lookup)
+    domains = ["ostorlab.co", "medallia.com", "rexel.it", "electrohold.bg"]
+    output = io.StringIO()
+    batch_lookup = whois_domain_cli.BatchLookup(backend="python-whois", concurrency=2)
+
+    records_count = asyncio.run(batch_lookup.run(domains, output))
+
+    assert records_count == 3
+    assert sorted(
+        json.loads(line)["name"] for line in output.getvalue().splitlines()
+    ) == [
+        "electrohold.bg",
+        "medallia.com",
+        "rexel.it",
+    ]
@@ -0,0 +1,76 @@
+"""Unittests for the table-driven WHOIS parser."""
+
+import pytest
+import whois
+from pytest_mock import plugin
+from whois import exceptions as whois_exceptions
+
+from agent import result_parser, whois_parser
+from benchmarks import whois_corpus
+
+
+@pytest.mark.parametrize("domain", sorted(whois_corpus.load_responses()))
+def testParse_whenCorpusResponse_matchesPythonWhois(domain: str) -> None:
+    """Fields and emitted records should be the same as the ones of python-whois."""
+    text = whois_corpus.load_responses()[domain]
+    expected = whois.parser.WhoisEntry.load(domain, text)
+
+    record = whois_parser.parse(domain, text)
+
+    for field in record:
+        assert field in expected
+        assert record[field] == expected[field], field
+    assert list(result_parser.parse_results(record)) == list(
+        result_parser.parse_results(expected)
+    )
+
+
+def testParse_whenFieldRead_onlyExtractsThatField(
+    mocker: plugin.MockerFixture,
+) -> None:
+    """Fields should be extracted on first read and only once."""
+    findall_spy = mocker.spy(whois_parser, "_findall")
+    text = whois_corpus.load_responses()["medallia.com"]
+
+    record = whois_parser.parse("medallia.com", text)
+    assert findall_spy.call_count == 0
+    assert "registrar" in record
+    assert findall_spy.call_count == 0
+
+    assert record["registrar"] == record["registrar"] == "MarkMonitor, Inc."
+    assert findall_spy.call_count == 1
+
+
+def testParse_whenDomainNotRegistered_raisesNotFound() -> None:
+    """Responses of unregistered domains should be rejected as python-whois does."""
+    with pytest.raises(whois_exceptions.WhoisDomainNotFoundError):
+        whois_parser.parse("unregistered.com", 'No match for "UNREGISTERED.COM".\n')
+
+
+def testParse_whenTldHasNoTable_fallsBackToPythonWhois() -> None:
+    """Responses of TLDs without a table should be parsed by python-whois."""
+    record = whois_parser.parse("ostorlab.ru", "domain: OSTORLAB.RU\n")
+
+    assert isinstance(record, whois.parser.WhoisEntry)
+    assert record["domain_name"] == "OSTORLAB.RU"
+
+
+def testParse_whenEmailsOnSeveralLines_findsEveryEmail() -> None:
+    """Emails should be found on every line, however they are surrounded."""
+    text = (
+        "Domain Name: OSTORLAB.COM\n"
+        "Registrar Abuse Contact Email: abuse@registrar.com\r\n"
+        "Registrant Email: https://registrar.com/contact?domain=ostorlab.com\n"
+        "Tech Email: <tech.contact@ostorlab.co>, admin@ostorlab.co\n"
+    )
+
+    record = whois_parser.parse("ostorlab.com", text)
+
+    assert record["emails"] == [
+        "abuse@registrar.com",
+        "tech.contact@ostorlab.co",
+        "admin@ostorlab.co",
+    ]
+    assert (
+        record["emails"] == whois.parser.WhoisEntry.load("ostorlab.com", text)["emails"]
+    )
@@ -0,0 +1,50 @@
+"""Unittests for the map of the WHOIS server of each TLD."""
+
+from typing import Any
+
+from agent import whois_client, whois_domain_agent, whois_servers
+
+
+def testLoadSnapshot_whenBundled_holdsOnlyServersUnknownToPythonWhois() -> None:
+    """The bundled snapshot should cover the TLDs python-whois asks IANA for, not its own tables."""
+    servers = whois_servers.load_snapshot()
+
+    assert servers["com"] == "whois.verisign-grs.com"
+    assert [
+        tld
+        for tld in servers
+        if whois_client.known_whois_server(f"ostorlab.{tld}") is not None
+    ] == []
+
+
+def testWhoisServers_whenServerLearned_sharesItWithReplicas(
+    test_agent: whois_domain_agent.AgentWhoisDomain,
+    agent_persist_mock: Any,
+) -> None:
+    """A learned server should be persisted once and loaded by the other replicas."""
+    servers = whois_servers.WhoisServers({}, store=test_agent)
+    servers.learn("BG", "whois.imena.bg\r")
+    servers.learn("bg", "whois.imena.bg")
+    replica_servers = whois_servers.WhoisServers({}, store=test_agent)
+
+    replica_servers.load()
+
+    assert replica_servers.get("bg") == "whois.imena.bg"
+    assert agent_persist_mock[whois_servers.SERVERS_KEY] == {"bg": b"whois.imena.bg"}
+
+
+def testWhoisServers_whenRefreshFails_keepsKnownServer() -> None:
+    """A TLD whose refresh fails should keep its server, the others being updated."""
+    servers = whois_servers.WhoisServers(
+        {"com": "whois.verisign-grs.com", "org": "whois.pir.org"}
+    )
+
+    def find_server(tld: str) -> str | None:
+        if tld == "com":
+            raise TimeoutError
+        return "whois.publicinterestregistry.org"
+
+    servers.refresh(find_server)
+
+    assert servers.get("com") == "whois.verisign-grs.com"
+    assert servers.get("org") == "whois.publicinterestregistry.org"